@@ -0,0 +1,279 @@
+"""Admission control for LLM-bound endpoints.
+
+Sync endpoints run in FastAPI's threadpool, and a thread blocked on the
+model is a thread /pet and /feedback cannot use. This gate sits in front of
+the app as ASGI middleware, so queued requests wait on the event loop
+without holding a thread. Each configured route has a lane (priority) and
+its own in-flight cap under a shared cap; waiters are admitted by lane, then
+arrival order. When the wait queue is full a request is rejected at once
+with 429 and ``Retry-After`` (or, if it outranks the lowest-priority waiter,
+that waiter is rejected instead).
+
+A route whose handler fans out into many model calls (``/qa/batch``) is not
+gated as a whole; its handler takes one slot per call with ``slot`` from its
+worker threads, so interactive requests can get in between the calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import itertools
+import math
+import time
+from collections import Counter
+from collections.abc import Collection, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Lower runs first.
+LANES = {"interactive": 0, "batch": 1, "background": 2}
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Route:
+    lane: str
+    max_in_flight: int
+
+
+def parse_routes(spec: str) -> dict[str, Route]:
+    """``"/qa=interactive:4,/dilemma/next=background:1"`` -> routes by path."""
+    routes = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        path, _, rule = entry.partition("=")
+        lane, _, limit = rule.partition(":")
+        if lane not in LANES:
+            raise ValueError(f"unknown admission lane {lane!r} for {path}")
+        routes[path.strip()] = Route(lane, int(limit or 0))
+    return routes
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    path: str = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class AdmissionController:
+    """Shared in-flight cap with per-route caps and a priority wait queue.
+
+    All methods run on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        routes: dict[str, Route],
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout_s: float,
+    ) -> None:
+        self.routes = routes
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._in_flight = 0
+        self._route_in_flight: Counter[str] = Counter()
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        # Smoothed time a request holds its slot, for Retry-After.
+        self._hold_s = 1.0
+        self._lanes: dict[str, dict[str, float]] = {
+            lane: {
+                "admitted": 0,
+                "rejected": 0,
+                "queued_total": 0,
+                "admitted_after_wait": 0,
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+            }
+            for lane in LANES
+        }
+
+    def _has_room(self, path: str) -> bool:
+        route = self.routes[path]
+        return self._in_flight < self.max_in_flight and (
+            route.max_in_flight <= 0
+            or self._route_in_flight[path] < route.max_in_flight
+        )
+
+    def _take(self, path: str) -> None:
+        self._in_flight += 1
+        self._route_in_flight[path] += 1
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + self._in_flight
+        return max(1, math.ceil(backlog * self._hold_s / max(1, self.max_in_flight)))
+
+    def _reject(self, lane: str, reason: str) -> Rejected:
+        self._lanes[lane]["rejected"] += 1
+        return Rejected(reason, self.retry_after())
+
+    async def acquire(self, path: str) -> float:
+        """Wait for a slot for ``path``; returns seconds spent queued."""
+        route = self.routes[path]
+        priority = LANES[route.lane]
+        stats = self._lanes[route.lane]
+        # Waiters are only ever blocked by a full cap (release() admits any
+        # that fit), so room for this route means nobody is ahead of it.
+        if self._has_room(path):
+            self._take(path)
+            stats["admitted"] += 1
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            last = self._waiters[-1] if self._waiters else None
+            if last is None or last.priority <= priority:
+                raise self._reject(route.lane, "queue full")
+            # Make room by bumping the newest lowest-priority waiter.
+            self._waiters.pop()
+            bumped = self.routes[last.path].lane
+            last.future.set_exception(self._reject(bumped, "preempted"))
+
+        waiter = _Waiter(
+            priority,
+            next(self._seq),
+            path,
+            asyncio.get_running_loop().create_future(),
+        )
+        bisect.insort(self._waiters, waiter)
+        stats["queued_total"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout_s or None)
+        except TimeoutError:
+            self._drop(waiter)
+            raise self._reject(route.lane, "queue timeout") from None
+        except BaseException:
+            # Client went away (or was preempted) while queued.
+            self._drop(waiter)
+            raise
+        waited = time.perf_counter() - start
+        stats["admitted"] += 1
+        stats["admitted_after_wait"] += 1
+        stats["wait_ms_total"] += waited * 1000
+        stats["wait_ms_max"] = max(stats["wait_ms_max"], waited * 1000)
+        return waited
+
+    def _drop(self, waiter: _Waiter) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        elif (
+            waiter.future.done()
+            and not waiter.future.cancelled()
+            and waiter.future.exception() is None
+        ):
+            # Admitted in the same loop turn it gave up; hand the slot on.
+            self.release(waiter.path, 0.0)
+
+    def release(self, path: str, held_s: float) -> None:
+        self._in_flight -= 1
+        self._route_in_flight[path] -= 1
+        if held_s > 0:
+            self._hold_s = 0.8 * self._hold_s + 0.2 * held_s
+        for waiter in list(self._waiters):
+            if self._in_flight >= self.max_in_flight:
+                break
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+            elif self._has_room(waiter.path):
+                self._waiters.remove(waiter)
+                self._take(waiter.path)
+                waiter.future.set_result(None)
+
+    @contextmanager
+    def slot(self, path: str, loop: asyncio.AbstractEventLoop) -> Iterator[float]:
+        """Hold a slot for ``path`` from a worker thread; yields seconds queued.
+
+        ``loop`` is the event loop the controller runs on. Raises ``Rejected``
+        like ``acquire``. Must not be called on the loop's own thread.
+        """
+        waited = asyncio.run_coroutine_threadsafe(self.acquire(path), loop).result()
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            loop.call_soon_threadsafe(self.release, path, time.perf_counter() - start)
+
+    def stats(self) -> dict[str, Any]:
+        lanes = {}
+        for lane, s in self._lanes.items():
+            waited = s["admitted_after_wait"]
+            lanes[lane] = {
+                **s,
+                "queued": sum(
+                    1 for w in self._waiters if self.routes[w.path].lane == lane
+                ),
+                "wait_ms_avg": round(s["wait_ms_total"] / waited, 1) if waited else 0.0,
+            }
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "routes": {
+                path: {
+                    "lane": route.lane,
+                    "in_flight": self._route_in_flight[path],
+                    "max_in_flight": route.max_in_flight,
+                }
+                for path, route in self.routes.items()
+            },
+            "lanes": lanes,
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI, so a slot is held until a streamed body is fully sent.
+
+    Paths in ``per_call`` pass through ungated; their handlers take slots
+    themselves with ``AdmissionController.slot``.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        per_call: Collection[str] = (),
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.per_call = per_call
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or path not in self.controller.routes
+            or path in self.per_call
+        ):
+            await self.app(scope, receive, send)
+            return
+        try:
+            waited = await self.controller.acquire(path)
+        except Rejected as exc:
+            response = JSONResponse(
+                {"detail": f"server busy ({exc.reason}), retry later"},
+                status_code=429,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        scope.setdefault("state", {})["queue_ms"] = waited * 1000
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(path, time.perf_counter() - start)
@@ -0,0 +1,201 @@
+"""Persistent cache of /qa model answers.
+
+Entries are grouped by *scope*: the evidence id set plus everything else
+that shapes the model call (prompt template version, chat model,
+temperature). Within a scope an answer is reused for the same question
+(exact hit) or for a question whose embedding is close enough to a cached
+one (semantic hit). Rows live in a small SQLite file so the cache survives
+restarts; entries expire after a TTL and the least recently used ones are
+dropped beyond a size cap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from collections.abc import Iterable
+from typing import Any
+
+from .config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    embedding BLOB,
+    answer_json TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers(scope, created_at);
+CREATE INDEX IF NOT EXISTS idx_answers_used ON answers(used_at);
+"""
+
+
+def _digest(*parts: object) -> str:
+    raw = json.dumps(parts, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def answer_scope(
+    evidence_ids: Iterable[str],
+    prompt_version: str,
+    model: str,
+    temperature: float | None,
+) -> str:
+    """Cache scope; evidence order does not matter, only the set."""
+    return _digest(sorted(set(evidence_ids)), prompt_version, model, temperature)
+
+
+def _pack(vector: list[float]) -> bytes:
+    """Unit-length float32, so cosine similarity is a dot product."""
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array("f", (x / norm for x in vector)).tobytes()
+
+
+def _unpack(blob: bytes) -> array:
+    values = array("f")
+    values.frombytes(blob)
+    return values
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        db_path: str | None = None,
+        ttl_s: float | None = None,
+        max_entries: int | None = None,
+        similarity: float | None = None,
+    ) -> None:
+        self.db_path = db_path or settings.answer_cache_path
+        self.ttl_s = settings.answer_cache_ttl_s if ttl_s is None else ttl_s
+        self.max_entries = (
+            settings.answer_cache_max_entries if max_entries is None else max_entries
+        )
+        # 0 disables semantic matching (exact hits only).
+        self.similarity = (
+            settings.answer_cache_similarity if similarity is None else similarity
+        )
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.hits = {"exact": 0, "semantic": 0}
+        # Every put follows a miss that went to the model.
+        self.misses = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity > 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _fresh_since(self, now: float) -> float:
+        return now - self.ttl_s if self.ttl_s > 0 else float("-inf")
+
+    def _touch(self, key: str, now: float) -> None:
+        with self._conn:
+            self._conn.execute(
+                "UPDATE answers SET used_at = ? WHERE key = ?", (now, key)
+            )
+
+    def get(self, scope: str, question: str) -> dict[str, Any] | None:
+        """Exact hit: same scope and same normalized question."""
+        key = _digest(scope, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer_json FROM answers WHERE key = ? AND created_at >= ?",
+                (key, self._fresh_since(now)),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touch(key, now)
+            self.hits["exact"] += 1
+        return json.loads(row[0])
+
+    def get_similar(
+        self, scope: str, embedding: list[float]
+    ) -> tuple[dict[str, Any], float] | None:
+        """Best cached answer in ``scope`` at or above the similarity threshold."""
+        if not self.semantic:
+            return None
+        query = _unpack(_pack(embedding))
+        now = time.time()
+        best: tuple[float, str, str] | None = None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, embedding, answer_json FROM answers "
+                "WHERE scope = ? AND created_at >= ? AND embedding IS NOT NULL",
+                (scope, self._fresh_since(now)),
+            ).fetchall()
+            for key, blob, answer_json in rows:
+                cached = _unpack(blob)
+                if len(cached) != len(query):
+                    continue
+                score = sum(a * b for a, b in zip(query, cached, strict=True))
+                if score >= self.similarity and (best is None or score > best[0]):
+                    best = (score, key, answer_json)
+            if best is None:
+                return None
+            self._touch(best[1], now)
+            self.hits["semantic"] += 1
+        return json.loads(best[2]), best[0]
+
+    def put(
+        self,
+        scope: str,
+        question: str,
+        answer: dict[str, Any],
+        embedding: list[float] | None = None,
+    ) -> None:
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock, self._conn:
+            self.misses += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, scope, question, embedding, answer_json, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _digest(scope, normalized),
+                    scope,
+                    normalized,
+                    _pack(embedding) if embedding else None,
+                    json.dumps(answer, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            if self.ttl_s > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE created_at < ?", (now - self.ttl_s,)
+                )
+            if self.max_entries > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    "SELECT key FROM answers ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+            return {
+                "entries": entries,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+            }
@@ -43,7 +43,88 @@ class Settings:
         ),
     )
 
+    graph_version_cache_size: int = int(_env("GRAPH_VERSION_CACHE_SIZE") or "2048")
+    qa_single_flight: bool = (_env("QA_SINGLE_FLIGHT") or "1") == "1"
+    # /qa/batch: texts per embedding request, parallel model calls, max items.
+    qa_batch_embed_size: int = int(_env("QA_BATCH_EMBED_SIZE") or "64")
+    qa_batch_concurrency: int = int(_env("QA_BATCH_CONCURRENCY") or "4")
+    qa_batch_max_items: int = int(_env("QA_BATCH_MAX_ITEMS") or "5000")
+    feedback_batch_max_items: int = int(_env("FEEDBACK_BATCH_MAX_ITEMS") or "10000")
+
+    # Persistent /qa answer cache. SIMILARITY is the cosine threshold for
+    # reusing an answer to a paraphrased question over the same evidence
+    # set (0 = exact matches only); TTL_S / MAX_ENTRIES of 0 mean no limit.
+    answer_cache: bool = (_env("ANSWER_CACHE") or "0") == "1"
+    answer_cache_path: str = _env("ANSWER_CACHE_PATH") or os.path.abspath(
+        "./backend/answer_cache.db"
+    )
+    answer_cache_ttl_s: float = float(_env("ANSWER_CACHE_TTL_S") or "86400")
+    answer_cache_max_entries: int = int(_env("ANSWER_CACHE_MAX_ENTRIES") or "10000")
+    answer_cache_similarity: float = float(_env("ANSWER_CACHE_SIMILARITY") or "0.95")
+
     sqlite_path: str = _env("SQLITE_PATH") or os.path.abspath("./backend/pet_state.db")
+    sqlite_busy_timeout_ms: int = int(_env("SQLITE_BUSY_TIMEOUT_MS") or "5000")
+    sqlite_cache_kib: int = int(_env("SQLITE_CACHE_KIB") or "16384")
+    sqlite_mmap_bytes: int = int(_env("SQLITE_MMAP_BYTES") or str(256 * 1024 * 1024))
+    # >1 splits the pet store into that many files by hash of pet_id, so
+    # writes for different pets do not share one SQLite write lock.
+    pet_store_shards: int = int(_env("PET_STORE_SHARDS") or "1")
+    pet_state_cache: bool = (_env("PET_STATE_CACHE") or "1") == "1"
+    pet_state_cache_size: int = int(_env("PET_STATE_CACHE_SIZE") or "10000")
+
+    # Write-behind: queue interaction/overlay inserts for a group-committing
+    # writer thread. MAX_DELAY_MS bounds how long a row can sit uncommitted.
+    pet_store_write_behind: bool = (_env("PET_STORE_WRITE_BEHIND") or "0") == "1"
+    write_behind_max_queue: int = int(_env("WRITE_BEHIND_MAX_QUEUE") or "10000")
+    write_behind_max_batch: int = int(_env("WRITE_BEHIND_MAX_BATCH") or "500")
+    write_behind_max_delay_ms: int = int(_env("WRITE_BEHIND_MAX_DELAY_MS") or "50")
+
+    # Optional zstd compression of JSON columns ("zstd" or "none"). Reads
+    # handle both forms, so this can be flipped without rewriting rows.
+    pet_store_compression: str = _env("PET_STORE_COMPRESSION") or "none"
+    pet_store_zstd_level: int = int(_env("PET_STORE_ZSTD_LEVEL") or "3")
+
+    # Retention, applied per pet by the background compaction task; 0 = off.
+    retention_max_age_days: float = float(_env("RETENTION_MAX_AGE_DAYS") or "0")
+    retention_max_interactions: int = int(_env("RETENTION_MAX_INTERACTIONS") or "0")
+    retention_max_overlay_edges: int = int(_env("RETENTION_MAX_OVERLAY_EDGES") or "0")
+    retention_archive_dir: str | None = _env("RETENTION_ARCHIVE_DIR")
+    compaction_interval_s: float = float(_env("COMPACTION_INTERVAL_S") or "3600")
+    compaction_budget_ms: float = float(_env("COMPACTION_BUDGET_MS") or "200")
+
+    # Admission control for LLM-bound routes: "path=lane:max_in_flight,...",
+    # lanes interactive > batch > background, under one shared in-flight cap.
+    # A full queue (or a wait past QUEUE_TIMEOUT_S) gets 429 + Retry-After.
+    # /qa/batch is admitted per item, so its cap counts model calls and
+    # leaves a slot for interactive requests.
+    admission: bool = (_env("ADMISSION") or "1") == "1"
+    admission_routes: str = _env("ADMISSION_ROUTES") or (
+        "/qa=interactive:4,/llm/chat=interactive:2,"
+        "/qa/batch=batch:3,/dilemma/next=background:1"
+    )
+    admission_max_in_flight: int = int(_env("ADMISSION_MAX_IN_FLIGHT") or "4")
+    admission_max_queue: int = int(_env("ADMISSION_MAX_QUEUE") or "32")
+    admission_queue_timeout_s: float = float(_env("ADMISSION_QUEUE_TIMEOUT_S") or "30")
+
+    # Background model health probe; /ready and /health/models serve the
+    # cached result. A result older than 3 intervals counts as down. 0 probes
+    # on every request instead (still the cheap probe).
+    model_probe_interval_s: float = float(_env("MODEL_PROBE_INTERVAL_S") or "15")
+    model_probe_timeout_s: float = float(_env("MODEL_PROBE_TIMEOUT_S") or "5")
+
+    # After the components load (in parallel, off the import path), embed
+    # once, evaluate the /qa system prompt and scan Kuzu before /ready
+    # reports ok, so the first requests do not pay the cold start.
+    startup_warmup: bool = (_env("STARTUP_WARMUP") or "1") == "1"
+
+    # On-demand profiling of single requests, sent with an X-Profile-Token
+    # header (or ?profile_token=) matching PROFILE_TOKEN; unset = disabled.
+    # One profile at a time, at most one per PROFILE_MIN_INTERVAL_S.
+    profile_token: str | None = _env("PROFILE_TOKEN")
+    profile_dir: str = _env("PROFILE_DIR") or os.path.abspath("./data/profiles")
+    profile_interval_ms: float = float(_env("PROFILE_INTERVAL_MS") or "5")
+    profile_min_interval_s: float = float(_env("PROFILE_MIN_INTERVAL_S") or "60")
+    profile_keep: int = int(_env("PROFILE_KEEP") or "20")
 
     cors_origins: list[str] = field(
         default_factory=lambda: (_env("CORS_ORIGINS") or "http://localhost:3000").split(
@@ -0,0 +1,49 @@
+"""Single-pass JSON responses for large, already-trusted payloads.
+
+Routes that build big graph bundles return plain dicts through
+``FastJSONResponse`` instead of pydantic models: FastAPI skips its
+``response_model`` validation for ``Response`` objects (the model still
+documents the route), and orjson encodes the dicts in one pass. Falls back
+to the stdlib encoder when orjson is not installed.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, set | frozenset):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, default=_default, option=option)
+    return json.dumps(
+        value,
+        default=_default,
+        sort_keys=sort_keys,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,132 @@
+"""Versioned graph snapshots so clients can fetch only what changed.
+
+Every graph the API returns is fingerprinted (per node/edge content hash) and
+remembered under a short version token. A client that sends back a token it
+already holds gets a ``GraphDelta`` with just the added/changed and removed
+elements. Tokens live in a per-process LRU, so an unknown or evicted token
+simply yields a full delta (``full=True``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .fast_json import dumps
+from .schemas import GraphBundleData, GraphDeltaData, GraphEdgeData, GraphNodeData
+
+Fingerprints = tuple[dict[str, str], dict[str, str]]
+
+
+def edge_key(edge: GraphEdgeData) -> str:
+    return edge["id"] or f"{edge['source']}->{edge['target']}"
+
+
+def merge_bundles(*bundles: GraphBundleData) -> GraphBundleData:
+    """Union of several bundles, first occurrence of each node/edge id wins."""
+    nodes: dict[str, GraphNodeData] = {}
+    edges: dict[str, GraphEdgeData] = {}
+    for bundle in bundles:
+        for node in bundle["nodes"]:
+            nodes.setdefault(node["id"], node)
+        for edge in bundle["edges"]:
+            edges.setdefault(edge_key(edge), edge)
+    return {
+        "nodes": list(nodes.values()),
+        "edges": list(edges.values()),
+        "version": None,
+    }
+
+
+def _digest(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def fingerprint(bundle: GraphBundleData) -> Fingerprints:
+    nodes = {n["id"]: _digest(dumps(n, sort_keys=True)) for n in bundle["nodes"]}
+    edges = {edge_key(e): _digest(dumps(e, sort_keys=True)) for e in bundle["edges"]}
+    return nodes, edges
+
+
+def version_of(prints: Fingerprints) -> str:
+    nodes, edges = prints
+    h = hashlib.blake2b(digest_size=12)
+    for key in sorted(nodes):
+        h.update(f"n{key}\0{nodes[key]}\0".encode())
+    for key in sorted(edges):
+        h.update(f"e{key}\0{edges[key]}\0".encode())
+    return h.hexdigest()
+
+
+class GraphVersionCache:
+    """Thread-safe LRU of version token -> node/edge fingerprints."""
+
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Fingerprints] = OrderedDict()
+
+    def remember(self, bundle: GraphBundleData) -> tuple[str, Fingerprints]:
+        prints = fingerprint(bundle)
+        version = version_of(prints)
+        with self._lock:
+            self._entries[version] = prints
+            self._entries.move_to_end(version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return version, prints
+
+    def get(self, version: str) -> Fingerprints | None:
+        with self._lock:
+            prints = self._entries.get(version)
+            if prints is not None:
+                self._entries.move_to_end(version)
+            return prints
+
+
+def diff(
+    bundle: GraphBundleData,
+    cache: GraphVersionCache,
+    since: str | None = None,
+    known_node_ids: list[str] | None = None,
+    known_edge_ids: list[str] | None = None,
+) -> GraphDeltaData:
+    """Delta from what the client holds to ``bundle``.
+
+    ``since`` (a version token) takes precedence and also detects changed
+    elements; bare id lists only detect additions and removals.
+    """
+    version, (nodes, edges) = cache.remember(bundle)
+    base = cache.get(since) if since else None
+    if base is not None:
+        base_nodes, base_edges = base
+    elif known_node_ids is not None or known_edge_ids is not None:
+        base_nodes = {i: nodes.get(i, "") for i in known_node_ids or []}
+        base_edges = {i: edges.get(i, "") for i in known_edge_ids or []}
+    else:
+        return {
+            "version": version,
+            "base_version": None,
+            "full": True,
+            "nodes": bundle["nodes"],
+            "edges": bundle["edges"],
+            "removed_node_ids": [],
+            "removed_edge_ids": [],
+        }
+
+    return {
+        "version": version,
+        "base_version": since if base is not None else None,
+        "full": False,
+        "nodes": [
+            n for n in bundle["nodes"] if base_nodes.get(n["id"]) != nodes[n["id"]]
+        ],
+        "edges": [
+            e
+            for e in bundle["edges"]
+            if base_edges.get(edge_key(e)) != edges[edge_key(e)]
+        ],
+        "removed_node_ids": [i for i in base_nodes if i not in nodes],
+        "removed_edge_ids": [i for i in base_edges if i not in edges],
+    }
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, cast
 
 try:
@@ -31,20 +32,26 @@ class InprocLLM:
 
         self._lock = threading.Lock()
 
-        self._chat = Llama(
-            model_path=chat_model_path,
-            n_ctx=n_ctx,
-            n_threads=n_threads,
-            chat_format=chat_format,
-            logits_all=False,
-            embedding=False,
-        )
-        self._embed = Llama(
-            model_path=embed_model_path,
-            n_ctx=embed_ctx,
-            n_threads=embed_threads,
-            embedding=True,
-        )
+        # Both loads are mostly file I/O inside llama.cpp, which releases the GIL.
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            chat = pool.submit(
+                Llama,
+                model_path=chat_model_path,
+                n_ctx=n_ctx,
+                n_threads=n_threads,
+                chat_format=chat_format,
+                logits_all=False,
+                embedding=False,
+            )
+            embed = pool.submit(
+                Llama,
+                model_path=embed_model_path,
+                n_ctx=embed_ctx,
+                n_threads=embed_threads,
+                embedding=True,
+            )
+            self._chat = chat.result()
+            self._embed = embed.result()
 
     def chat(
         self,
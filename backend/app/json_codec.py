@@ -0,0 +1,115 @@
+"""Optional zstd compression for JSON text columns in the pet store.
+
+Compressed values are stored as BLOBs and plain values as TEXT, so a column
+can hold both while rows are being rewritten. zstd frames carry the id of
+the dictionary they were made with, so old rows stay readable after a newer
+dictionary is trained.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable
+
+try:
+    import zstandard
+except Exception:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+# Below this size the frame header outweighs any saving.
+MIN_COMPRESS_BYTES = 64
+
+
+def available() -> bool:
+    return zstandard is not None
+
+
+def train_dictionary(samples: Iterable[str], dict_size: int) -> tuple[int, bytes]:
+    """Train a zstd dictionary from sample values; returns (dict_id, bytes)."""
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    data: list[bytes | bytearray | memoryview] = [s.encode("utf-8") for s in samples]
+    trained = zstandard.train_dictionary(dict_size, data)
+    return trained.dict_id(), trained.as_bytes()
+
+
+class JsonCodec:
+    """Encode JSON text for storage and decode either stored form back to text.
+
+    With ``enabled`` false, ``encode`` is the identity but ``decode`` still
+    reads compressed rows, so compression can be switched off at any time.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        level: int = 3,
+        dictionaries: dict[int, bytes] | None = None,
+        active_dict_id: int | None = None,
+    ) -> None:
+        if enabled and zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        self.enabled = enabled
+        self.level = level
+        self._dicts = (
+            {
+                dict_id: zstandard.ZstdCompressionDict(raw)
+                for dict_id, raw in (dictionaries or {}).items()
+            }
+            if zstandard is not None
+            else {}
+        )
+        self.active_dict_id = active_dict_id if active_dict_id in self._dicts else None
+        # zstandard (de)compressor objects are not safe to share across threads.
+        self._local = threading.local()
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        comp = getattr(self._local, "compressor", None)
+        if comp is None:
+            dict_data = (
+                self._dicts[self.active_dict_id]
+                if self.active_dict_id is not None
+                else None
+            )
+            comp = zstandard.ZstdCompressor(
+                level=self.level, dict_data=dict_data, write_content_size=True
+            )
+            self._local.compressor = comp
+        return comp
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        cache = getattr(self._local, "decompressors", None)
+        if cache is None:
+            cache = self._local.decompressors = {}
+        dec = cache.get(dict_id)
+        if dec is None:
+            if dict_id and dict_id not in self._dicts:
+                raise ValueError(f"unknown zstd dictionary id {dict_id}")
+            dec = (
+                zstandard.ZstdDecompressor(dict_data=self._dicts[dict_id])
+                if dict_id
+                else zstandard.ZstdDecompressor()
+            )
+            cache[dict_id] = dec
+        return dec
+
+    def encode(self, text: str) -> str | bytes:
+        if not self.enabled:
+            return text
+        raw = text.encode("utf-8")
+        if len(raw) < MIN_COMPRESS_BYTES:
+            return text
+        packed = self._compressor().compress(raw)
+        return packed if len(packed) < len(raw) else text
+
+    def decode(self, value: str | bytes | None) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            return value
+        if zstandard is None:
+            raise RuntimeError(
+                "zstandard is not installed; cannot read compressed rows"
+            )
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        return self._decompressor(dict_id).decompress(value).decode("utf-8")
@@ -10,6 +10,34 @@ except Exception:  # pragma: no cover
 
 from .config import settings
 
+VENDOR_STATS_FIELDS = (
+    "vendor_id",
+    "invoice_count",
+    "total_sum",
+    "total_mean",
+    "total_std",
+    "total_p50",
+    "total_p90",
+    "total_p99",
+    "total_max",
+    "last_invoice_date",
+    "overdue_count",
+    "as_of",
+)
+
+SKU_STATS_FIELDS = (
+    "sku",
+    "invoice_count",
+    "vendor_count",
+    "total_mean",
+    "total_std",
+    "total_p50",
+    "total_p90",
+    "last_invoice_date",
+    "overdue_count",
+    "as_of",
+)
+
 
 class KuzuAdapter:
     def __init__(self) -> None:
@@ -30,6 +58,48 @@ class KuzuAdapter:
     def enabled(self) -> bool:
         return self._enabled
 
+    def warm_up(self) -> None:
+        """Scan the tables the neighborhood queries hit, filling the buffer pool."""
+        if not self._enabled or self._conn is None:
+            return
+        for query in (
+            "MATCH (v:Vendor)-[:Issued]->(i:Invoice)-[:Contains]->(s:SKU) "
+            "RETURN count(*)",
+            "MATCH (c:Chunk)-[:Mentions]->(e:Entity) RETURN count(*)",
+        ):
+            try:
+                self._conn.execute(query)
+            except Exception:
+                # A graph build without these tables; nothing to warm.
+                continue
+
+    def vendor_stats(self, vendor_id: str) -> dict[str, Any] | None:
+        """Materialized vendor aggregates (primary-key lookup), if built."""
+        return self._stats_lookup(
+            "VendorStats", "vendor_id", vendor_id, VENDOR_STATS_FIELDS
+        )
+
+    def sku_stats(self, sku: str) -> dict[str, Any] | None:
+        return self._stats_lookup("SKUStats", "sku", sku, SKU_STATS_FIELDS)
+
+    def _stats_lookup(
+        self, table: str, key: str, value: str, fields: tuple[str, ...]
+    ) -> dict[str, Any] | None:
+        if not self._enabled or self._conn is None:
+            return None
+        columns = ", ".join(f"s.{f}" for f in fields)
+        try:
+            res: Any = self._conn.execute(
+                f"MATCH (s:{table} {{{key}: $value}}) RETURN {columns}",
+                {"value": str(value)},
+            )
+            if not res.has_next():
+                return None
+            return dict(zip(fields, res.get_next(), strict=True))
+        except Exception:
+            # Older graph builds have no stats tables.
+            return None
+
     def neighborhood(
         self, anchors: dict[str, set[str]], depth: int = 2
     ) -> dict[str, Any]:
@@ -37,8 +107,7 @@ class KuzuAdapter:
             return {"nodes": [], "edges": []}
 
         try:
-            nodes: dict[str, dict[str, Any]] = {}
-            edges: list[dict[str, Any]] = []
+            graph = _GraphBuilder()
 
             vendor_ids = anchors.get("vendor_id", set())
             invoice_ids = anchors.get("transaction_id", set())
@@ -46,200 +115,164 @@ class KuzuAdapter:
 
             # Vendor-centered neighborhood
             for vid in list(vendor_ids)[:20]:
+                vid = str(vid)
                 res: Any = self._conn.execute(
-                    "MATCH (v:Vendor {vendor_id: $vid})-[:Issued]->(i:Invoice)-[:Contains]->(s:SKU) RETURN v,i,s LIMIT 50",
-                    {"vid": str(vid)},
+                    "MATCH (v:Vendor {vendor_id: $vid})-[:Issued]->(i:Invoice)-[:Contains]->(s:SKU) "
+                    "RETURN i.invoice_id, i.total, i.date, i.due_date, s.sku, s.product LIMIT 50",
+                    {"vid": vid},
                 )
                 while res.has_next():
-                    v, i, s = res.get_next()
-                    v_id = f"vendor:{getattr(v, 'vendor_id', vid)}"
-                    i_id = f"invoice:{getattr(i, 'invoice_id', '')}"
-                    s_id = f"sku:{getattr(s, 'sku', '')}"
-
-                    nodes.setdefault(
-                        v_id,
-                        {
-                            "id": v_id,
-                            "label": f"Vendor {getattr(v, 'vendor_id', vid)}",
-                            "group": "vendor",
-                            "type": "vendor",
-                            "meta": {"vendor_id": getattr(v, "vendor_id", vid)},
-                            "properties": {
-                                "vendor_id": getattr(v, "vendor_id", vid),
-                                "tooltip": f"Vendor {getattr(v, 'vendor_id', vid)}",
-                            },
-                        },
-                    )
-                    nodes.setdefault(
-                        i_id,
-                        {
-                            "id": i_id,
-                            "label": f"{getattr(i, 'invoice_id', '')} | ${getattr(i, 'total', '')}",
-                            "group": "transaction",
-                            "type": "transaction",
-                            "meta": {"invoice_id": getattr(i, "invoice_id", "")},
-                            "properties": {
-                                "invoice_id": getattr(i, "invoice_id", ""),
-                                "total": getattr(i, "total", None),
-                                "date": getattr(i, "date", None),
-                                "due_date": getattr(i, "due_date", None),
-                                "tooltip": f"Invoice {getattr(i, 'invoice_id', '')} | ${getattr(i, 'total', '')} | due {getattr(i, 'due_date', '')}",
-                            },
-                        },
-                    )
-                    nodes.setdefault(
-                        s_id,
-                        {
-                            "id": s_id,
-                            "label": f"{getattr(s, 'sku', '')} | {getattr(s, 'product', '')}",
-                            "group": "entity",
-                            "type": "entity",
-                            "meta": {"sku": getattr(s, "sku", "")},
-                            "properties": {
-                                "sku": getattr(s, "sku", ""),
-                                "product": getattr(s, "product", ""),
-                                "tooltip": f"{getattr(s, 'sku', '')} | {getattr(s, 'product', '')}",
-                            },
-                        },
-                    )
-
-                    edges.append(
-                        {
-                            "id": f"{v_id}->{i_id}",
-                            "source": v_id,
-                            "target": i_id,
-                            "label": "ISSUED",
-                            "weight": 1.0,
-                            "meta": {},
-                        }
-                    )
-                    edges.append(
-                        {
-                            "id": f"{i_id}->{s_id}",
-                            "source": i_id,
-                            "target": s_id,
-                            "label": "CONTAINS",
-                            "weight": 1.0,
-                            "meta": {},
-                        }
-                    )
+                    iid, total, date, due, sku, product = res.get_next()
+                    v_id = graph.vendor(vid)
+                    i_id = graph.invoice(iid, total, date, due)
+                    s_id = graph.sku(sku, product)
+                    graph.edge(v_id, i_id, "ISSUED")
+                    graph.edge(i_id, s_id, "CONTAINS")
 
             # Invoice-centered neighborhood
             for iid in list(invoice_ids)[:20]:
+                iid = str(iid)
                 res = self._conn.execute(
-                    "MATCH (i:Invoice {invoice_id: $iid})-[:Contains]->(s:SKU) OPTIONAL MATCH (v:Vendor)-[:Issued]->(i) RETURN v,i,s LIMIT 50",
-                    {"iid": str(iid)},
+                    "MATCH (i:Invoice {invoice_id: $iid})-[:Contains]->(s:SKU) "
+                    "OPTIONAL MATCH (v:Vendor)-[:Issued]->(i) "
+                    "RETURN v.vendor_id, i.total, i.date, i.due_date, s.sku, s.product LIMIT 50",
+                    {"iid": iid},
                 )
                 while res.has_next():
-                    v, i, s = res.get_next()
-                    if v is not None:
-                        v_id = f"vendor:{getattr(v, 'vendor_id', '')}"
-                        nodes.setdefault(
-                            v_id,
-                            {
-                                "id": v_id,
-                                "label": f"Vendor {getattr(v, 'vendor_id', '')}",
-                                "group": "Vendor",
-                                "type": "Vendor",
-                                "meta": {"vendor_id": getattr(v, "vendor_id", "")},
-                                "properties": {
-                                    "vendor_id": getattr(v, "vendor_id", ""),
-                                    "tooltip": f"Vendor {getattr(v, 'vendor_id', '')}",
-                                },
-                            },
-                        )
-                    i_id = f"invoice:{getattr(i, 'invoice_id', iid)}"
-                    nodes.setdefault(
-                        i_id,
-                        {
-                            "id": i_id,
-                            "label": f"{getattr(i, 'invoice_id', iid)} | ${getattr(i, 'total', '')}",
-                            "group": "transaction",
-                            "type": "transaction",
-                            "meta": {"invoice_id": getattr(i, "invoice_id", iid)},
-                            "properties": {
-                                "invoice_id": getattr(i, "invoice_id", iid),
-                                "total": getattr(i, "total", None),
-                                "date": getattr(i, "date", None),
-                                "due_date": getattr(i, "due_date", None),
-                                "tooltip": f"Invoice {getattr(i, 'invoice_id', iid)} | ${getattr(i, 'total', '')} | due {getattr(i, 'due_date', '')}",
-                            },
-                        },
-                    )
-                    if s is not None:
-                        s_id = f"sku:{getattr(s, 'sku', '')}"
-                        nodes.setdefault(
-                            s_id,
-                            {
-                                "id": s_id,
-                                "label": f"{getattr(s, 'sku', '')} | {getattr(s, 'product', '')}",
-                                "group": "SKU",
-                                "type": "SKU",
-                                "meta": {"sku": getattr(s, "sku", "")},
-                                "properties": {
-                                    "sku": getattr(s, "sku", ""),
-                                    "product": getattr(s, "product", ""),
-                                    "tooltip": f"{getattr(s, 'sku', '')} | {getattr(s, 'product', '')}",
-                                },
-                            },
-                        )
-                        edges.append(
-                            {
-                                "id": f"{i_id}->{s_id}",
-                                "source": i_id,
-                                "target": s_id,
-                                "label": "CONTAINS",
-                                "weight": 1.0,
-                                "meta": {},
-                            }
-                        )
+                    vid, total, date, due, sku, product = res.get_next()
+                    i_id = graph.invoice(iid, total, date, due)
+                    if vid is not None:
+                        graph.edge(graph.vendor(vid), i_id, "ISSUED")
+                    if sku is not None:
+                        graph.edge(i_id, graph.sku(sku, product), "CONTAINS")
 
             # Chunk fallback (if no vendor/invoice anchors)
-            if not nodes and chunk_ids:
+            if not graph.nodes and chunk_ids:
                 for cid in list(chunk_ids)[:20]:
                     res = self._conn.execute(
-                        "MATCH (c:Chunk {chunk_id: $cid})-[:Mentions]->(e:Entity) RETURN c,e LIMIT 50",
+                        "MATCH (c:Chunk {chunk_id: $cid})-[:Mentions]->(e:Entity) "
+                        "RETURN e.entity_id, e.name, e.type LIMIT 50",
                         {"cid": cid},
                     )
                     while res.has_next():
-                        c, e = res.get_next()
-                        c_id = f"chunk:{cid}"
-                        e_id = f"entity:{getattr(e, 'entity_id', '')}"
-                        nodes.setdefault(
-                            c_id,
-                            {
-                                "id": c_id,
-                                "label": cid,
-                                "group": "entity",
-                                "type": "entity",
-                                "meta": {"chunk_id": cid},
-                                "properties": {"chunk_id": cid},
-                            },
-                        )
-                        nodes.setdefault(
-                            e_id,
-                            {
-                                "id": e_id,
-                                "label": getattr(e, "name", None) or e_id,
-                                "group": getattr(e, "type", None) or "Entity",
-                                "type": getattr(e, "type", None) or "Entity",
-                                "meta": {"entity_id": getattr(e, "entity_id", None)},
-                                "properties": {
-                                    "entity_id": getattr(e, "entity_id", None)
-                                },
-                            },
-                        )
-                        edges.append(
-                            {
-                                "id": f"{c_id}->{e_id}",
-                                "source": c_id,
-                                "target": e_id,
-                                "label": "MENTIONS",
-                                "weight": 1.0,
-                                "meta": {},
-                            }
-                        )
-
-            return {"nodes": list(nodes.values()), "edges": edges}
+                        eid, name, etype = res.get_next()
+                        c_id = graph.chunk(cid)
+                        graph.edge(c_id, graph.entity(eid, name, etype), "MENTIONS")
+
+            return graph.bundle()
         except Exception:
             return {"nodes": [], "edges": []}
+
+
+class _GraphBuilder:
+    """Accumulates graph rows, deduplicating nodes and edges by id in one pass.
+
+    ``group`` is the specific node kind and ``type`` the frontend render type,
+    matching the vocabulary used by ``graph_fallback``.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: dict[str, dict[str, Any]] = {}
+        self.edges: dict[str, dict[str, Any]] = {}
+
+    def bundle(self) -> dict[str, Any]:
+        return {"nodes": list(self.nodes.values()), "edges": list(self.edges.values())}
+
+    def _node(
+        self,
+        node_id: str,
+        label: str,
+        group: str,
+        node_type: str,
+        meta: dict[str, Any],
+        properties: dict[str, Any],
+    ) -> str:
+        self.nodes[node_id] = {
+            "id": node_id,
+            "label": label,
+            "group": group,
+            "type": node_type,
+            "meta": meta,
+            "properties": properties,
+        }
+        return node_id
+
+    def vendor(self, vid: str) -> str:
+        node_id = f"vendor:{vid}"
+        if node_id in self.nodes:
+            return node_id
+        label = f"Vendor {vid}"
+        return self._node(
+            node_id,
+            label,
+            "vendor",
+            "vendor",
+            {"vendor_id": vid},
+            {"vendor_id": vid, "tooltip": label},
+        )
+
+    def invoice(self, iid: str, total: Any, date: Any, due: Any) -> str:
+        node_id = f"invoice:{iid}"
+        if node_id in self.nodes:
+            return node_id
+        return self._node(
+            node_id,
+            f"{iid} | ${total}",
+            "transaction",
+            "transaction",
+            {"invoice_id": iid},
+            {
+                "invoice_id": iid,
+                "total": total,
+                "date": date,
+                "due_date": due,
+                "tooltip": f"Invoice {iid} | ${total} | due {due}",
+            },
+        )
+
+    def sku(self, sku: str, product: Any) -> str:
+        node_id = f"sku:{sku}"
+        if node_id in self.nodes:
+            return node_id
+        label = f"{sku} | {product or ''}"
+        return self._node(
+            node_id,
+            label,
+            "sku",
+            "entity",
+            {"sku": sku},
+            {"sku": sku, "product": product or "", "tooltip": label},
+        )
+
+    def chunk(self, cid: str) -> str:
+        node_id = f"chunk:{cid}"
+        if node_id in self.nodes:
+            return node_id
+        return self._node(
+            node_id, cid, "chunk", "entity", {"chunk_id": cid}, {"chunk_id": cid}
+        )
+
+    def entity(self, eid: str, name: Any, etype: Any) -> str:
+        node_id = f"entity:{eid}"
+        if node_id in self.nodes:
+            return node_id
+        return self._node(
+            node_id,
+            name or node_id,
+            "entity",
+            "entity",
+            {"entity_id": eid},
+            {"entity_id": eid, "entity_type": etype or None},
+        )
+
+    def edge(self, source: str, target: str, label: str) -> None:
+        edge_id = f"{source}->{target}"
+        if edge_id not in self.edges:
+            self.edges[edge_id] = {
+                "id": edge_id,
+                "source": source,
+                "target": target,
+                "label": label,
+                "weight": 1.0,
+                "meta": {},
+            }
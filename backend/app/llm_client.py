@@ -9,6 +9,7 @@ import httpx
 
 from .config import settings
 from .inproc_llm import InprocLLM
+from .metrics import record_usage, stage
 
 
 class LLMClient:
@@ -22,6 +23,10 @@ class LLMClient:
         self.temperature = float(os.environ.get("LLM_TEMPERATURE", "0.2"))
 
     def embed(self, text: str) -> list[float]:
+        with stage("embed"):
+            return self._embed(text)
+
+    def _embed(self, text: str) -> list[float]:
         if self.inproc is not None:
             return self.inproc.embed(text)
         url = f"{self.embed_base}/embeddings"
@@ -35,12 +40,97 @@ class LLMClient:
             data = resp.json()
         return data["data"][0]["embedding"]
 
-    def chat(self, messages: list[dict[str, str]]) -> str:
+    def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts in one request (one call per text in-process)."""
+        if not texts:
+            return []
         if self.inproc is not None:
-            result = self.inproc.chat(
+            with stage("embed"):
+                return [self.inproc.embed(text) for text in texts]
+        url = f"{self.embed_base}/embeddings"
+        payload = {
+            "model": settings.llm_embed_model,
+            "input": texts,
+        }
+        with stage("embed"), httpx.Client(timeout=60.0) as client:
+            resp = client.post(url, json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+        rows = sorted(data["data"], key=lambda d: d.get("index", 0))
+        return [row["embedding"] for row in rows]
+
+    def _server_health(self, base: str) -> bool:
+        """llama-server's ``GET /health``; False if the server has no such route."""
+        root = base.removesuffix("/v1")
+        with httpx.Client(timeout=settings.model_probe_timeout_s) as client:
+            resp = client.get(f"{root}/health")
+        if resp.status_code == 404:
+            return False
+        # 503 while the model is still loading.
+        resp.raise_for_status()
+        return True
+
+    def probe_chat(self) -> None:
+        """Cheapest chat liveness check; raises if the model is not serving."""
+        if self.inproc is not None or self._server_health(self.chat_base):
+            return
+        payload = {
+            "model": settings.llm_chat_model,
+            "messages": [{"role": "user", "content": "ping"}],
+            "temperature": 0,
+            "max_tokens": 1,
+        }
+        with httpx.Client(timeout=settings.model_probe_timeout_s) as client:
+            client.post(
+                f"{self.chat_base}/chat/completions", json=payload
+            ).raise_for_status()
+
+    def prime_prompt(self, system_prompt: str) -> None:
+        """Evaluate ``system_prompt`` once, generating a single token.
+
+        llama.cpp keeps the evaluated prefix (in process, or in the server's
+        prompt cache), so the first real request only pays for its own tokens.
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "ping"},
+        ]
+        if self.inproc is not None:
+            self.inproc.chat(messages, max_tokens=1, temperature=self.temperature)
+            return
+        payload = {
+            "model": settings.llm_chat_model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": 1,
+        }
+        with httpx.Client(timeout=60.0) as client:
+            client.post(
+                f"{self.chat_base}/chat/completions", json=payload
+            ).raise_for_status()
+
+    def probe_embed(self) -> None:
+        """Cheapest embedding liveness check; raises if the model is not serving."""
+        if self.inproc is not None or self._server_health(self.embed_base):
+            return
+        payload = {"model": settings.llm_embed_model, "input": "ping"}
+        with httpx.Client(timeout=settings.model_probe_timeout_s) as client:
+            client.post(
+                f"{self.embed_base}/embeddings", json=payload
+            ).raise_for_status()
+
+    def chat(self, messages: list[dict[str, str]], stage_name: str = "llm") -> str:
+        """One completion, timed as ``stage_name`` and counted in token metrics."""
+        with stage(stage_name):
+            data = self._complete(messages)
+        record_usage(data.get("usage"))
+        return data["choices"][0]["message"]["content"]
+
+    def _complete(self, messages: list[dict[str, str]]) -> dict[str, Any]:
+        if self.inproc is not None:
+            return self.inproc.chat(
                 messages, max_tokens=self.max_tokens, temperature=self.temperature
             )
-            return result["choices"][0]["message"]["content"]
         url = f"{self.chat_base}/chat/completions"
         payload = {
             "model": settings.llm_chat_model,
@@ -51,8 +141,7 @@ class LLMClient:
         with httpx.Client(timeout=60.0) as client:
             resp = client.post(url, json=payload)
             resp.raise_for_status()
-            data = resp.json()
-        return data["choices"][0]["message"]["content"]
+            return resp.json()
 
     def chat_json(self, messages: list[dict[str, str]]) -> dict[str, Any]:
         content = self.chat(messages)
@@ -72,7 +161,7 @@ class LLMClient:
                 },
                 {"role": "user", "content": content},
             ]
-            fixed = self.chat(fix_messages)
+            fixed = self.chat(fix_messages, stage_name="llm_repair")
             try:
                 return json.loads(fixed)
             except json.JSONDecodeError:
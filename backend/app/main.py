@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
 import time
-from typing import Annotated, cast
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import (
+    AbstractContextManager,
+    asynccontextmanager,
+    nullcontext,
+    suppress,
+)
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Annotated, Literal
 
 import httpx
-from fastapi import Body, FastAPI, Request, Response
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from qdrant_client.http.models import ScoredPoint
 
+from . import metrics
+from .admission import AdmissionController, AdmissionMiddleware, parse_routes
+from .answer_cache import AnswerCache, answer_scope
 from .config import settings
 from .dilemma_bank import DilemmaBank
 from .docstrings import (
@@ -17,35 +34,104 @@ from .docstrings import (
     QA_EXAMPLE_REQUEST,
     QA_EXAMPLE_RESPONSE,
 )
+from .fast_json import FastJSONResponse, dumps
+from .graph_delta import GraphVersionCache, diff, merge_bundles
 from .graph_fallback import build_graph_from_evidence
 from .kuzu_adapter import KuzuAdapter
 from .llm_client import LLMClient
 from .logging_setup import setup_logging
-from .pet_store import PetStore
+from .metrics import StageTimer, stage
+from .model_health import ModelProber
+from .pet_store import RetentionPolicy
+from .profiling import RequestProfiler
 from .qdrant_client import (
     extract_anchors,
     make_client,
     records_to_scored,
     retrieve_by_ids,
     search,
+    search_batch,
     to_evidence,
 )
 from .schemas import (
     AnswerJSON,
     DilemmaResponse,
-    EvidenceItem,
+    FeedbackBatchRequest,
+    FeedbackBatchResponse,
     FeedbackRequest,
     FeedbackResponse,
     GraphBundle,
-    GraphEdge,
-    GraphNode,
+    GraphBundleData,
+    GraphDelta,
+    GraphEdgeData,
+    GraphNodeData,
+    InteractionPage,
+    InteractionSummary,
     PetResponse,
+    QABatchItem,
+    QABatchRequest,
     QARequest,
     QAResponse,
+    VendorStats,
 )
+from .sharded_pet_store import open_pet_store
+from .single_flight import SingleFlight
+from .startup import Startup, StartupGate
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+    from .pet_store import PetStore
+    from .sharded_pet_store import ShardedPetStore
 
 setup_logging()
 logger = logging.getLogger("finagotchi.api")
+
+
+async def _compaction_loop(policy: RetentionPolicy) -> None:
+    """Apply retention in small time-boxed steps so requests barely notice."""
+    await startup.wait()
+    while True:
+        await asyncio.sleep(settings.compaction_interval_s)
+        try:
+            result = await asyncio.to_thread(
+                pet_store.compact, policy, budget_ms=settings.compaction_budget_ms
+            )
+            if result["archived"] or result["rolled_up"] or result["vacuumed_pages"]:
+                logger.info("pet store compaction: %s", result)
+        except Exception:
+            logger.exception("pet store compaction failed")
+
+
+async def _model_probe_loop() -> None:
+    """Refresh the cached model status; the first probe runs after startup."""
+    await startup.wait()
+    while True:
+        await asyncio.to_thread(model_prober.probe_once)
+        await asyncio.sleep(settings.model_probe_interval_s)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    policy = RetentionPolicy.from_settings()
+    # Not awaited: /health answers while the components load.
+    tasks = [asyncio.create_task(startup.run())]
+    if settings.compaction_interval_s > 0 and policy.enabled():
+        tasks.append(asyncio.create_task(_compaction_loop(policy)))
+    if settings.model_probe_interval_s > 0:
+        tasks.append(asyncio.create_task(_model_probe_loop()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Flush any write-behind rows before the process exits.
+    if startup.loaded("pet_store"):
+        pet_store.close()
+    if answer_cache is not None:
+        answer_cache.close()
+
+
 app = FastAPI(
     title="Finagotchi API",
     description=(
@@ -56,7 +142,111 @@ app = FastAPI(
     version="0.1.0",
     docs_url="/",
     redoc_url="/redoc",
+    lifespan=lifespan,
+)
+admission = AdmissionController(
+    parse_routes(settings.admission_routes),
+    max_in_flight=settings.admission_max_in_flight,
+    max_queue=settings.admission_max_queue,
+    queue_timeout_s=settings.admission_queue_timeout_s,
+)
+if settings.admission:
+    # /qa/batch takes a batch-lane slot per item instead; see _qa_batch_lines.
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission, per_call={"/qa/batch"}
+    )
+
+# Built by the lifespan's startup task (see _load_* below), not at import.
+llm: LLMClient
+qdrant: QdrantClient
+kuzu: KuzuAdapter
+pet_store: PetStore | ShardedPetStore
+bank = DilemmaBank()
+graph_versions = GraphVersionCache(settings.graph_version_cache_size)
+answer_cache = AnswerCache() if settings.answer_cache else None
+model_prober = ModelProber(
+    {"chat": lambda: llm.probe_chat(), "embed": lambda: llm.probe_embed()},
+    # With MODEL_PROBE_INTERVAL_S=0 every /health/models call probes afresh,
+    # so results never go stale.
+    stale_after_s=(
+        3 * settings.model_probe_interval_s
+        if settings.model_probe_interval_s > 0
+        else float("inf")
+    ),
+)
+profiler = RequestProfiler(
+    settings.profile_token,
+    settings.profile_dir,
+    interval_s=settings.profile_interval_ms / 1000,
+    min_interval_s=settings.profile_min_interval_s,
+    keep=settings.profile_keep,
+)
+
+# Part of the answer cache key: bump when the /qa prompt changes.
+QA_PROMPT_VERSION = "1"
+QA_SYSTEM_PROMPT = (
+    "You are a finance/ops auditor agent. Analyze the evidence and return a JSON decision.\n"
+    "Example response:\n"
+    '{"decision":"flag","confidence":0.7,"rationale":"Amount exceeds vendor average by 3x.","evidence_ids":[],"overlay_edges":[]}\n\n'
+    "Rules:\n"
+    "- decision must be one of: approve, flag, reject, escalate\n"
+    "- confidence is 0.0 to 1.0\n"
+    "- rationale is a brief explanation (1-2 sentences)\n"
+    "- Return ONLY valid JSON, no other text"
+)
+
+
+def _load_llm() -> None:
+    global llm
+    llm = LLMClient()
+
+
+def _load_qdrant() -> None:
+    global qdrant
+    qdrant = make_client()
+
+
+def _load_kuzu() -> None:
+    global kuzu
+    kuzu = KuzuAdapter()
+
+
+def _load_pet_store() -> None:
+    global pet_store
+    pet_store = open_pet_store()
+
+
+startup = Startup(
+    {
+        "llm": _load_llm,
+        "qdrant": _load_qdrant,
+        "kuzu": _load_kuzu,
+        "pet_store": _load_pet_store,
+    },
+    warmups={
+        "embed": lambda: llm.embed("warm-up"),
+        "chat_prefix": lambda: llm.prime_prompt(QA_SYSTEM_PROMPT),
+        "kuzu": lambda: kuzu.warm_up(),
+        "qdrant": lambda: qdrant.get_collection(settings.qdrant_collection),
+    }
+    if settings.startup_warmup
+    else None,
+)
+app.add_middleware(
+    StartupGate,
+    startup=startup,
+    open_paths={
+        "/",
+        "/redoc",
+        "/openapi.json",
+        "/health",
+        "/health/models",
+        "/health/admission",
+        "/ready",
+        "/metrics",
+    },
 )
+# Outermost, so the 429s and 503s above still carry CORS headers.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -65,41 +255,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-llm = LLMClient()
-qdrant = make_client()
-kuzu = KuzuAdapter()
-pet_store = PetStore()
-bank = DilemmaBank()
 
+def _opt_str(value: object) -> str | None:
+    return None if value is None else str(value)
+
+
+def _normalize_node(n: dict) -> GraphNodeData:
+    meta = n.get("meta") or {}
+    return {
+        "id": str(n.get("id")),
+        "label": _opt_str(n.get("label")),
+        "group": _opt_str(n.get("group")),
+        "type": _opt_str(n.get("type") or n.get("group")),
+        "meta": meta,
+        "properties": n.get("properties") or meta,
+    }
+
+
+def _normalize_edge(e: dict) -> GraphEdgeData:
+    weight = e.get("weight")
+    is_overlay = e.get("isOverlay")
+    return {
+        "id": _opt_str(e.get("id")),
+        "source": str(e.get("source")),
+        "target": str(e.get("target")),
+        "label": _opt_str(e.get("label")),
+        "weight": None if weight is None else float(weight),
+        "meta": e.get("meta") or {},
+        "isOverlay": None if is_overlay is None else bool(is_overlay),
+    }
 
-def _normalize_graph(bundle: dict) -> GraphBundle:
-    """Convert raw graph dicts into validated GraphBundle with normalized types."""
-    nodes: list[GraphNode] = []
-    for n in bundle.get("nodes", []):
-        nodes.append(
-            GraphNode(
-                id=n.get("id"),
-                label=n.get("label"),
-                type=n.get("type") or n.get("group"),
-                group=n.get("group"),
-                meta=n.get("meta", {}),
-                properties=n.get("properties") or n.get("meta", {}),
-            )
-        )
-    edges: list[GraphEdge] = []
-    for e in bundle.get("edges", []):
-        edges.append(
-            GraphEdge(
-                id=e.get("id"),
-                source=e.get("source"),
-                target=e.get("target"),
-                label=e.get("label"),
-                weight=e.get("weight"),
-                meta=e.get("meta", {}),
-                isOverlay=e.get("isOverlay"),
-            )
-        )
-    return GraphBundle(nodes=nodes, edges=edges)
+
+def _normalize_graph(bundle: dict) -> GraphBundleData:
+    """Coerce raw graph dicts (Kuzu, fallback, overlay) into the GraphBundle shape.
+
+    Builds plain dicts rather than models: these come from our own stores, so
+    per-element validation only costs time on large graphs.
+    """
+    return {
+        "nodes": [_normalize_node(n) for n in bundle.get("nodes", [])],
+        "edges": [_normalize_edge(e) for e in bundle.get("edges", [])],
+        "version": None,
+    }
 
 
 def _nodes_from_edges(edges: list[dict[str, object]]) -> list[dict[str, object]]:
@@ -116,11 +313,66 @@ def _nodes_from_edges(edges: list[dict[str, object]]) -> list[dict[str, object]]
     return list(nodes.values())
 
 
+def _vendor_stats_lines(vendor_ids: set[str], limit: int = 3) -> list[str]:
+    """One prompt line per anchored vendor from the materialized stats table."""
+    lines: list[str] = []
+    for vid in sorted(vendor_ids)[:limit]:
+        stats = kuzu.vendor_stats(vid)
+        if not stats:
+            continue
+        lines.append(
+            f"Vendor {vid}: {stats['invoice_count']} invoices, "
+            f"usual spend ${stats['total_mean']:.2f} "
+            f"(sd {stats['total_std']:.2f}, p50 {stats['total_p50']:.2f}, "
+            f"p90 {stats['total_p90']:.2f}, max {stats['total_max']:.2f}), "
+            f"last invoice {stats['last_invoice_date'] or 'n/a'}, "
+            f"{stats['overdue_count']} overdue as of {stats['as_of']}"
+        )
+    return lines
+
+
+def _profile_token(request: Request) -> str | None:
+    return request.headers.get("x-profile-token") or request.query_params.get(
+        "profile_token"
+    )
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start = time.time()
-    response = await call_next(request)
-    duration_ms = int((time.time() - start) * 1000)
+    timer = StageTimer()
+    session = supplied = None
+    if profiler.enabled and not request.url.path.startswith("/debug/"):
+        supplied = _profile_token(request)
+        if supplied is not None:
+            if not profiler.authorized(supplied):
+                return JSONResponse({"detail": "invalid profile token"}, 403)
+            session = profiler.begin(timer.active_threads)
+    token = metrics.current_timer.set(timer)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.current_timer.reset(token)
+    duration = time.time() - start
+    duration_ms = int(duration * 1000)
+
+    # Route template, not the raw path, to keep label cardinality bounded.
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    queue_ms = request.scope.get("state", {}).get("queue_ms")
+    if queue_ms:
+        timer.add("queue", queue_ms / 1000)
+    for name, seconds in timer.stages.items():
+        metrics.stage_seconds.observe(seconds, endpoint, name)
+    metrics.request_seconds.observe(duration, endpoint, str(response.status_code))
+    timer.add("total", duration)
+    response.headers["Server-Timing"] = timer.server_timing()
+    if session is not None:
+        # A streamed body is still being produced; only its setup is profiled.
+        name = f"{request.method} {endpoint}"
+        response.headers["X-Profile-Id"] = await asyncio.to_thread(session.finish, name)
+    elif supplied is not None:
+        response.headers["X-Profile-Id"] = "rate-limited"
     if request.url.path in {"/qa", "/feedback"}:
         logger.info(
             "%s %s %s %sms",
@@ -132,32 +384,64 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    """Prometheus text format: stage/request latency, cache and token counters."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def debug_profile(
+    profile_id: str,
+    request: Request,
+    kind: Literal["speedscope", "alloc"] = "speedscope",
+) -> Response:
+    """A stored request profile: speedscope JSON or the tracemalloc summary."""
+    if not profiler.authorized(_profile_token(request)):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = profiler.path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok", "time": str(time.time())}
 
 
+@app.get("/health/store")
+def health_store() -> dict[str, object]:
+    """Pet store write path: write-behind queue depth and batch sizes."""
+    return pet_store.write_stats()
+
+
+@app.get("/health/admission")
+async def health_admission() -> dict[str, object]:
+    """In-flight and queued requests per route and lane, with queue times."""
+    # async: the controller lives on the event loop thread.
+    return admission.stats()
+
+
 @app.get("/health/models")
 def health_models() -> dict[str, object]:
-    status: dict[str, object] = {"chat": False, "embed": False}
-    try:
-        llm.chat([{"role": "system", "content": "Reply with OK."}])
-        status["chat"] = True
-    except Exception:
-        status["chat"] = False
-    try:
-        llm.embed("ping")
-        status["embed"] = True
-    except Exception:
-        status["embed"] = False
-    return status
+    """``{chat, embed}`` booleans plus per-model timestamps and latencies.
+
+    Served from the background prober's cache; with
+    MODEL_PROBE_INTERVAL_S=0 the (cheap) probe runs on each call.
+    """
+    if settings.model_probe_interval_s <= 0:
+        return model_prober.probe_once()
+    return model_prober.status()
 
 
 @app.get("/ready")
 def ready() -> dict[str, object]:
-    # Readiness check: qdrant + models
+    # Readiness check: startup, then qdrant + models
+    details: dict[str, object] = {"startup": startup.status()}
+    if startup.blocking:
+        return {"ok": False, "details": details}
     ok = True
-    details: dict[str, object] = {}
     try:
         _ = qdrant.get_collection(settings.qdrant_collection)
         details["qdrant"] = True
@@ -249,7 +533,8 @@ def next_dilemma() -> DilemmaResponse:
 
     try:
         query_vec = llm.embed(seed)
-        points = search(qdrant, query_vec)
+        with stage("qdrant"):
+            points = search(qdrant, query_vec)
         evidence = to_evidence(points)
 
         if not evidence:
@@ -301,38 +586,119 @@ def next_dilemma() -> DilemmaResponse:
         return DilemmaResponse(id=item.id, question=item.question)
 
 
-@app.post(
-    "/qa",
-    response_model=QAResponse,
-    summary="Answer a question with evidence",
-    tags=["Core"],
-    responses={
-        200: {"content": {"application/json": {"example": QA_EXAMPLE_RESPONSE}}}
-    },
-)
-def qa(req: Annotated[QARequest, Body(example=QA_EXAMPLE_REQUEST)]) -> QAResponse:
-    pet = pet_store.get_pet(req.pet_id)
+@dataclass(frozen=True)
+class _QACore:
+    """Pet-independent part of a /qa answer; shared by coalesced requests."""
+
+    evidence: list[dict]
+    answer_json: AnswerJSON
+    neighborhood: GraphBundleData
+    cache_hit: Literal["exact", "semantic"] | None = None
+
+
+# Identical /qa calls in flight at the same time share one retrieval + LLM call.
+qa_flights: SingleFlight[_QACore] = SingleFlight()
+
 
+def _qa_key(req: QARequest) -> str:
+    """Requests with the same key produce the same retrieval and prompt."""
+    raw = dumps(
+        [
+            " ".join(req.question.split()),
+            " ".join((req.context or "").split()),
+            req.evidence_ids or [],
+        ]
+    )
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _chat_with_cache(
+    question: str,
+    context: str | None,
+    retrieval_vec: list[float],
+    evidence_ids: list[str],
+    messages: list[dict[str, str]],
+) -> tuple[dict, Literal["exact", "semantic"] | None]:
+    """Model answer for ``messages``, reusing a cached one when possible."""
+    if answer_cache is None:
+        return llm.chat_json(messages), None
+    scope = answer_scope(
+        evidence_ids, QA_PROMPT_VERSION, settings.llm_chat_model, llm.temperature
+    )
+    with stage("answer_cache"):
+        cached = answer_cache.get(scope, question)
+    if cached is not None:
+        metrics.cache_requests.inc("answer", "exact")
+        return cached, "exact"
+    question_vec = None
+    if answer_cache.semantic:
+        # Retrieval already embedded the question unless a context was given.
+        question_vec = llm.embed(question) if context else retrieval_vec
+        with stage("answer_cache"):
+            similar = answer_cache.get_similar(scope, question_vec)
+        if similar is not None:
+            metrics.cache_requests.inc("answer", "semantic")
+            return similar[0], "semantic"
+    metrics.cache_requests.inc("answer", "miss")
+    answer = llm.chat_json(messages)
+    with stage("answer_cache"):
+        answer_cache.put(scope, question, answer, question_vec)
+    return answer, None
+
+
+def _merge_points(points: list[ScoredPoint], extra: list[ScoredPoint]) -> None:
+    """Append ``extra`` to ``points``, deduplicating by point id."""
+    seen_ids = {str(p.id) for p in points}
+    for ep in extra:
+        if str(ep.id) not in seen_ids:
+            points.append(ep)
+            seen_ids.add(str(ep.id))
+
+
+def _answer_question(
+    question: str, context: str | None, evidence_ids: list[str] | None
+) -> _QACore:
+    """Retrieval, LLM answer and graph neighborhood for one question."""
+    retrieval_text = context or question
+    retrieval_vec = llm.embed(retrieval_text)
     # If evidence_ids are provided (from dilemma generation), fetch those exact points.
     # Otherwise fall back to semantic search.
-    if req.evidence_ids:
-        records = retrieve_by_ids(qdrant, req.evidence_ids)
-        points = records_to_scored(records)
-        # Also do a supplementary search to enrich the graph
-        retrieval_text = req.context or req.question
-        extra_vec = llm.embed(retrieval_text)
-        extra_points = search(qdrant, extra_vec)
-        # Merge — deduplicate by point ID
-        seen_ids = {str(p.id) for p in points}
-        for ep in extra_points:
-            if str(ep.id) not in seen_ids:
-                points.append(ep)
-                seen_ids.add(str(ep.id))
-    else:
-        retrieval_text = req.context or req.question
-        query_vec = llm.embed(retrieval_text)
-        points = search(qdrant, query_vec)
+    with stage("qdrant"):
+        if evidence_ids:
+            records = retrieve_by_ids(qdrant, evidence_ids)
+            points = records_to_scored(records)
+            # Also do a supplementary search to enrich the graph
+            _merge_points(points, search(qdrant, retrieval_vec))
+        else:
+            points = search(qdrant, retrieval_vec)
+
+    evidence, anchors, answer_json, cache_hit = _answer_points(
+        question, context, retrieval_vec, points
+    )
+    with stage("kuzu"):
+        raw = kuzu.neighborhood(anchors, depth=2)
+    neighborhood = _neighborhood_bundle(evidence, anchors, raw)
+    return _QACore(evidence, answer_json, neighborhood, cache_hit)
+
+
+def _neighborhood_bundle(
+    evidence: list[dict], anchors: dict[str, set[str]], neighborhood: dict
+) -> GraphBundleData:
+    """Kuzu ``neighborhood``, or a graph built from the evidence if it is empty."""
+    if not neighborhood.get("nodes"):
+        neighborhood = build_graph_from_evidence(evidence, anchors)
+    return _normalize_graph(neighborhood)
+
 
+def _answer_points(
+    question: str,
+    context: str | None,
+    retrieval_vec: list[float],
+    points: list[ScoredPoint],
+) -> tuple[
+    list[dict], dict[str, set[str]], AnswerJSON, Literal["exact", "semantic"] | None
+]:
+    """Prompt the model with the retrieved ``points``."""
     evidence = to_evidence(points)
     anchors = extract_anchors(evidence)
 
@@ -353,27 +719,28 @@ def qa(req: Annotated[QARequest, Body(example=QA_EXAMPLE_REQUEST)]) -> QARespons
             has_finance_signal = True
             break
 
-    system_prompt = (
-        "You are a finance/ops auditor agent. Analyze the evidence and return a JSON decision.\n"
-        "Example response:\n"
-        '{"decision":"flag","confidence":0.7,"rationale":"Amount exceeds vendor average by 3x.","evidence_ids":[],"overlay_edges":[]}\n\n'
-        "Rules:\n"
-        "- decision must be one of: approve, flag, reject, escalate\n"
-        "- confidence is 0.0 to 1.0\n"
-        "- rationale is a brief explanation (1-2 sentences)\n"
-        "- Return ONLY valid JSON, no other text"
+    with stage("kuzu"):
+        stats_lines = _vendor_stats_lines(anchors.get("vendor_id", set()))
+    vendor_history = (
+        "Vendor history:\n" + "\n".join(stats_lines) + "\n\n" if stats_lines else ""
     )
     user_prompt = (
-        f"Question: {req.question}\n\nEvidence:\n{evidence_snippets}\n\n"
+        f"Question: {question}\n\nEvidence:\n{evidence_snippets}\n\n"
+        f"{vendor_history}"
         "Analyze the evidence and return your JSON decision."
     )
 
+    cache_hit = None
     if has_finance_signal:
-        answer = llm.chat_json(
+        answer, cache_hit = _chat_with_cache(
+            question,
+            context,
+            retrieval_vec,
+            [e["id"] for e in evidence],
             [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": QA_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt},
-            ]
+            ],
         )
     else:
         answer = {
@@ -402,31 +769,220 @@ def qa(req: Annotated[QARequest, Body(example=QA_EXAMPLE_REQUEST)]) -> QARespons
         overlay_edges=answer.get("overlay_edges", []),
     )
 
-    interaction_id = pet_store.log_interaction(
-        req.pet_id, req.question, evidence, answer_json.model_dump()
-    )
+    return evidence, anchors, answer_json, cache_hit
 
-    if answer_json.overlay_edges:
-        pet_store.add_overlay_edges(req.pet_id, answer_json.overlay_edges)
 
-    overlay_graph = pet_store.get_overlay_graph(req.pet_id)
-    neighborhood = kuzu.neighborhood(anchors, depth=2)
-    if not neighborhood.get("nodes"):
-        neighborhood = build_graph_from_evidence(evidence, anchors)
+@app.post(
+    "/qa",
+    response_model=QAResponse,
+    summary="Answer a question with evidence",
+    tags=["Core"],
+    responses={
+        200: {"content": {"application/json": {"example": QA_EXAMPLE_RESPONSE}}}
+    },
+)
+def qa(req: Annotated[QARequest, Body(example=QA_EXAMPLE_REQUEST)]) -> Response:
+    with stage("sqlite"):
+        pet = pet_store.get_pet(req.pet_id)
+
+    if settings.qa_single_flight:
+        core, shared = qa_flights.do(
+            _qa_key(req),
+            lambda: _answer_question(req.question, req.context, req.evidence_ids),
+        )
+        metrics.cache_requests.inc("qa_single_flight", "hit" if shared else "miss")
+    else:
+        core = _answer_question(req.question, req.context, req.evidence_ids)
+    evidence, answer_json = core.evidence, core.answer_json
+
+    with stage("sqlite"):
+        interaction_id = pet_store.log_interaction(
+            req.pet_id, req.question, evidence, answer_json.model_dump()
+        )
+        if answer_json.overlay_edges:
+            pet_store.add_overlay_edges(req.pet_id, answer_json.overlay_edges)
+        overlay_graph = pet_store.get_overlay_graph(req.pet_id)
+    neighborhood_bundle = core.neighborhood
+    overlay_bundle = _normalize_graph(overlay_graph)
+    combined = merge_bundles(neighborhood_bundle, overlay_bundle)
 
-    combined = {
-        "nodes": neighborhood.get("nodes", []) + overlay_graph.get("nodes", []),
-        "edges": neighborhood.get("edges", []) + overlay_graph.get("edges", []),
+    # Everything below is trusted data; answer_json was validated above, so
+    # the response is assembled as dicts and serialized once.
+    response: dict[str, object] = {
+        "answer_json": answer_json.model_dump(),
+        "evidence_bundle": [
+            {"id": e["id"], "text": e["text"], "meta": e.get("meta") or {}}
+            for e in evidence
+        ],
+        "neighborhood_graph": None,
+        "overlay_graph": None,
+        "graph_combined": None,
+        "graph_version": None,
+        "graph_delta": None,
+        "pet_stats": pet["stats"],
+        "interaction_id": interaction_id,
+        "cache_hit": core.cache_hit,
     }
+    wants_delta = (
+        req.graph_since is not None
+        or req.known_node_ids is not None
+        or req.known_edge_ids is not None
+    )
+    if wants_delta:
+        delta = diff(
+            combined,
+            graph_versions,
+            since=req.graph_since,
+            known_node_ids=req.known_node_ids,
+            known_edge_ids=req.known_edge_ids,
+        )
+        response["graph_version"] = delta["version"]
+        response["graph_delta"] = delta
+        with stage("serialize"):
+            return FastJSONResponse(response)
+
+    version, _ = graph_versions.remember(combined)
+    combined["version"] = version
+    response["neighborhood_graph"] = neighborhood_bundle
+    response["overlay_graph"] = overlay_bundle
+    response["graph_combined"] = combined if req.include_combined else None
+    response["graph_version"] = version
+    with stage("serialize"):
+        return FastJSONResponse(response)
+
+
+def _retrieve_batch(
+    items: list[QABatchItem],
+) -> tuple[list[list[ScoredPoint]], list[list[float]]]:
+    """Retrieval for a whole batch: chunked embeddings, one Qdrant batch search."""
+    texts = [item.context or item.question for item in items]
+    size = max(1, settings.qa_batch_embed_size)
+    vectors: list[list[float]] = []
+    for start in range(0, len(texts), size):
+        vectors.extend(llm.embed_many(texts[start : start + size]))
+    wanted = sorted({i for item in items for i in item.evidence_ids or []})
+    with stage("qdrant"):
+        results = search_batch(qdrant, vectors)
+        records = retrieve_by_ids(qdrant, wanted)
+    by_id = {str(p.id): p for p in records_to_scored(records)}
+    batch_points = []
+    for item, searched in zip(items, results, strict=True):
+        points = [
+            by_id[raw]
+            for raw in (i.split(":")[-1] for i in item.evidence_ids or [])
+            if raw in by_id
+        ]
+        _merge_points(points, searched)
+        batch_points.append(points)
+    return batch_points, vectors
+
+
+def _qa_batch_lines(
+    req: QABatchRequest,
+    batch_points: list[list[ScoredPoint]],
+    vectors: list[list[float]],
+    loop: asyncio.AbstractEventLoop | None,
+) -> Iterator[bytes]:
+    """``loop`` is the admission controller's loop, or None when ungated."""
+    graphs: dict[str, dict] = {}
+    graph_flights: SingleFlight[dict] = SingleFlight()
+
+    def neighborhood_for(anchors: dict[str, set[str]]) -> dict:
+        # Many questions share anchors; query Kuzu once per anchor set.
+        key = dumps({k: sorted(v) for k, v in anchors.items()}, sort_keys=True).decode()
+        graph = graphs.get(key)
+        if graph is None:
+            graph, _ = graph_flights.do(
+                key, lambda: kuzu.neighborhood(anchors, depth=2)
+            )
+            graphs[key] = graph
+        return graph
+
+    def admitted() -> AbstractContextManager[object]:
+        # One batch-lane slot per model call, so waiting /qa requests are
+        # admitted ahead of the rest of the batch.
+        if loop is None or "/qa/batch" not in admission.routes:
+            return nullcontext()
+        return admission.slot("/qa/batch", loop)
+
+    def answer(index: int) -> tuple[dict[str, object], list[dict], dict]:
+        item = req.items[index]
+        with admitted():
+            evidence, anchors, answer_json, cache_hit = _answer_points(
+                item.question, item.context, vectors[index], batch_points[index]
+            )
+        answer_dump = answer_json.model_dump()
+        line: dict[str, object] = {
+            "index": index,
+            "answer_json": answer_dump,
+            "evidence_bundle": [
+                {"id": e["id"], "text": e["text"], "meta": e.get("meta") or {}}
+                for e in evidence
+            ],
+            "cache_hit": cache_hit,
+        }
+        if req.include_graphs:
+            line["neighborhood_graph"] = _neighborhood_bundle(
+                evidence, anchors, neighborhood_for(anchors)
+            )
+        return line, evidence, answer_dump
 
-    return QAResponse(
-        answer_json=answer_json,
-        evidence_bundle=[EvidenceItem(**e) for e in evidence],
-        neighborhood_graph=_normalize_graph(neighborhood),
-        overlay_graph=_normalize_graph(overlay_graph),
-        graph_combined=_normalize_graph(combined),
-        pet_stats=pet["stats"],
-        interaction_id=interaction_id,
+    entries: list[tuple[str, str, list[dict], dict]] = []
+    failed = 0
+    # Admission bounds the model calls of all batches together; this bounds
+    # how many of them a single request keeps queued or running.
+    pool = ThreadPoolExecutor(
+        max_workers=min(
+            req.concurrency or settings.qa_batch_concurrency,
+            settings.qa_batch_concurrency,
+        )
+    )
+    try:
+        futures = {pool.submit(answer, i): i for i in range(len(req.items))}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                line, evidence, answer_dump = future.result()
+            except Exception as exc:
+                logger.warning("Batch item %s failed: %s", index, exc)
+                failed += 1
+                yield dumps({"index": index, "error": str(exc)}) + b"\n"
+                continue
+            line["interaction_id"] = interaction_id = str(uuid.uuid4())
+            entries.append(
+                (interaction_id, req.items[index].question, evidence, answer_dump)
+            )
+            yield dumps(line) + b"\n"
+    finally:
+        # Also runs when the client disconnects: answered items are kept.
+        pool.shutdown(wait=False, cancel_futures=True)
+        pet_store.log_batch(req.pet_id, entries)
+    yield dumps({"done": True, "answered": len(entries), "failed": failed}) + b"\n"
+
+
+@app.post(
+    "/qa/batch",
+    summary="Answer many questions as a JSONL stream",
+    tags=["Core"],
+)
+async def qa_batch(req: QABatchRequest) -> StreamingResponse:
+    """One line per item as it completes, then a ``{"done": true}`` line.
+
+    Interactions (and their overlay edges) are written in one transaction
+    at the end of the stream, before the ``done`` line. Each item is
+    admitted separately in the batch lane; an item rejected by admission
+    comes back as that item's ``error`` line.
+    """
+    if len(req.items) > settings.qa_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"at most {settings.qa_batch_max_items} items per batch",
+        )
+    batch_points, vectors = await asyncio.to_thread(_retrieve_batch, req.items)
+    loop = asyncio.get_running_loop() if settings.admission else None
+    return StreamingResponse(
+        _qa_batch_lines(req, batch_points, vectors, loop),
+        media_type="application/jsonl",
     )
 
 
@@ -441,57 +997,69 @@ def qa(req: Annotated[QARequest, Body(example=QA_EXAMPLE_REQUEST)]) -> QARespons
 )
 def feedback(
     req: Annotated[FeedbackRequest, Body(example=FEEDBACK_EXAMPLE_REQUEST)],
-) -> FeedbackResponse:
-    pet_id = pet_store.get_interaction_pet(req.interaction_id) or "default"
-    pet_stats = pet_store.update_stats(pet_id, req.action)
-    new_path = pet_store.maybe_evolve(pet_id)
-
-    overlay_edges = []
-    if req.rationale:
-        overlay_edges.append(
-            {
-                "src": "feedback",
-                "rel": req.action.upper(),
-                "dst": "latest",
-                "weight": 1.0,
-                "meta": {"note": req.rationale},
-            }
+) -> Response:
+    with stage("sqlite"):
+        result = pet_store.apply_feedback(req.interaction_id, req.action, req.rationale)
+    pet_stats = result["stats"]
+    overlay_delta = result["overlay_edges"]
+    delta: GraphBundleData = {
+        "nodes": [_normalize_node(n) for n in _nodes_from_edges(overlay_delta)],
+        "edges": [_normalize_edge(e) for e in overlay_delta],
+        "version": None,
+    }
+    return FastJSONResponse(
+        {
+            "pet_stats": pet_stats,
+            "updated_pet_stats": pet_stats,
+            "overlay_graph_delta": delta,
+            "new_path": result["new_path"],
+        }
+    )
+
+
+@app.post(
+    "/feedback/batch",
+    response_model=FeedbackBatchResponse,
+    summary="Apply many feedback records",
+    tags=["Core"],
+)
+def feedback_batch(req: FeedbackBatchRequest) -> Response:
+    """Items are grouped by pet; each pet is updated in one transaction."""
+    if len(req.items) > settings.feedback_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"at most {settings.feedback_batch_max_items} items per batch",
         )
-    overlay_delta = pet_store.add_overlay_edges(pet_id, overlay_edges)
-
-    return FeedbackResponse(
-        pet_stats=pet_stats,
-        updated_pet_stats=pet_stats,
-        overlay_graph_delta=GraphBundle(
-            nodes=[
-                GraphNode(
-                    id=str(n.get("id")),
-                    label=str(n.get("label")) if n.get("label") is not None else None,
-                    group=str(n.get("group")) if n.get("group") is not None else None,
-                    type=str(n.get("type")) if n.get("type") is not None else None,
-                    meta=cast(dict, n.get("meta"))
-                    if isinstance(n.get("meta"), dict)
-                    else {},
-                    properties=cast(dict, n.get("properties"))
-                    if isinstance(n.get("properties"), dict)
-                    else None,
-                )
-                for n in _nodes_from_edges(overlay_delta)
-            ],
-            edges=[
-                GraphEdge(
-                    id=e.get("id"),
-                    source=str(e.get("source")),
-                    target=str(e.get("target")),
-                    label=e.get("label"),
-                    weight=e.get("weight"),
-                    meta=e.get("meta", {}),
-                    isOverlay=e.get("isOverlay"),
-                )
-                for e in overlay_delta
+    start = time.perf_counter()
+    with stage("sqlite"):
+        out = pet_store.apply_feedback_batch(
+            [(item.interaction_id, item.action, item.rationale) for item in req.items]
+        )
+    elapsed = time.perf_counter() - start
+    return FastJSONResponse(
+        {
+            "results": [
+                {
+                    "interaction_id": r["interaction_id"],
+                    "pet_id": r["pet_id"],
+                    "pet_stats": r["stats"],
+                    "overlay_edges": [_normalize_edge(e) for e in r["overlay_edges"]],
+                }
+                for r in out["results"]
             ],
-        ),
-        new_path=new_path,
+            "pets": {
+                pet_id: {
+                    "pet_stats": p["stats"],
+                    "path": p["path"],
+                    "new_path": p["new_path"],
+                    "applied": p["applied"],
+                }
+                for pet_id, p in out["pets"].items()
+            },
+            "applied": len(req.items),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "items_per_s": round(len(req.items) / elapsed, 1) if elapsed else 0.0,
+        }
     )
 
 
@@ -511,21 +1079,82 @@ def pet(pet_id: str = "default") -> PetResponse:
     )
 
 
+@app.get(
+    "/pet/interactions",
+    response_model=InteractionPage,
+    summary="Page through interaction history",
+    description=(
+        "Keyset-paginated on (created_at, id). `since`/`until` are epoch seconds "
+        "bounding created_at as [since, until)."
+    ),
+    tags=["Game"],
+)
+def pet_interactions(
+    pet_id: str = "default",
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    cursor: str | None = None,
+    decision: str | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    order: Literal["asc", "desc"] = "desc",
+) -> InteractionPage:
+    try:
+        items, next_cursor = pet_store.page_interactions(
+            pet_id,
+            limit=limit,
+            cursor=cursor,
+            decision=decision,
+            since=since,
+            until=until,
+            order=order,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return InteractionPage(
+        items=[InteractionSummary(**item) for item in items], next_cursor=next_cursor
+    )
+
+
 @app.get(
     "/graph/neighborhood",
-    response_model=GraphBundle,
+    response_model=GraphBundle | GraphDelta,
     summary="Fetch a graph neighborhood",
+    description=(
+        "Pass `since` (a previous `version`) to receive only the changes as a "
+        "GraphDelta instead of the full bundle."
+    ),
     tags=["Graph"],
 )
-def graph_neighborhood(entity_id: str, depth: int = 2) -> GraphBundle:
+def graph_neighborhood(
+    entity_id: str, depth: int = 2, since: str | None = None
+) -> Response:
     anchors = {
         "vendor_id": {entity_id},
         "transaction_id": set(),
         "sku": set(),
         "chunk_id": set(),
     }
-    result = kuzu.neighborhood(anchors, depth=depth)
-    return _normalize_graph(result)
+    with stage("kuzu"):
+        raw = kuzu.neighborhood(anchors, depth=depth)
+    result = _normalize_graph(raw)
+    if since is not None:
+        return FastJSONResponse(diff(result, graph_versions, since=since))
+    result["version"], _ = graph_versions.remember(result)
+    return FastJSONResponse(result)
+
+
+@app.get(
+    "/graph/vendor/{vendor_id}/stats",
+    response_model=VendorStats,
+    summary="Materialized vendor invoice statistics",
+    tags=["Graph"],
+)
+def graph_vendor_stats(vendor_id: str) -> VendorStats:
+    with stage("kuzu"):
+        stats = kuzu.vendor_stats(vendor_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No stats for vendor")
+    return VendorStats(**stats)
 
 
 @app.get(
@@ -535,15 +1164,21 @@ def graph_neighborhood(entity_id: str, depth: int = 2) -> GraphBundle:
     description="Returns a small graph sample for quick UI testing.",
     tags=["Graph"],
 )
-def graph_sample() -> GraphBundle:
-    points = search(qdrant, llm.embed("invoice vendor payment"))
+def graph_sample() -> Response:
+    query_vec = llm.embed("invoice vendor payment")
+    with stage("qdrant"):
+        points = search(qdrant, query_vec)
     evidence = to_evidence(points)
     anchors = extract_anchors(evidence)
     anchors["chunk_id"] = anchors.get("chunk_id", set())
-    neighborhood = kuzu.neighborhood(anchors, depth=1)
+    with stage("kuzu"):
+        neighborhood = kuzu.neighborhood(anchors, depth=1)
     if not neighborhood.get("nodes"):
         neighborhood = build_graph_from_evidence(evidence, anchors)
-    return _normalize_graph(neighborhood)
+    return FastJSONResponse(_normalize_graph(neighborhood))
+
+
+ExportOverlay = Literal["window", "once", "none"]
 
 
 @app.get(
@@ -551,8 +1186,22 @@ def graph_sample() -> GraphBundle:
     summary="Export pet interactions for distillation",
     tags=["Export"],
 )
-def export_pet(pet_id: str = "default") -> dict[str, object]:
-    return {"pet_id": pet_id, "rows": pet_store.export_pet(pet_id)}
+def export_pet(
+    pet_id: str = "default",
+    since: str | None = None,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    overlay: ExportOverlay = "window",
+) -> dict[str, object]:
+    """All rows by default; with ``limit``, one page plus ``next_cursor``."""
+    try:
+        rows = pet_store.export_pet(pet_id, since=since, limit=limit, overlay=overlay)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "pet_id": pet_id,
+        "rows": rows,
+        "next_cursor": rows[-1]["cursor"] if limit and len(rows) == limit else None,
+    }
 
 
 @app.get(
@@ -560,7 +1209,16 @@ def export_pet(pet_id: str = "default") -> dict[str, object]:
     summary="Export pet interactions as JSONL",
     tags=["Export"],
 )
-def export_pet_jsonl(pet_id: str = "default") -> Response:
-    rows = pet_store.export_pet(pet_id)
-    lines = "\n".join(json.dumps(r) for r in rows)
-    return Response(content=lines, media_type="application/jsonl")
+def export_pet_jsonl(
+    pet_id: str = "default",
+    since: str | None = None,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    overlay: ExportOverlay = "window",
+) -> StreamingResponse:
+    try:
+        rows = pet_store.iter_export(pet_id, since=since, limit=limit, overlay=overlay)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return StreamingResponse(
+        (json.dumps(r) + "\n" for r in rows), media_type="application/jsonl"
+    )
@@ -0,0 +1,188 @@
+"""Per-request stage timing and Prometheus metrics.
+
+Handlers wrap slow calls in ``stage("embed")`` etc. The request middleware
+installs a ``StageTimer`` for each request, turns it into a
+``Server-Timing`` header and folds it into the ``/metrics`` histograms.
+Stages run outside a request (background tasks, worker threads) are not
+recorded. The exposition format is written here directly; the handful of
+metric types needed does not warrant a client library.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; from a cache hit to a slow CPU completion.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        # labels -> (count per bucket plus a final +Inf slot, [sum])
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            counts, totals = self._series.setdefault(
+                labels, ([0] * (len(BUCKETS) + 1), [0.0])
+            )
+            counts[index] += 1
+            totals[0] += seconds
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), t[0]) for k, (c, t) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, counts, strict=False):
+                cumulative += count
+                le = _labels(self.labels, labels, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            le = _labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:g}")
+            lines.append(
+                f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+            )
+        return lines
+
+
+request_seconds = Histogram(
+    "finagotchi_request_seconds",
+    "Request latency by route template and status.",
+    ("endpoint", "status"),
+)
+stage_seconds = Histogram(
+    "finagotchi_stage_seconds",
+    "Time spent per stage (embed, qdrant, llm, llm_repair, kuzu, sqlite, ...).",
+    ("endpoint", "stage"),
+)
+cache_requests = Counter(
+    "finagotchi_cache_requests_total",
+    "Cache lookups by cache and result (hit kinds vs miss).",
+    ("cache", "result"),
+)
+llm_tokens = Counter(
+    "finagotchi_llm_tokens_total",
+    "LLM tokens from completion usage fields.",
+    ("kind",),
+)
+
+REGISTRY = (request_seconds, stage_seconds, cache_requests, llm_tokens)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Durations per stage name for one request; repeated stages add up.
+
+    ``active_threads`` lists the threads running one of its stages right
+    now, for the profiler. Workers are shared between requests, so a thread
+    only counts while it is inside a stage.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages: dict[str, float] = {}
+        # Thread id -> stages it is inside (stages can nest).
+        self._threads: dict[int, int] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def _enter(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def _exit(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def active_threads(self) -> list[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def server_timing(self) -> str:
+        with self._lock:
+            items = list(self.stages.items())
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in items)
+
+
+current_timer: ContextVar[StageTimer | None] = ContextVar("stage_timer", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timer = current_timer.get()
+    if timer is None:
+        yield
+        return
+    ident = threading.get_ident()
+    timer._enter(ident)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+        timer._exit(ident)
+
+
+def record_usage(usage: object) -> None:
+    """Count tokens from an OpenAI-style ``usage`` object, if present."""
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind)
+        if isinstance(value, int | float):
+            llm_tokens.inc(kind.removesuffix("_tokens"), amount=value)
@@ -0,0 +1,79 @@
+"""Background model health probing with a cached status.
+
+Readiness probes arrive far more often than model state changes, and a
+real completion per probe competes with user requests for the model. The
+prober checks each model on its own schedule with the cheapest request the
+server supports and /ready and /health/models read the cached result.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+class ModelProber:
+    """Runs ``checks`` (name -> callable that raises on failure) and caches results.
+
+    A result older than ``stale_after_s`` counts as down, so a wedged prober
+    cannot keep reporting a model as healthy.
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Callable[[], None]],
+        stale_after_s: float = 60.0,
+    ) -> None:
+        self.checks = checks
+        self.stale_after_s = stale_after_s
+        self._lock = threading.Lock()
+        self._status: dict[str, dict[str, Any]] = {}
+
+    def probe_once(self) -> dict[str, Any]:
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            error = None
+            try:
+                check()
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+            result = {
+                "ok": error is None,
+                "checked_at": time.time(),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                "error": error,
+            }
+            with self._lock:
+                previous = self._status.get(name)
+                # Keep when the model was last seen healthy for debugging flaps.
+                result["last_ok_at"] = (
+                    result["checked_at"]
+                    if error is None
+                    else (previous or {}).get("last_ok_at")
+                )
+                self._status[name] = result
+        return self.status()
+
+    def status(self) -> dict[str, Any]:
+        """``{<name>: bool, ..., "models": {<name>: details}}``; never blocks on a model."""
+        now = time.time()
+        with self._lock:
+            models = {name: dict(s) for name, s in self._status.items()}
+        out: dict[str, Any] = {}
+        for name in self.checks:
+            details = models.get(name)
+            if details is None:
+                out[name] = False
+                models[name] = {
+                    "ok": False,
+                    "checked_at": None,
+                    "error": "not probed yet",
+                }
+                continue
+            details["age_s"] = round(now - details["checked_at"], 1)
+            details["stale"] = details["age_s"] > self.stale_after_s
+            out[name] = details["ok"] and not details["stale"]
+        out["models"] = models
+        return out
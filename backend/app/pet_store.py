@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import base64
+import binascii
+import gzip
+import hashlib
 import json
 import os
 import sqlite3
+import threading
 import time
 import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from itertools import chain
 from typing import Any
+from urllib.parse import quote
 
 from .config import settings
+from .json_codec import JsonCodec, train_dictionary
+from .write_behind import Op, WriteBehindQueue
 
 DEFAULT_STATS = {
     "risk": 50,
@@ -18,69 +30,982 @@ DEFAULT_STATS = {
 
 DEFAULT_PATH = "Baby Auditor"
 
+_ACTION_DELTAS: dict[str, dict[str, int]] = {
+    "approve": {"thriftiness": 2, "risk": -1},
+    "flag": {"risk": 2, "compliance": 1},
+    "escalate": {"risk": 3, "compliance": 2},
+    "reject": {"compliance": 2, "risk": 1},
+}
+
+
+def _apply_action(stats: dict[str, int], action: str) -> dict[str, int]:
+    stats = dict(stats)
+    for key, delta in _ACTION_DELTAS.get(action, {}).items():
+        stats[key] = max(0, min(100, stats.get(key, 50) + delta))
+    return stats
+
+
+def _next_path(stats: dict[str, int], path: str) -> str | None:
+    score = sum(stats.values())
+    if score >= 240 and path != "Vigilant Auditor":
+        return "Vigilant Auditor"
+    if score >= 220 and path != "Steady Analyst":
+        return "Steady Analyst"
+    return None
+
+
+def _feedback_edges(action: str, rationale: str | None) -> list[dict[str, Any]]:
+    if not rationale:
+        return []
+    return [
+        {
+            "src": "feedback",
+            "rel": action.upper(),
+            "dst": "latest",
+            "weight": 1.0,
+            "meta": {"note": rationale},
+        }
+    ]
+
+
+_INSERT_INTERACTION = "INSERT INTO interactions (id, pet_id, question, evidence_json, answer_json, created_at, decision) VALUES (?, ?, ?, ?, ?, ?, ?)"
+_INSERT_OVERLAY_EDGE = "INSERT INTO overlay_edges (id, pet_id, src, rel, dst, weight, meta_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def _migrate_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS pet_state (
+            pet_id TEXT PRIMARY KEY,
+            stats_json TEXT NOT NULL,
+            path TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS interactions (
+            id TEXT PRIMARY KEY,
+            pet_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            evidence_json TEXT NOT NULL,
+            answer_json TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS overlay_edges (
+            id TEXT PRIMARY KEY,
+            pet_id TEXT NOT NULL,
+            src TEXT NOT NULL,
+            rel TEXT NOT NULL,
+            dst TEXT NOT NULL,
+            weight REAL NOT NULL,
+            meta_json TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """
+    )
+
+
+def _migrate_pet_time_indexes(conn: sqlite3.Connection) -> None:
+    # History reads all filter by pet and order by time.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_pet_created ON interactions (pet_id, created_at)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_overlay_edges_pet_created ON overlay_edges (pet_id, created_at)"
+    )
+
+
+def _migrate_keyset_indexes(conn: sqlite3.Connection) -> None:
+    # Keyset pagination orders by (created_at, id); carrying id in the index
+    # avoids a temp sort for rows that share a timestamp.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_pet_created_id ON interactions (pet_id, created_at, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_overlay_edges_pet_created_id ON overlay_edges (pet_id, created_at, id)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_interactions_pet_created")
+    conn.execute("DROP INDEX IF EXISTS idx_overlay_edges_pet_created")
+
+
+def _evidence_hash(item: Any) -> str:
+    canonical = json.dumps(item, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _plain(text: str) -> str:
+    return text
+
+
+def _write_evidence(
+    conn: sqlite3.Connection,
+    interaction_id: str,
+    evidence_json: str,
+    encode: Callable[[str], str | bytes] = _plain,
+) -> str:
+    """Move an interaction's evidence into the content-addressed tables.
+
+    Returns the value to keep in ``interactions.evidence_json``: ``""`` once
+    the items are linked, or the original text if it is not a JSON list.
+    """
+    try:
+        items = json.loads(evidence_json)
+    except Exception:
+        return evidence_json
+    if not isinstance(items, list):
+        return evidence_json
+    hashes = [_evidence_hash(item) for item in items]
+    # Chunks recur across questions; OR IGNORE leaves known bodies untouched.
+    conn.executemany(
+        "INSERT OR IGNORE INTO evidence (hash, body) VALUES (?, ?)",
+        [(h, encode(json.dumps(item))) for h, item in zip(hashes, items, strict=True)],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO interaction_evidence (interaction_id, position, evidence_hash) VALUES (?, ?, ?)",
+        [(interaction_id, pos, h) for pos, h in enumerate(hashes)],
+    )
+    return ""
+
+
+def _write_interaction(
+    conn: sqlite3.Connection,
+    row: tuple[Any, ...],
+    encode: Callable[[str], str | bytes],
+) -> None:
+    (
+        interaction_id,
+        pet_id,
+        question,
+        evidence_json,
+        answer_json,
+        created_at,
+        decision,
+    ) = row
+    stored = _write_evidence(conn, interaction_id, evidence_json, encode)
+    conn.execute(
+        _INSERT_INTERACTION,
+        (interaction_id, pet_id, question, stored, answer_json, created_at, decision),
+    )
+
+
+def _write_overlay_edge(
+    conn: sqlite3.Connection,
+    row: tuple[Any, ...],
+    encode: Callable[[str], str | bytes],
+) -> None:
+    conn.execute(_INSERT_OVERLAY_EDGE, row)
+
+
+# Queued write ops are ``(kind, row)``; the kind picks the writer.
+INTERACTION = "interaction"
+OVERLAY_EDGE = "overlay_edge"
+_WRITERS: dict[
+    str,
+    Callable[[sqlite3.Connection, tuple[Any, ...], Callable[[str], str | bytes]], None],
+] = {
+    INTERACTION: _write_interaction,
+    OVERLAY_EDGE: _write_overlay_edge,
+}
+
+
+def _execute(
+    conn: sqlite3.Connection,
+    kind: str,
+    row: tuple[Any, ...],
+    encode: Callable[[str], str | bytes],
+) -> None:
+    _WRITERS[kind](conn, row, encode)
+
+
+def _load_evidence(
+    conn: sqlite3.Connection,
+    rows: Iterable[tuple[str, str]],
+    decode: Callable[[str | bytes], str],
+) -> dict[str, list[Any]]:
+    """Rehydrate evidence for ``(interaction_id, evidence_json)`` rows.
+
+    Non-empty ``evidence_json`` is legacy inline storage and is parsed as-is.
+    """
+    out: dict[str, list[Any]] = {}
+    linked: list[str] = []
+    for interaction_id, evidence_json in rows:
+        if evidence_json:
+            try:
+                out[interaction_id] = json.loads(evidence_json)
+            except Exception:
+                out[interaction_id] = []
+        else:
+            out[interaction_id] = []
+            linked.append(interaction_id)
+    if linked:
+        marks = ",".join("?" * len(linked))
+        for interaction_id, body in conn.execute(
+            "SELECT l.interaction_id, e.body FROM interaction_evidence l "
+            "JOIN evidence e ON e.hash = l.evidence_hash "
+            f"WHERE l.interaction_id IN ({marks}) "
+            "ORDER BY l.interaction_id, l.position",
+            linked,
+        ):
+            out[interaction_id].append(json.loads(decode(body)))
+    return out
+
+
+def _migrate_content_addressed_evidence(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS evidence (
+            hash TEXT PRIMARY KEY,
+            body TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS interaction_evidence (
+            interaction_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            evidence_hash TEXT NOT NULL,
+            PRIMARY KEY (interaction_id, position)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interaction_evidence_hash ON interaction_evidence (evidence_hash)"
+    )
+    # Move inline evidence over in rowid order, a page at a time, so a large
+    # history is never held in memory at once.
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, id, evidence_json FROM interactions "
+            "WHERE rowid > ? AND evidence_json != '' ORDER BY rowid LIMIT 500",
+            (last,),
+        ).fetchall()
+        if not rows:
+            return
+        for rowid, interaction_id, evidence_json in rows:
+            stored = _write_evidence(conn, interaction_id, evidence_json)
+            if stored != evidence_json:
+                conn.execute(
+                    "UPDATE interactions SET evidence_json = ? WHERE rowid = ?",
+                    (stored, rowid),
+                )
+        last = rows[-1][0]
+
+
+def _migrate_compression_dicts(conn: sqlite3.Connection) -> None:
+    # Trained zstd dictionaries; the newest is used for writes, all for reads.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            dict_id INTEGER PRIMARY KEY,
+            dict BLOB NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """
+    )
+
+
+def _migrate_interaction_decision(conn: sqlite3.Connection) -> None:
+    # The decision lives inside answer_json; a real column lets history pages
+    # filter on it through an index instead of decoding every row.
+    conn.execute("ALTER TABLE interactions ADD COLUMN decision TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_interactions_pet_decision_created_id "
+        "ON interactions (pet_id, decision, created_at, id)"
+    )
+    dicts = conn.execute("SELECT dict_id, dict FROM compression_dicts").fetchall()
+    codec = JsonCodec(dictionaries=dict(dicts))
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, answer_json FROM interactions WHERE rowid > ? ORDER BY rowid LIMIT 500",
+            (last,),
+        ).fetchall()
+        if not rows:
+            return
+        updates = []
+        for rowid, answer_json in rows:
+            decision = _answer_decision(codec.decode(answer_json))
+            if decision is not None:
+                updates.append((decision, rowid))
+        conn.executemany(
+            "UPDATE interactions SET decision = ? WHERE rowid = ?", updates
+        )
+        last = rows[-1][0]
+
+
+def _answer_decision(answer_json: str) -> str | None:
+    try:
+        decision = json.loads(answer_json).get("decision")
+    except Exception:
+        return None
+    return decision if isinstance(decision, str) else None
+
+
+def _migrate_overlay_rollups(conn: sqlite3.Connection) -> None:
+    # Overlay edges past retention, summed per (src, rel, dst).
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS overlay_rollups (
+            pet_id TEXT NOT NULL,
+            src TEXT NOT NULL,
+            rel TEXT NOT NULL,
+            dst TEXT NOT NULL,
+            weight REAL NOT NULL,
+            edge_count INTEGER NOT NULL,
+            first_at REAL NOT NULL,
+            last_at REAL NOT NULL,
+            PRIMARY KEY (pet_id, src, rel, dst)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Per-pet limits; ``None`` disables a limit.
+
+    Interactions past a limit are archived to gzipped JSONL and deleted;
+    overlay edges past a limit are summed into ``overlay_rollups``.
+    """
+
+    max_age_s: float | None = None
+    max_interactions: int | None = None
+    max_overlay_edges: int | None = None
+
+    @classmethod
+    def from_settings(cls) -> RetentionPolicy:
+        return cls(
+            max_age_s=settings.retention_max_age_days * 86400 or None,
+            max_interactions=settings.retention_max_interactions or None,
+            max_overlay_edges=settings.retention_max_overlay_edges or None,
+        )
+
+    def enabled(self) -> bool:
+        return any(
+            v is not None
+            for v in (self.max_age_s, self.max_interactions, self.max_overlay_edges)
+        )
+
+
+_UPSERT_ROLLUP = (
+    "INSERT INTO overlay_rollups (pet_id, src, rel, dst, weight, edge_count, first_at, last_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (pet_id, src, rel, dst) DO UPDATE SET "
+    "weight = weight + excluded.weight, "
+    "edge_count = edge_count + excluded.edge_count, "
+    "first_at = MIN(first_at, excluded.first_at), "
+    "last_at = MAX(last_at, excluded.last_at)"
+)
+
+COMPACTION_BATCH = 500
+# Ids per ``IN (...)`` query; stays under SQLite's bound-parameter limit.
+_ID_CHUNK = 500
+
+
+# (table, key column, JSON column) triples the codec applies to.
+_COMPRESSED_COLUMNS = (
+    ("interactions", "id", "answer_json"),
+    ("evidence", "hash", "body"),
+    ("overlay_edges", "id", "meta_json"),
+)
+
+EXPORT_PAGE_SIZE = 500
+EXPORT_OVERLAY_MODES = ("window", "once", "none")
+
+
+def _encode_cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"invalid cursor: {cursor!r}") from None
+
+
+def _keyset_position(raw: str) -> tuple[float, str]:
+    ts, sep, row_id = raw.partition(":")
+    if not sep or not row_id:
+        raise ValueError
+    return float(ts), row_id
+
+
+def encode_page_cursor(created_at: float, row_id: str) -> str:
+    """Opaque, URL-safe cursor for a (created_at, id) keyset position."""
+    return _encode_cursor(f"{created_at!r}:{row_id}")
+
+
+def decode_page_cursor(cursor: str) -> tuple[float, str]:
+    """Inverse of ``encode_page_cursor``; raises ``ValueError`` if malformed."""
+    try:
+        return _keyset_position(_decode_cursor(cursor))
+    except ValueError:
+        raise ValueError(f"invalid cursor: {cursor!r}") from None
+
+
+# Once-mode edge row cursors also carry the export's start position.
+_EDGE_CURSOR = "edge:"
+
+
+def _edge_cursor(start: tuple[float, str], created_at: float, edge_id: str) -> str:
+    return _encode_cursor(
+        f"{_EDGE_CURSOR}{start[0]!r}:{start[1]}|{created_at!r}:{edge_id}"
+    )
+
+
+def _parse_export_since(
+    since: str | float | None,
+) -> tuple[tuple[float, str], tuple[float, str] | None, bool]:
+    """Turn ``since`` into ``(start, edge_after, fresh)``.
+
+    ``since`` is a bare timestamp or a cursor from a previous export row.
+    ``start`` is the interaction keyset position, ``edge_after`` the once-mode
+    edge position when resuming from an edge row, and ``fresh`` says the
+    export starts anew rather than resuming. Raises ``ValueError`` for a
+    malformed cursor.
+    """
+    if since is None or since == "":
+        return (float("-inf"), ""), None, True
+    try:
+        return (float(since), ""), None, True
+    except ValueError:
+        pass
+    raw = _decode_cursor(str(since))
+    try:
+        if raw.startswith(_EDGE_CURSOR):
+            start, sep, last_edge = raw[len(_EDGE_CURSOR) :].partition("|")
+            if not sep:
+                raise ValueError
+            ts, _, row_id = start.partition(":")
+            return (float(ts), row_id), _keyset_position(last_edge), False
+        return _keyset_position(raw), None, False
+    except ValueError:
+        raise ValueError(f"invalid cursor: {since!r}") from None
+
+
+# Ordered, append-only. Version N is MIGRATIONS[N - 1]; never reorder or edit
+# an entry that has shipped, add a new one instead.
+MIGRATIONS: list[tuple[str, Callable[[sqlite3.Connection], None]]] = [
+    ("base_tables", _migrate_base_tables),
+    ("pet_time_indexes", _migrate_pet_time_indexes),
+    ("keyset_indexes", _migrate_keyset_indexes),
+    ("content_addressed_evidence", _migrate_content_addressed_evidence),
+    ("compression_dicts", _migrate_compression_dicts),
+    ("interaction_decision", _migrate_interaction_decision),
+    ("overlay_rollups", _migrate_overlay_rollups),
+]
+
 
 class PetStore:
-    def __init__(self) -> None:
-        self.db_path = settings.sqlite_path
+    def __init__(
+        self,
+        db_path: str | None = None,
+        write_behind: bool | None = None,
+        compression: str | None = None,
+    ) -> None:
+        self.db_path = db_path or settings.sqlite_path
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._conns: list[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
         self._init_db()
+        self._compress = (compression or settings.pet_store_compression) == "zstd"
+        self._codec = self._load_codec()
+
+        # Write-through cache of pet_state rows. Every pet_state write goes
+        # through _pet_lock, so the cache matches the DB for this process;
+        # disable (PET_STATE_CACHE=0) if several processes share the file.
+        # LRU, bounded at PET_STATE_CACHE_SIZE pets.
+        self._pet_cache: OrderedDict[str, dict[str, Any]] | None = (
+            OrderedDict() if settings.pet_state_cache else None
+        )
+        self._pet_cache_lock = threading.Lock()
+        self._pet_lock = threading.RLock()
+
+        # Optional write-behind mode: interaction and overlay inserts are
+        # queued and group-committed by one writer thread. Rows not yet
+        # committed are kept in ``_pending`` so reads still see them.
+        self._pending: dict[str, Op] = {}
+        self._pending_lock = threading.Lock()
+        self._writer: WriteBehindQueue | None = None
+        if settings.pet_store_write_behind if write_behind is None else write_behind:
+            self._writer = WriteBehindQueue(
+                self._apply_batch,
+                max_queue=settings.write_behind_max_queue,
+                max_batch=settings.write_behind_max_batch,
+                max_delay_ms=settings.write_behind_max_delay_ms,
+            )
 
     def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        """Long-lived connection for the calling thread.
+
+        ``with conn:`` still commits or rolls back per call; the connection
+        itself stays open so each request skips the open + pragma cost.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=settings.sqlite_busy_timeout_ms / 1000,
+            check_same_thread=False,
+        )
+        # Only takes effect on a new, empty file (and must precede WAL);
+        # existing files need enable_incremental_vacuum() once.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets readers proceed while a writer commits; NORMAL sync is
+        # durable across app crashes and only fsyncs at checkpoints.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_bytes)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        with self._conns_lock:
+            self._conns.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Flush queued writes and close every thread's connection."""
+        if self._writer is not None:
+            self._writer.close()
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
 
     def _init_db(self) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS pet_state (
-                    pet_id TEXT PRIMARY KEY,
-                    stats_json TEXT NOT NULL,
-                    path TEXT NOT NULL
+        """Create or upgrade the schema by applying pending MIGRATIONS in order.
+
+        ``BEGIN IMMEDIATE`` takes the write lock before reading the current
+        version, so concurrent workers starting together migrate only once.
+        """
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+            ).fetchone()[0]
+            for version, (name, migrate) in enumerate(MIGRATIONS, start=1):
+                if version <= current:
+                    continue
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, time.time()),
                 )
-                """
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _apply_batch(self, ops: list[Op]) -> None:
+        try:
+            with self._connect() as conn:
+                for kind, params in ops:
+                    _execute(conn, kind, params, self._codec.encode)
+        finally:
+            with self._pending_lock:
+                for _, params in ops:
+                    self._pending.pop(params[0], None)
+
+    def _insert(self, kind: str, rows: list[tuple[Any, ...]]) -> None:
+        self._insert_ops([(kind, row) for row in rows])
+
+    def _insert_ops(self, ops: list[Op]) -> None:
+        """Insert rows for possibly different tables in one transaction."""
+        if not ops:
+            return
+        if self._writer is None:
+            with self._connect() as conn:
+                for kind, row in ops:
+                    _execute(conn, kind, row, self._codec.encode)
+            return
+        with self._pending_lock:
+            for kind, row in ops:
+                self._pending[row[0]] = (kind, row)
+        for op in ops:
+            self._writer.submit(op)
+
+    def _pending_rows(self, kind: str, pet_id: str) -> list[tuple[Any, ...]]:
+        if self._writer is None:
+            return []
+        with self._pending_lock:
+            return [
+                row
+                for op_kind, row in self._pending.values()
+                if op_kind == kind and row[1] == pet_id
+            ]
+
+    def flush(self) -> None:
+        """Wait until queued writes are committed (no-op without write-behind)."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def write_stats(self) -> dict[str, Any]:
+        if self._writer is None:
+            return {"write_behind": False}
+        return {"write_behind": True, **self._writer.stats()}
+
+    def enable_incremental_vacuum(self) -> bool:
+        """Switch an existing file to auto_vacuum=INCREMENTAL.
+
+        Needs a full VACUUM (rewrites the file, blocks writers), so run it
+        from a maintenance script, not the app. Returns False if already on.
+        """
+        conn = self._connect()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        self.flush()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+
+    def _retention_boundary(
+        self, table: str, pet_id: str, cutoff: float | None, keep: int | None
+    ) -> tuple[float, str] | None:
+        """Newest (created_at, id) of ``table`` to drop for ``pet_id``, if any."""
+        bounds = []
+        if cutoff is not None:
+            # Ids are never empty, so "<= (cutoff, '')" means created_at < cutoff.
+            bounds.append((cutoff, ""))
+        if keep is not None:
+            row = (
+                self._connect()
+                .execute(
+                    f"SELECT created_at, id FROM {table} WHERE pet_id = ? "
+                    "ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+                    (pet_id, keep),
+                )
+                .fetchone()
             )
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS interactions (
-                    id TEXT PRIMARY KEY,
-                    pet_id TEXT NOT NULL,
-                    question TEXT NOT NULL,
-                    evidence_json TEXT NOT NULL,
-                    answer_json TEXT NOT NULL,
-                    created_at REAL NOT NULL
+            if row is not None:
+                bounds.append((row[0], row[1]))
+        return max(bounds) if bounds else None
+
+    def _archive_interactions(
+        self, pet_id: str, boundary: tuple[float, str], archive_dir: str
+    ) -> int:
+        """Archive and delete one batch of the oldest interactions up to ``boundary``."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, created_at, question, evidence_json, answer_json FROM interactions "
+            "WHERE pet_id = ? AND (created_at, id) <= (?, ?) ORDER BY created_at, id LIMIT ?",
+            (pet_id, *boundary, COMPACTION_BATCH),
+        ).fetchall()
+        if not rows:
+            return 0
+        evidence = _load_evidence(
+            conn, ((r[0], r[3]) for r in rows), self._codec.decode
+        )
+        pet_dir = os.path.join(archive_dir, quote(pet_id, safe=""))
+        os.makedirs(pet_dir, exist_ok=True)
+        path = os.path.join(pet_dir, f"{rows[0][1]:.6f}-{rows[0][0]}.jsonl.gz")
+        # The archive is durable before any row is deleted; a crash in between
+        # only means the batch is archived again on the next run.
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            for iid, created_at, q, _, answer_json in rows:
+                row = self._export_interaction(
+                    (iid, created_at, q, evidence[iid], answer_json)
+                )
+                f.write(json.dumps({"pet_id": pet_id, **row}) + "\n")
+        with open(path + ".tmp", "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        ids = [r[0] for r in rows]
+        marks = ",".join("?" * len(ids))
+        with conn:
+            hashes = [
+                (h, h)
+                for (h,) in conn.execute(
+                    "SELECT DISTINCT evidence_hash FROM interaction_evidence "
+                    f"WHERE interaction_id IN ({marks})",
+                    ids,
                 )
-                """
+            ]
+            conn.execute(
+                f"DELETE FROM interaction_evidence WHERE interaction_id IN ({marks})",
+                ids,
+            )
+            conn.execute(f"DELETE FROM interactions WHERE id IN ({marks})", ids)
+            # Drop evidence bodies no remaining interaction links to.
+            conn.executemany(
+                "DELETE FROM evidence WHERE hash = ? AND NOT EXISTS "
+                "(SELECT 1 FROM interaction_evidence WHERE evidence_hash = ?)",
+                hashes,
             )
+        return len(rows)
+
+    def _roll_up_edges(self, pet_id: str, boundary: tuple[float, str]) -> int:
+        """Fold one batch of the oldest overlay edges up to ``boundary`` into rollups."""
+        conn = self._connect()
+        with conn:
+            rows = conn.execute(
+                "SELECT id, src, rel, dst, weight, created_at FROM overlay_edges "
+                "WHERE pet_id = ? AND (created_at, id) <= (?, ?) ORDER BY created_at, id LIMIT ?",
+                (pet_id, *boundary, COMPACTION_BATCH),
+            ).fetchall()
+            sums: dict[tuple[str, str, str], list[float]] = {}
+            for _, src, rel, dst, weight, created_at in rows:
+                agg = sums.setdefault((src, rel, dst), [0.0, 0, created_at, created_at])
+                agg[0] += weight
+                agg[1] += 1
+                agg[3] = created_at
+            conn.executemany(
+                _UPSERT_ROLLUP,
+                [
+                    (pet_id, *key, weight, int(n), first, last)
+                    for key, (weight, n, first, last) in sums.items()
+                ],
+            )
+            ids = [r[0] for r in rows]
             conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS overlay_edges (
-                    id TEXT PRIMARY KEY,
-                    pet_id TEXT NOT NULL,
-                    src TEXT NOT NULL,
-                    rel TEXT NOT NULL,
-                    dst TEXT NOT NULL,
-                    weight REAL NOT NULL,
-                    meta_json TEXT NOT NULL,
-                    created_at REAL NOT NULL
-                )
-                """
+                f"DELETE FROM overlay_edges WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
             )
-            conn.commit()
+        return len(rows)
 
-    def get_pet(self, pet_id: str) -> dict[str, Any]:
+    def compact(
+        self,
+        policy: RetentionPolicy,
+        archive_dir: str | None = None,
+        budget_ms: float = 0,
+        now: float | None = None,
+    ) -> dict[str, Any]:
+        """Apply ``policy`` oldest-first, then return free pages to the OS.
+
+        Work is done in small transactions and stops once ``budget_ms`` is
+        spent (0 = no limit); since the oldest rows go first, the next call
+        simply carries on. ``done`` is False when the budget ran out.
+        """
+        started = time.monotonic()
+
+        def expired() -> bool:
+            return bool(budget_ms) and (time.monotonic() - started) * 1000 >= budget_ms
+
+        self.flush()
+        now = time.time() if now is None else now
+        cutoff = now - policy.max_age_s if policy.max_age_s is not None else None
+        archive_dir = archive_dir or settings.retention_archive_dir
+        if not archive_dir:
+            archive_dir = os.path.join(os.path.dirname(self.db_path), "archive")
+        out: dict[str, Any] = {
+            "archived": 0,
+            "rolled_up": 0,
+            "vacuumed_pages": 0,
+            "done": True,
+        }
+        conn = self._connect()
+        pets = [
+            r[0]
+            for r in conn.execute(
+                "SELECT DISTINCT pet_id FROM interactions "
+                "UNION SELECT DISTINCT pet_id FROM overlay_edges"
+            )
+        ]
+        for pet_id in pets:
+            for table, keep in (
+                ("interactions", policy.max_interactions),
+                ("overlay_edges", policy.max_overlay_edges),
+            ):
+                boundary = self._retention_boundary(table, pet_id, cutoff, keep)
+                while boundary is not None:
+                    if expired():
+                        out["done"] = False
+                        return out
+                    if table == "interactions":
+                        n = self._archive_interactions(pet_id, boundary, archive_dir)
+                        out["archived"] += n
+                    else:
+                        n = self._roll_up_edges(pet_id, boundary)
+                        out["rolled_up"] += n
+                    if n < COMPACTION_BATCH:
+                        break
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            while (free := conn.execute("PRAGMA freelist_count").fetchone()[0]) > 0:
+                if expired():
+                    out["done"] = False
+                    break
+                pages = min(free, 256)
+                # execute() steps this pragma once (one page); executescript
+                # runs it to completion.
+                conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+                out["vacuumed_pages"] += pages
+        return out
+
+    def table_counts(self) -> dict[str, int]:
+        conn = self._connect()
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("pet_state", "interactions", "overlay_edges", "evidence")
+        }
+
+    def schema_version(self) -> int:
+        row = (
+            self._connect()
+            .execute("SELECT MAX(version) FROM schema_version")
+            .fetchone()
+        )
+        return int(row[0] or 0)
+
+    def _load_codec(self) -> JsonCodec:
+        rows = (
+            self._connect()
+            .execute("SELECT dict_id, dict FROM compression_dicts ORDER BY created_at")
+            .fetchall()
+        )
+        return JsonCodec(
+            enabled=self._compress,
+            level=settings.pet_store_zstd_level,
+            dictionaries={dict_id: raw for dict_id, raw in rows},
+            active_dict_id=rows[-1][0] if rows else None,
+        )
+
+    def sample_json(self, per_column: int) -> list[str]:
+        """Up to ``per_column`` random decoded values of each compressed column."""
+        conn = self._connect()
+        samples = []
+        for table, _, column in _COMPRESSED_COLUMNS:
+            rows = conn.execute(
+                f"SELECT {column} FROM {table} WHERE {column} != '' "
+                "ORDER BY RANDOM() LIMIT ?",
+                (per_column,),
+            ).fetchall()
+            samples += [self._codec.decode(r[0]) for r in rows]
+        return samples
+
+    def train_compression(self, per_column: int = 2000, dict_size: int = 32768) -> int:
+        """Train a zstd dictionary from stored rows and make it the write dictionary.
+
+        Existing rows keep whatever form they have; see ``recompress``.
+        """
+        self.flush()
+        dict_id, raw = train_dictionary(self.sample_json(per_column), dict_size)
         with self._connect() as conn:
-            row = conn.execute(
-                "SELECT stats_json, path FROM pet_state WHERE pet_id = ?",
-                (pet_id,),
-            ).fetchone()
-            if row:
-                return {"stats": json.loads(row[0]), "path": row[1]}
             conn.execute(
-                "INSERT INTO pet_state (pet_id, stats_json, path) VALUES (?, ?, ?)",
-                (pet_id, json.dumps(DEFAULT_STATS), DEFAULT_PATH),
+                "INSERT OR REPLACE INTO compression_dicts (dict_id, dict, created_at) VALUES (?, ?, ?)",
+                (dict_id, raw, time.time()),
             )
-            conn.commit()
-            return {"stats": dict(DEFAULT_STATS), "path": DEFAULT_PATH}
+        self._codec = self._load_codec()
+        return dict_id
+
+    def recompress(self, batch: int = 500) -> int:
+        """Rewrite JSON columns with the current codec; returns rows changed.
+
+        Works in short keyed batches so the app can keep writing meanwhile.
+        With compression disabled this decompresses everything instead.
+        """
+        self.flush()
+        changed = 0
+        for table, key, column in _COMPRESSED_COLUMNS:
+            last = ""
+            while True:
+                with self._connect() as conn:
+                    rows = conn.execute(
+                        f"SELECT {key}, {column} FROM {table} WHERE {key} > ? "
+                        f"ORDER BY {key} LIMIT ?",
+                        (last, batch),
+                    ).fetchall()
+                    updates = []
+                    for row_key, value in rows:
+                        encoded = self._codec.encode(self._codec.decode(value))
+                        if encoded != value:
+                            updates.append((encoded, row_key))
+                    conn.executemany(
+                        f"UPDATE {table} SET {column} = ? WHERE {key} = ?", updates
+                    )
+                changed += len(updates)
+                if len(rows) < batch:
+                    break
+                last = rows[-1][0]
+        return changed
+
+    def _load_pet(self, conn: sqlite3.Connection, pet_id: str) -> dict[str, Any]:
+        """Read a pet_state row, inserting defaults on first sight (no commit)."""
+        row = conn.execute(
+            "SELECT stats_json, path FROM pet_state WHERE pet_id = ?",
+            (pet_id,),
+        ).fetchone()
+        if row:
+            return {"stats": json.loads(row[0]), "path": row[1]}
+        conn.execute(
+            "INSERT INTO pet_state (pet_id, stats_json, path) VALUES (?, ?, ?)",
+            (pet_id, json.dumps(DEFAULT_STATS), DEFAULT_PATH),
+        )
+        return {"stats": dict(DEFAULT_STATS), "path": DEFAULT_PATH}
+
+    def _cache_pet(self, pet_id: str, state: dict[str, Any]) -> None:
+        if self._pet_cache is None:
+            return
+        with self._pet_cache_lock:
+            self._pet_cache[pet_id] = {
+                "stats": dict(state["stats"]),
+                "path": state["path"],
+            }
+            self._pet_cache.move_to_end(pet_id)
+            while len(self._pet_cache) > settings.pet_state_cache_size:
+                self._pet_cache.popitem(last=False)
+
+    def get_pet(self, pet_id: str) -> dict[str, Any]:
+        if self._pet_cache is not None:
+            with self._pet_cache_lock:
+                cached = self._pet_cache.get(pet_id)
+                if cached is not None:
+                    self._pet_cache.move_to_end(pet_id)
+            if cached is not None:
+                return {"stats": dict(cached["stats"]), "path": cached["path"]}
+        with self._pet_lock, self._connect() as conn:
+            state = self._load_pet(conn, pet_id)
+        self._cache_pet(pet_id, state)
+        return state
+
+    def _mutate_pet(
+        self,
+        pet_id: str,
+        fn: Callable[[sqlite3.Connection, dict[str, Any]], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Read-modify-write a pet in one BEGIN IMMEDIATE transaction.
+
+        ``fn`` gets the current state and returns the new one; it may write
+        other rows on ``conn`` as part of the same transaction.
+        """
+        with self._pet_lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                state = fn(conn, self._load_pet(conn, pet_id))
+                conn.execute(
+                    "UPDATE pet_state SET stats_json = ?, path = ? WHERE pet_id = ?",
+                    (json.dumps(state["stats"]), state["path"], pet_id),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self._cache_pet(pet_id, state)
+        return state
 
     def log_interaction(
         self,
@@ -90,22 +1015,59 @@ class PetStore:
         answer: dict[str, Any],
     ) -> str:
         interaction_id = str(uuid.uuid4())
-        with self._connect() as conn:
-            conn.execute(
-                "INSERT INTO interactions (id, pet_id, question, evidence_json, answer_json, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        self._insert(
+            INTERACTION,
+            [self._interaction_row(interaction_id, pet_id, question, evidence, answer)],
+        )
+        return interaction_id
+
+    def _interaction_row(
+        self,
+        interaction_id: str,
+        pet_id: str,
+        question: str,
+        evidence: list[dict[str, Any]],
+        answer: dict[str, Any],
+    ) -> tuple[Any, ...]:
+        return (
+            interaction_id,
+            pet_id,
+            question,
+            json.dumps(evidence),
+            self._codec.encode(json.dumps(answer)),
+            time.time(),
+            answer.get("decision") if isinstance(answer.get("decision"), str) else None,
+        )
+
+    def log_batch(
+        self,
+        pet_id: str,
+        entries: list[tuple[str, str, list[dict[str, Any]], dict[str, Any]]],
+    ) -> None:
+        """Log many ``(interaction_id, question, evidence, answer)`` at once.
+
+        The interactions and the overlay edges of every answer are written
+        in a single transaction (or queued together with write-behind).
+        """
+        ops: list[Op] = []
+        for interaction_id, question, evidence, answer in entries:
+            ops.append(
                 (
-                    interaction_id,
-                    pet_id,
-                    question,
-                    json.dumps(evidence),
-                    json.dumps(answer),
-                    time.time(),
-                ),
+                    INTERACTION,
+                    self._interaction_row(
+                        interaction_id, pet_id, question, evidence, answer
+                    ),
+                )
             )
-            conn.commit()
-        return interaction_id
+            rows, _ = self._overlay_rows(pet_id, answer.get("overlay_edges") or [])
+            ops.extend((OVERLAY_EDGE, row) for row in rows)
+        self._insert_ops(ops)
 
     def get_interaction_pet(self, interaction_id: str) -> str | None:
+        with self._pending_lock:
+            pending = self._pending.get(interaction_id)
+        if pending is not None:
+            return pending[1][1]
         with self._connect() as conn:
             row = conn.execute(
                 "SELECT pet_id FROM interactions WHERE id = ?",
@@ -115,122 +1077,277 @@ class PetStore:
                 return row[0]
         return None
 
+    def page_interactions(
+        self,
+        pet_id: str,
+        limit: int = 50,
+        cursor: str | None = None,
+        decision: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        order: str = "desc",
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of interaction history ordered by (created_at, id).
+
+        ``since``/``until`` bound ``created_at`` as [since, until). Pass the
+        returned cursor back to get the next page; it is ``None`` on the last
+        page. Each page is an index range scan, so depth does not matter.
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError(f"unknown order: {order}")
+        desc = order == "desc"
+        after = decode_page_cursor(cursor) if cursor else None
+
+        clauses = ["pet_id = ?"]
+        params: list[Any] = [pet_id]
+        if decision is not None:
+            clauses.append("decision = ?")
+            params.append(decision)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if after is not None:
+            op = "<" if desc else ">"
+            # Row-value comparison lets SQLite seek the index to the cursor.
+            clauses.append(f"(created_at, id) {op} (?, ?)")
+            params += [after[0], after[1]]
+        direction = "DESC" if desc else "ASC"
+        sql = (
+            "SELECT id, question, decision, created_at FROM interactions "
+            f"WHERE {' AND '.join(clauses)} "
+            f"ORDER BY created_at {direction}, id {direction} LIMIT ?"
+        )
+        # One extra row tells us whether another page exists.
+        rows = self._connect().execute(sql, (*params, limit + 1)).fetchall()
+
+        pending = self._pending_rows(INTERACTION, pet_id)
+        if pending:
+
+            def wanted(ts: float, iid: str, dec: str | None) -> bool:
+                if decision is not None and dec != decision:
+                    return False
+                if (since is not None and ts < since) or (
+                    until is not None and ts >= until
+                ):
+                    return False
+                if after is not None:
+                    return (ts, iid) < after if desc else (ts, iid) > after
+                return True
+
+            rows += [
+                (r[0], r[2], r[6], r[5]) for r in pending if wanted(r[5], r[0], r[6])
+            ]
+            rows.sort(key=lambda r: (r[3], r[0]), reverse=desc)
+            rows = rows[: limit + 1]
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        items = [
+            {"id": r[0], "question": r[1], "decision": r[2], "timestamp": r[3]}
+            for r in rows
+        ]
+        next_cursor = encode_page_cursor(rows[-1][3], rows[-1][0]) if more else None
+        return items, next_cursor
+
     def list_interactions(self, pet_id: str, limit: int = 10) -> list[dict[str, Any]]:
-        with self._connect() as conn:
-            rows = conn.execute(
-                "SELECT id, question, answer_json, created_at FROM interactions WHERE pet_id = ? ORDER BY created_at DESC LIMIT ?",
-                (pet_id, limit),
-            ).fetchall()
-            items = []
-            for r in rows:
-                decision = None
-                try:
-                    answer = json.loads(r[2])
-                    decision = answer.get("decision")
-                except Exception:
-                    decision = None
-                items.append(
-                    {
-                        "id": r[0],
-                        "question": r[1],
-                        "decision": decision,
-                        "timestamp": r[3],
-                    }
-                )
-            return items
+        return self.page_interactions(pet_id, limit=limit)[0]
 
     def update_stats(self, pet_id: str, action: str) -> dict[str, int]:
-        current = self.get_pet(pet_id)
-        stats = current["stats"]
+        state = self._mutate_pet(
+            pet_id,
+            lambda _conn, cur: {**cur, "stats": _apply_action(cur["stats"], action)},
+        )
+        return state["stats"]
+
+    def maybe_evolve(self, pet_id: str) -> str | None:
+        new_path: str | None = None
+
+        def evolve(_conn: sqlite3.Connection, cur: dict[str, Any]) -> dict[str, Any]:
+            nonlocal new_path
+            new_path = _next_path(cur["stats"], cur["path"])
+            return {**cur, "path": new_path or cur["path"]}
 
-        deltas = {
-            "approve": {"thriftiness": 2, "risk": -1},
-            "flag": {"risk": 2, "compliance": 1},
-            "escalate": {"risk": 3, "compliance": 2},
-            "reject": {"compliance": 2, "risk": 1},
-        }.get(action, {})
+        self._mutate_pet(pet_id, evolve)
+        return new_path
+
+    def apply_feedback(
+        self, interaction_id: str, action: str, rationale: str | None = None
+    ) -> dict[str, Any]:
+        """Apply one /feedback atomically: stats, evolution and overlay edge.
+
+        Returns ``pet_id``, ``stats``, ``path``, ``new_path`` and the saved
+        ``overlay_edges`` (same shape as ``add_overlay_edges``).
+        """
+        pet_id = self.get_interaction_pet(interaction_id) or "default"
+        rows, saved = self._overlay_rows(pet_id, _feedback_edges(action, rationale))
+        new_path: str | None = None
 
-        for key, delta in deltas.items():
-            stats[key] = max(0, min(100, stats.get(key, 50) + delta))
+        def apply(conn: sqlite3.Connection, cur: dict[str, Any]) -> dict[str, Any]:
+            nonlocal new_path
+            stats = _apply_action(cur["stats"], action)
+            new_path = _next_path(stats, cur["path"])
+            if rows:
+                conn.executemany(_INSERT_OVERLAY_EDGE, rows)
+            return {"stats": stats, "path": new_path or cur["path"]}
 
+        state = self._mutate_pet(pet_id, apply)
+        return {
+            "pet_id": pet_id,
+            "stats": state["stats"],
+            "path": state["path"],
+            "new_path": new_path,
+            "overlay_edges": saved,
+        }
+
+    def interaction_pets(self, interaction_ids: list[str]) -> dict[str, str]:
+        """``pet_id`` of each known interaction id, in a few queries."""
+        found: dict[str, str] = {}
+        with self._pending_lock:
+            for interaction_id in interaction_ids:
+                pending = self._pending.get(interaction_id)
+                if pending is not None:
+                    found[interaction_id] = pending[1][1]
+        missing = sorted(set(interaction_ids) - found.keys())
         with self._connect() as conn:
-            conn.execute(
-                "UPDATE pet_state SET stats_json = ? WHERE pet_id = ?",
-                (json.dumps(stats), pet_id),
+            for start in range(0, len(missing), _ID_CHUNK):
+                chunk = missing[start : start + _ID_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                found.update(
+                    conn.execute(
+                        f"SELECT id, pet_id FROM interactions WHERE id IN ({marks})",
+                        chunk,
+                    ).fetchall()
+                )
+        return found
+
+    def apply_feedback_batch(
+        self, items: list[tuple[str, str, str | None]]
+    ) -> dict[str, Any]:
+        """Apply many ``(interaction_id, action, rationale)`` records.
+
+        Items are grouped by pet and each pet is updated in one transaction:
+        stat deltas accumulate in input order, overlay edges are inserted
+        together and the evolution check runs once on the final stats.
+        Returns ``results`` (per item, input order, with the pet's stats
+        after that item) and ``pets`` (final state per pet).
+        """
+        pets = self.interaction_pets([item[0] for item in items])
+        by_pet: dict[str, list[int]] = {}
+        for index, item in enumerate(items):
+            by_pet.setdefault(pets.get(item[0], "default"), []).append(index)
+
+        results: list[dict[str, Any]] = [{} for _ in items]
+        summary: dict[str, dict[str, Any]] = {}
+        for pet_id, indexes in by_pet.items():
+            summary[pet_id], pet_results = self._apply_pet_feedback(
+                pet_id, [items[i] for i in indexes]
             )
-            conn.commit()
-        return stats
+            for index, result in zip(indexes, pet_results, strict=True):
+                results[index] = result
+        return {"results": results, "pets": summary}
 
-    def maybe_evolve(self, pet_id: str) -> str | None:
-        current = self.get_pet(pet_id)
-        stats = current["stats"]
-        score = sum(stats.values())
-        new_path = None
-        if score >= 240 and current["path"] != "Vigilant Auditor":
-            new_path = "Vigilant Auditor"
-        elif score >= 220 and current["path"] != "Steady Analyst":
-            new_path = "Steady Analyst"
-
-        if new_path:
-            with self._connect() as conn:
-                conn.execute(
-                    "UPDATE pet_state SET path = ? WHERE pet_id = ?",
-                    (new_path, pet_id),
-                )
-                conn.commit()
-        return new_path
+    def _apply_pet_feedback(
+        self, pet_id: str, items: list[tuple[str, str, str | None]]
+    ) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        rows: list[tuple[Any, ...]] = []
+        results: list[dict[str, Any]] = []
+        for interaction_id, action, rationale in items:
+            item_rows, saved = self._overlay_rows(
+                pet_id, _feedback_edges(action, rationale)
+            )
+            rows.extend(item_rows)
+            results.append(
+                {
+                    "interaction_id": interaction_id,
+                    "pet_id": pet_id,
+                    "overlay_edges": saved,
+                }
+            )
+        new_path: str | None = None
+
+        def apply(conn: sqlite3.Connection, cur: dict[str, Any]) -> dict[str, Any]:
+            nonlocal new_path
+            stats = cur["stats"]
+            for (_, action, _), result in zip(items, results, strict=True):
+                stats = _apply_action(stats, action)
+                result["stats"] = stats
+            new_path = _next_path(stats, cur["path"])
+            if rows:
+                conn.executemany(_INSERT_OVERLAY_EDGE, rows)
+            return {"stats": stats, "path": new_path or cur["path"]}
+
+        state = self._mutate_pet(pet_id, apply)
+        summary = {
+            "stats": state["stats"],
+            "path": state["path"],
+            "new_path": new_path,
+            "applied": len(items),
+        }
+        return summary, results
 
     def add_overlay_edges(
         self, pet_id: str, edges: list[dict[str, Any]]
     ) -> list[dict[str, Any]]:
+        rows, saved = self._overlay_rows(pet_id, edges)
+        self._insert(OVERLAY_EDGE, rows)
+        return saved
+
+    def _overlay_rows(
+        self, pet_id: str, edges: list[dict[str, Any]]
+    ) -> tuple[list[tuple[Any, ...]], list[dict[str, Any]]]:
         saved = []
-        with self._connect() as conn:
-            for edge in edges:
-                edge_id = str(uuid.uuid4())
-                src = edge.get("src")
-                rel = edge.get("rel")
-                dst = edge.get("dst")
-                if not src or not rel or not dst:
-                    continue
-                weight = float(edge.get("weight", 1.0))
-                meta = edge.get("meta", {})
-                conn.execute(
-                    "INSERT INTO overlay_edges (id, pet_id, src, rel, dst, weight, meta_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (
-                        edge_id,
-                        pet_id,
-                        src,
-                        rel,
-                        dst,
-                        weight,
-                        json.dumps(meta),
-                        time.time(),
-                    ),
-                )
-                saved.append(
-                    {
-                        "id": edge_id,
-                        "source": src,
-                        "target": dst,
-                        "label": rel,
-                        "weight": weight,
-                        "meta": meta,
-                        "isOverlay": True,
-                    }
+        rows = []
+        for edge in edges:
+            edge_id = str(uuid.uuid4())
+            src = edge.get("src")
+            rel = edge.get("rel")
+            dst = edge.get("dst")
+            if not src or not rel or not dst:
+                continue
+            weight = float(edge.get("weight", 1.0))
+            meta = edge.get("meta", {})
+            rows.append(
+                (
+                    edge_id,
+                    pet_id,
+                    src,
+                    rel,
+                    dst,
+                    weight,
+                    self._codec.encode(json.dumps(meta)),
+                    time.time(),
                 )
-            conn.commit()
-        return saved
+            )
+            saved.append(
+                {
+                    "id": edge_id,
+                    "source": src,
+                    "target": dst,
+                    "label": rel,
+                    "weight": weight,
+                    "meta": meta,
+                    "isOverlay": True,
+                }
+            )
+        return rows, saved
 
     def get_overlay_graph(self, pet_id: str, limit: int = 50) -> dict[str, Any]:
         with self._connect() as conn:
             rows = conn.execute(
-                "SELECT src, rel, dst, weight, meta_json FROM overlay_edges WHERE pet_id = ? ORDER BY created_at DESC LIMIT ?",
+                "SELECT src, rel, dst, weight, meta_json, created_at FROM overlay_edges WHERE pet_id = ? ORDER BY created_at DESC LIMIT ?",
                 (pet_id, limit),
             ).fetchall()
+        pending = self._pending_rows(OVERLAY_EDGE, pet_id)
+        if pending:
+            rows += [r[2:] for r in pending]
+            rows = sorted(rows, key=lambda r: r[5], reverse=True)[:limit]
 
         nodes: dict[str, dict[str, object]] = {}
         edges = []
-        for src, rel, dst, weight, meta_json in rows:
+        for src, rel, dst, weight, meta_json, _created_at in rows:
             nodes.setdefault(src, {"id": src, "label": src, "group": "overlay"})
             nodes.setdefault(dst, {"id": dst, "label": dst, "group": "overlay"})
             edges.append(
@@ -240,54 +1357,213 @@ class PetStore:
                     "target": dst,
                     "label": rel,
                     "weight": weight,
-                    "meta": json.loads(meta_json) if meta_json else {},
+                    "meta": json.loads(self._codec.decode(meta_json))
+                    if meta_json
+                    else {},
+                    "isOverlay": True,
+                }
+            )
+
+        # Rolled-up history: folded into a recent edge with the same relation,
+        # otherwise shown on its own.
+        seen: dict[str, dict[str, Any]] = {}
+        for edge in edges:
+            seen.setdefault(edge["id"], edge)
+        rollups = (
+            self._connect()
+            .execute(
+                "SELECT src, rel, dst, weight, edge_count, first_at, last_at "
+                "FROM overlay_rollups WHERE pet_id = ? ORDER BY weight DESC LIMIT ?",
+                (pet_id, limit),
+            )
+            .fetchall()
+        )
+        for src, rel, dst, weight, count, first_at, last_at in rollups:
+            edge_id = f"{src}->{rel}->{dst}"
+            recent = seen.get(edge_id)
+            if recent is not None:
+                recent["weight"] += weight
+                recent["meta"] = {**recent["meta"], "rolled_up": count}
+                continue
+            nodes.setdefault(src, {"id": src, "label": src, "group": "overlay"})
+            nodes.setdefault(dst, {"id": dst, "label": dst, "group": "overlay"})
+            edges.append(
+                {
+                    "id": edge_id,
+                    "source": src,
+                    "target": dst,
+                    "label": rel,
+                    "weight": weight,
+                    "meta": {
+                        "rolled_up": count,
+                        "first_at": first_at,
+                        "last_at": last_at,
+                    },
                     "isOverlay": True,
                 }
             )
         return {"nodes": list(nodes.values()), "edges": edges}
 
-    def export_pet(self, pet_id: str) -> list[dict[str, Any]]:
-        with self._connect() as conn:
-            interactions = conn.execute(
-                "SELECT question, evidence_json, answer_json, created_at FROM interactions WHERE pet_id = ? ORDER BY created_at ASC",
-                (pet_id,),
-            ).fetchall()
-            overlay_edges = conn.execute(
-                "SELECT src, rel, dst, weight, meta_json, created_at FROM overlay_edges WHERE pet_id = ? ORDER BY created_at ASC",
-                (pet_id,),
-            ).fetchall()
+    def _keyset_pages(
+        self, table: str, columns: str, pet_id: str, after: tuple[float, str]
+    ) -> Iterator[list[tuple[Any, ...]]]:
+        """Yield pages of ``table`` rows for ``pet_id`` after ``after`` in (created_at, id) order.
 
-        overlay = [
-            {
-                "src": r[0],
-                "rel": r[1],
-                "dst": r[2],
-                "weight": r[3],
-                "meta": json.loads(r[4]) if r[4] else {},
-                "timestamp": r[5],
-            }
-            for r in overlay_edges
-        ]
+        Each page is a separate short query, so no read transaction or cursor
+        is held between pages and iteration may hop threads.
+        """
+        ts, row_id = after
+        sql = (
+            f"SELECT id, created_at, {columns} FROM {table} "
+            "WHERE pet_id = ? AND (created_at, id) > (?, ?) "
+            "ORDER BY created_at, id LIMIT ?"
+        )
+        while True:
+            rows = (
+                self._connect()
+                .execute(sql, (pet_id, ts, row_id, EXPORT_PAGE_SIZE))
+                .fetchall()
+            )
+            if rows:
+                yield rows
+            if len(rows) < EXPORT_PAGE_SIZE:
+                return
+            row_id, ts = rows[-1][0], rows[-1][1]
 
-        exports = []
-        for q, evidence_json, answer_json, created_at in interactions:
-            try:
-                evidence = json.loads(evidence_json)
-            except Exception:
-                evidence = []
-            try:
-                answer = json.loads(answer_json)
-            except Exception:
-                answer = {}
-            exports.append(
-                {
-                    "question": q,
-                    "evidence": evidence,
-                    "decision": answer.get("decision"),
-                    "rationale": answer.get("rationale"),
-                    "confidence": answer.get("confidence"),
-                    "overlay_edges": overlay,
-                    "timestamp": created_at,
+    def _export_edge(self, row: tuple[Any, ...]) -> dict[str, Any]:
+        edge_id, created_at, src, rel, dst, weight, meta_json = row
+        return {
+            "id": edge_id,
+            "src": src,
+            "rel": rel,
+            "dst": dst,
+            "weight": weight,
+            "meta": json.loads(self._codec.decode(meta_json)) if meta_json else {},
+            "timestamp": created_at,
+        }
+
+    def _export_interactions(
+        self, pet_id: str, after: tuple[float, str]
+    ) -> Iterator[tuple[Any, ...]]:
+        """Interaction rows after ``after`` with evidence rehydrated per page."""
+        pages = self._keyset_pages(
+            "interactions", "question, evidence_json, answer_json", pet_id, after
+        )
+        for page in pages:
+            evidence = _load_evidence(
+                self._connect(), ((r[0], r[3]) for r in page), self._codec.decode
+            )
+            for iid, created_at, q, _, answer_json in page:
+                yield iid, created_at, q, evidence[iid], answer_json
+
+    def _export_interaction(self, row: tuple[Any, ...]) -> dict[str, Any]:
+        interaction_id, created_at, q, evidence, answer_json = row
+        try:
+            answer = json.loads(self._codec.decode(answer_json))
+        except Exception:
+            answer = {}
+        return {
+            "id": interaction_id,
+            "cursor": encode_page_cursor(created_at, interaction_id),
+            "question": q,
+            "evidence": evidence,
+            "decision": answer.get("decision"),
+            "rationale": answer.get("rationale"),
+            "confidence": answer.get("confidence"),
+            "timestamp": created_at,
+        }
+
+    def iter_export(
+        self,
+        pet_id: str,
+        since: str | float | None = None,
+        limit: int | None = None,
+        overlay: str = "window",
+    ) -> Iterator[dict[str, Any]]:
+        """Stream export rows for ``pet_id`` in (created_at, id) order.
+
+        ``overlay`` controls how overlay edges are emitted:
+
+        * ``window``: each interaction row carries the edges created between
+          it and the next interaction (its answer and feedback edges).
+        * ``once``: every edge is emitted once as its own ``kind: overlay_edge``
+          row ahead of the interactions; interaction rows carry no edges.
+          Only an export starting fresh (no ``since``, or a bare timestamp)
+          or resuming from an edge cursor emits edges; resuming from an
+          interaction cursor means the edges were already sent.
+        * ``none``: edges are omitted.
+
+        Every row has an opaque ``cursor`` (same encoding as
+        ``page_interactions``); pass the last one back as ``since`` to resume.
+        ``limit`` caps rows of either kind. Memory use is bounded by the page
+        size, not by history length. A malformed ``since`` raises
+        ``ValueError`` here rather than on the first ``next()``.
+        """
+        if overlay not in EXPORT_OVERLAY_MODES:
+            raise ValueError(f"unknown overlay mode: {overlay}")
+        after, edge_after, fresh = _parse_export_since(since)
+        if overlay != "once":
+            edge_after = None
+        elif fresh:
+            edge_after = after
+        return self._iter_export(pet_id, after, edge_after, limit, overlay)
+
+    def _iter_export(
+        self,
+        pet_id: str,
+        after: tuple[float, str],
+        edge_after: tuple[float, str] | None,
+        limit: int | None,
+        overlay: str,
+    ) -> Iterator[dict[str, Any]]:
+        """``iter_export`` body; ``edge_after`` None skips the once-mode edges."""
+        self.flush()
+        edge_cols = "src, rel, dst, weight, meta_json"
+        emitted = 0
+        if edge_after is not None:
+            pages = self._keyset_pages("overlay_edges", edge_cols, pet_id, edge_after)
+            for edge in chain.from_iterable(pages):
+                if limit is not None and emitted >= limit:
+                    return
+                yield {
+                    "kind": "overlay_edge",
+                    "cursor": _edge_cursor(after, edge[1], edge[0]),
+                    **self._export_edge(edge),
                 }
+                emitted += 1
+
+        interactions = self._export_interactions(pet_id, after)
+        edges = (
+            chain.from_iterable(
+                self._keyset_pages("overlay_edges", edge_cols, pet_id, after)
             )
-        return exports
+            if overlay == "window"
+            else iter(())
+        )
+        next_edge = next(edges, None)
+        current = next(interactions, None)
+        while current is not None and (limit is None or emitted < limit):
+            following = next(interactions, None)
+            start = current[1]
+            end = following[1] if following is not None else float("inf")
+            window: list[dict[str, Any]] = []
+            # Edges before this interaction belong to one already exported.
+            while next_edge is not None and next_edge[1] < end:
+                if next_edge[1] >= start:
+                    window.append(self._export_edge(next_edge))
+                next_edge = next(edges, None)
+            out = {"kind": "interaction", **self._export_interaction(current)}
+            if overlay == "window":
+                out["overlay_edges"] = window
+            yield out
+            emitted += 1
+            current = following
+
+    def export_pet(
+        self,
+        pet_id: str,
+        since: str | float | None = None,
+        limit: int | None = None,
+        overlay: str = "window",
+    ) -> list[dict[str, Any]]:
+        return list(self.iter_export(pet_id, since=since, limit=limit, overlay=overlay))
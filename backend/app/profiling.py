@@ -0,0 +1,240 @@
+"""On-demand profiling of a single request.
+
+A request that carries the profiling token (``X-Profile-Token`` header or
+``profile_token`` query parameter) runs under a sampling profiler and
+``tracemalloc``. On each tick the sampler only walks the threads that are
+inside one of the request's stages at that moment (see ``metrics.stage``);
+pooled workers serve other requests before and after, so they are only
+sampled while working for this one. Code outside a stage is not sampled.
+Allocations are process-wide, since tracemalloc cannot tell threads apart. Results are written as a speedscope profile plus an
+allocation summary and the response gets an ``X-Profile-Id`` header.
+
+At most one request is profiled at a time and at most one per
+``min_interval_s``; a request over the limit runs normally, unprofiled.
+"""
+
+from __future__ import annotations
+
+import hmac
+import json
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections.abc import Callable, Collection
+from pathlib import Path
+from typing import Any
+
+PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+KINDS = {"speedscope": ".speedscope.json", "alloc": ".alloc.json"}
+
+
+class _Sampler(threading.Thread):
+    """Samples the stacks of ``threads()`` every ``interval_s`` seconds."""
+
+    def __init__(
+        self, threads: Callable[[], Collection[int]], interval_s: float
+    ) -> None:
+        super().__init__(name="request-profiler", daemon=True)
+        self.threads = threads
+        self.interval_s = interval_s
+        self.frames: dict[tuple[str, str, int], int] = {}
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self._halt = threading.Event()
+
+    def _frame_index(self, key: tuple[str, str, int]) -> int:
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while not self._halt.wait(self.interval_s):
+            now = time.perf_counter()
+            elapsed_ms, last = (now - last) * 1000, now
+            current = sys._current_frames()
+            for ident in self.threads():
+                frame = current.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    key = (code.co_name, code.co_filename, code.co_firstlineno)
+                    stack.append(self._frame_index(key))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    self.samples.append(stack)
+                    self.weights.append(elapsed_ms)
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+    def speedscope(self, name: str) -> dict[str, Any]:
+        frames = [
+            {"name": fn, "file": file, "line": line} for fn, file, line in self.frames
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "finagotchi",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(sum(self.weights), 3),
+                    "samples": self.samples,
+                    "weights": [round(w, 3) for w in self.weights],
+                }
+            ],
+        }
+
+
+class Session:
+    """One profiled request; ``finish`` stops sampling and writes the results."""
+
+    def __init__(
+        self, owner: RequestProfiler, threads: Callable[[], Collection[int]]
+    ) -> None:
+        self.owner = owner
+        self.started = time.perf_counter()
+        # Only stop tracemalloc afterwards if this session turned it on.
+        self._started_tracing = not tracemalloc.is_tracing()
+        self._before: tracemalloc.Snapshot | None = None
+        if self._started_tracing:
+            tracemalloc.start()
+        else:
+            self._before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self.sampler = _Sampler(threads, owner.interval_s)
+        self.sampler.start()
+
+    def _allocations(self) -> dict[str, Any]:
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        if self._started_tracing:
+            tracemalloc.stop()
+        if self._before is None:
+            stats = snapshot.statistics("lineno")
+            top = [
+                {
+                    "file": s.traceback[0].filename,
+                    "line": s.traceback[0].lineno,
+                    "size_bytes": s.size,
+                    "count": s.count,
+                }
+                for s in stats[: self.owner.top_n]
+            ]
+            net = sum(s.size for s in stats)
+        else:
+            diffs = snapshot.compare_to(self._before, "lineno")
+            top = [
+                {
+                    "file": d.traceback[0].filename,
+                    "line": d.traceback[0].lineno,
+                    "size_bytes": d.size_diff,
+                    "count": d.count_diff,
+                }
+                for d in diffs[: self.owner.top_n]
+            ]
+            net = sum(d.size_diff for d in diffs)
+        return {"peak_bytes": peak, "net_bytes": net, "top": top}
+
+    def finish(self, name: str) -> str:
+        """Returns the profile id."""
+        try:
+            self.sampler.stop()
+            allocations = self._allocations()
+            allocations["wall_ms"] = round(
+                (time.perf_counter() - self.started) * 1000, 1
+            )
+            allocations["samples"] = len(self.sampler.samples)
+            return self.owner.save(self.sampler.speedscope(name), allocations)
+        finally:
+            self.owner.done()
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        token: str | None,
+        out_dir: str,
+        interval_s: float = 0.005,
+        min_interval_s: float = 60.0,
+        keep: int = 20,
+        top_n: int = 25,
+    ) -> None:
+        self.token = token
+        self.out_dir = Path(out_dir)
+        self.interval_s = interval_s
+        self.min_interval_s = min_interval_s
+        self.keep = keep
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._active = False
+        self._last_start = float("-inf")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, supplied: str | None) -> bool:
+        if not self.token or supplied is None:
+            return False
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def begin(self, threads: Callable[[], Collection[int]]) -> Session | None:
+        """Start profiling, or None when another profile is running or too recent.
+
+        ``threads`` returns the threads currently working for the request.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._active or now - self._last_start < self.min_interval_s:
+                return None
+            self._active = True
+            self._last_start = now
+        try:
+            return Session(self, threads)
+        except BaseException:
+            self.done()
+            raise
+
+    def done(self) -> None:
+        with self._lock:
+            self._active = False
+
+    def save(self, profile: dict[str, Any], allocations: dict[str, Any]) -> str:
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        for kind, body in (("speedscope", profile), ("alloc", allocations)):
+            path = self.out_dir / f"{profile_id}{KINDS[kind]}"
+            path.write_text(json.dumps(body), encoding="utf-8")
+        self._prune()
+        return profile_id
+
+    def _prune(self) -> None:
+        if self.keep <= 0:
+            return
+        allocs = sorted(
+            self.out_dir.glob("*.alloc.json"), key=lambda p: p.stat().st_mtime_ns
+        )
+        ids = [p.name.split(".", 1)[0] for p in allocs]
+        for old in ids[: -self.keep]:
+            for suffix in KINDS.values():
+                (self.out_dir / f"{old}{suffix}").unlink(missing_ok=True)
+
+    def path(self, profile_id: str, kind: str) -> Path | None:
+        if not PROFILE_ID.match(profile_id) or kind not in KINDS:
+            return None
+        path = self.out_dir / f"{profile_id}{KINDS[kind]}"
+        return path if path.exists() else None
@@ -32,6 +32,32 @@ def search(
     )
 
 
+def search_batch(
+    client: QdrantClient, vectors: list[list[float]]
+) -> list[list[qdrant_models.ScoredPoint]]:
+    """``search`` for several vectors in one round trip."""
+    if not vectors:
+        return []
+    requests = [
+        qdrant_models.SearchRequest(
+            vector=(
+                qdrant_models.NamedVector(
+                    name=settings.qdrant_vector_name, vector=vector
+                )
+                if settings.qdrant_vector_name
+                else vector
+            ),
+            limit=settings.qdrant_top_k,
+            with_payload=True,
+            with_vector=False,
+        )
+        for vector in vectors
+    ]
+    return client.search_batch(
+        collection_name=settings.qdrant_collection, requests=requests
+    )
+
+
 def retrieve_by_ids(client: QdrantClient, ids: list[str]) -> list[qdrant_models.Record]:
     """Fetch specific points by their full IDs (qdrant:collection:uuid format)."""
     # Extract the UUID part from full IDs like "qdrant:DocumentChunk_text:uuid"
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Literal, TypedDict
 
 from pydantic import BaseModel, Field
 
@@ -16,6 +16,19 @@ class QARequest(BaseModel):
     evidence_ids: list[str] | None = Field(
         default=None, description="Pre-selected evidence IDs from dilemma generation"
     )
+    graph_since: str | None = Field(
+        default=None,
+        description="graph_version from a previous response; returns graph_delta",
+    )
+    known_node_ids: list[str] | None = Field(
+        default=None, description="Node ids already held; returns graph_delta"
+    )
+    known_edge_ids: list[str] | None = Field(
+        default=None, description="Edge ids already held; returns graph_delta"
+    )
+    include_combined: bool = Field(
+        default=True, description="Include graph_combined in full responses"
+    )
 
 
 class DilemmaResponse(BaseModel):
@@ -53,6 +66,82 @@ class GraphEdge(BaseModel):
 class GraphBundle(BaseModel):
     nodes: list[GraphNode]
     edges: list[GraphEdge]
+    version: str | None = None
+
+
+class GraphDelta(BaseModel):
+    """Changes between a graph the client holds and the current one."""
+
+    version: str = Field(description="Token for the current graph")
+    base_version: str | None = Field(
+        default=None, description="Token the delta was computed against"
+    )
+    full: bool = Field(
+        default=False, description="True when no base was known; nodes/edges are all"
+    )
+    nodes: list[GraphNode] = Field(default_factory=list)
+    edges: list[GraphEdge] = Field(default_factory=list)
+    removed_node_ids: list[str] = Field(default_factory=list)
+    removed_edge_ids: list[str] = Field(default_factory=list)
+
+
+# Plain-dict twins of the graph models above, for the internal graph path.
+# Producers fill every key, so they serialize exactly like the models without
+# per-element validation; see fast_json.
+
+
+class GraphNodeData(TypedDict):
+    id: str
+    label: str | None
+    group: str | None
+    type: str | None
+    meta: dict[str, Any]
+    properties: dict[str, Any] | None
+
+
+class GraphEdgeData(TypedDict):
+    id: str | None
+    source: str
+    target: str
+    label: str | None
+    weight: float | None
+    meta: dict[str, Any]
+    isOverlay: bool | None
+
+
+class GraphBundleData(TypedDict):
+    nodes: list[GraphNodeData]
+    edges: list[GraphEdgeData]
+    version: str | None
+
+
+class GraphDeltaData(TypedDict):
+    version: str
+    base_version: str | None
+    full: bool
+    nodes: list[GraphNodeData]
+    edges: list[GraphEdgeData]
+    removed_node_ids: list[str]
+    removed_edge_ids: list[str]
+
+
+class VendorStats(BaseModel):
+    """Per-vendor invoice aggregates materialized by the Kuzu build."""
+
+    vendor_id: str
+    invoice_count: int
+    total_sum: float
+    total_mean: float
+    total_std: float
+    total_p50: float
+    total_p90: float
+    total_p99: float
+    total_max: float
+    last_invoice_date: str | None = None
+    overdue_count: int
+    as_of: str | None = Field(
+        default=None, description="Date overdue_count was computed against"
+    )
 
 
 class AnswerJSON(BaseModel):
@@ -66,11 +155,40 @@ class AnswerJSON(BaseModel):
 class QAResponse(BaseModel):
     answer_json: AnswerJSON
     evidence_bundle: list[EvidenceItem]
-    neighborhood_graph: GraphBundle
-    overlay_graph: GraphBundle
+    neighborhood_graph: GraphBundle | None = None
+    overlay_graph: GraphBundle | None = None
     graph_combined: GraphBundle | None = None
+    graph_version: str | None = None
+    graph_delta: GraphDelta | None = None
     pet_stats: dict[str, int]
     interaction_id: str
+    # "exact" or "semantic" when the answer came from the answer cache.
+    cache_hit: Literal["exact", "semantic"] | None = None
+
+
+class QABatchItem(BaseModel):
+    question: str = Field(description="User question or dilemma prompt")
+    context: str | None = Field(
+        default=None, description="Dilemma context for evidence retrieval"
+    )
+    evidence_ids: list[str] | None = Field(
+        default=None, description="Pre-selected evidence IDs from dilemma generation"
+    )
+
+
+class QABatchRequest(BaseModel):
+    """Many questions for one pet, answered as a JSONL stream."""
+
+    pet_id: str = Field(default="default", description="Pet identifier")
+    items: list[QABatchItem] = Field(min_length=1)
+    concurrency: int | None = Field(
+        default=None,
+        ge=1,
+        description="Parallel model calls, at most QA_BATCH_CONCURRENCY",
+    )
+    include_graphs: bool = Field(
+        default=False, description="Add neighborhood_graph to every result line"
+    )
 
 
 class FeedbackRequest(BaseModel):
@@ -88,6 +206,49 @@ class FeedbackResponse(BaseModel):
     new_path: str | None = None
 
 
+class FeedbackBatchRequest(BaseModel):
+    """Many feedback records, applied grouped by pet."""
+
+    items: list[FeedbackRequest] = Field(min_length=1)
+
+
+class FeedbackBatchResult(BaseModel):
+    interaction_id: str
+    pet_id: str
+    pet_stats: dict[str, int] = Field(description="Pet stats after this item")
+    overlay_edges: list[GraphEdge]
+
+
+class FeedbackPetSummary(BaseModel):
+    pet_stats: dict[str, int]
+    path: str
+    new_path: str | None = None
+    applied: int
+
+
+class FeedbackBatchResponse(BaseModel):
+    results: list[FeedbackBatchResult]
+    pets: dict[str, FeedbackPetSummary]
+    applied: int
+    elapsed_ms: float
+    items_per_s: float
+
+
+class InteractionSummary(BaseModel):
+    id: str
+    question: str
+    decision: str | None = None
+    timestamp: float
+
+
+class InteractionPage(BaseModel):
+    items: list[InteractionSummary]
+    next_cursor: str | None = Field(
+        default=None,
+        description="Pass as `cursor` for the next page; null on the last page",
+    )
+
+
 class PetResponse(BaseModel):
     pet_stats: dict[str, int]
     path: str
@@ -0,0 +1,311 @@
+"""Pet store split across several SQLite files by a stable hash of pet_id.
+
+SQLite allows one writer per file, so with a single ``pet_state.db`` every
+/qa and /feedback write queues behind every other pet's. Each shard here is
+an ordinary ``PetStore`` (own connections, write-behind queue and caches);
+all of a pet's rows live in one shard, so per-pet reads and transactions
+are unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from .config import settings
+from .pet_store import PetStore, RetentionPolicy
+
+T = TypeVar("T")
+
+# Remember which shard recent interactions went to so /feedback does not
+# have to probe every shard.
+_ROUTE_CACHE_SIZE = 10_000
+
+
+def shard_for(pet_id: str, shards: int) -> int:
+    """Stable shard index for ``pet_id`` (unlike ``hash()``, same in every process)."""
+    digest = hashlib.blake2b(pet_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def shard_paths(base_path: str, shards: int) -> list[str]:
+    """File names for ``shards`` shards of ``base_path``.
+
+    One shard is the unsharded file itself. Names carry the shard count, so
+    a reshard writes new files next to the old ones.
+    """
+    if shards <= 1:
+        return [base_path]
+    root, ext = os.path.splitext(base_path)
+    return [f"{root}.shard{i}of{shards}{ext}" for i in range(shards)]
+
+
+class ShardedPetStore:
+    """``PetStore`` interface over N shard files."""
+
+    def __init__(
+        self,
+        base_path: str | None = None,
+        shards: int | None = None,
+        write_behind: bool | None = None,
+        compression: str | None = None,
+    ) -> None:
+        self.base_path = base_path or settings.sqlite_path
+        self.paths = shard_paths(self.base_path, shards or settings.pet_store_shards)
+        self.shards = [
+            PetStore(path, write_behind=write_behind, compression=compression)
+            for path in self.paths
+        ]
+        self._routes: OrderedDict[str, int] = OrderedDict()
+        self._routes_lock = threading.Lock()
+
+    def shard(self, pet_id: str) -> PetStore:
+        return self.shards[shard_for(pet_id, len(self.shards))]
+
+    # Cross-shard helpers
+
+    def map_shards(self, fn: Callable[[PetStore], T]) -> list[T]:
+        """Run ``fn`` on every shard concurrently; results are in shard order."""
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as pool:
+            return list(pool.map(fn, self.shards))
+
+    def close(self) -> None:
+        self.map_shards(PetStore.close)
+
+    def flush(self) -> None:
+        self.map_shards(PetStore.flush)
+
+    def schema_version(self) -> int:
+        return min(self.map_shards(PetStore.schema_version))
+
+    def write_stats(self) -> dict[str, Any]:
+        per_shard = self.map_shards(PetStore.write_stats)
+        return {
+            "write_behind": per_shard[0]["write_behind"],
+            "shards": [
+                {"path": path, **stats}
+                for path, stats in zip(self.paths, per_shard, strict=True)
+            ],
+        }
+
+    def table_counts(self) -> dict[str, int]:
+        totals: dict[str, int] = {}
+        for counts in self.map_shards(PetStore.table_counts):
+            for table, n in counts.items():
+                totals[table] = totals.get(table, 0) + n
+        return totals
+
+    def sample_json(self, per_column: int) -> list[str]:
+        return [
+            value
+            for values in self.map_shards(lambda s: s.sample_json(per_column))
+            for value in values
+        ]
+
+    def train_compression(
+        self, per_column: int = 2000, dict_size: int = 32768
+    ) -> list[int]:
+        return self.map_shards(lambda s: s.train_compression(per_column, dict_size))
+
+    def recompress(self, batch: int = 500) -> int:
+        return sum(self.map_shards(lambda s: s.recompress(batch)))
+
+    def enable_incremental_vacuum(self) -> bool:
+        return any(self.map_shards(PetStore.enable_incremental_vacuum))
+
+    def compact(
+        self,
+        policy: RetentionPolicy,
+        archive_dir: str | None = None,
+        budget_ms: float = 0,
+        now: float | None = None,
+    ) -> dict[str, Any]:
+        """``PetStore.compact`` on every shard in parallel, each with the full budget."""
+        results = self.map_shards(
+            lambda s: s.compact(policy, archive_dir, budget_ms, now)
+        )
+        return {
+            "archived": sum(r["archived"] for r in results),
+            "rolled_up": sum(r["rolled_up"] for r in results),
+            "vacuumed_pages": sum(r["vacuumed_pages"] for r in results),
+            "done": all(r["done"] for r in results),
+        }
+
+    # Routing by interaction id
+
+    def _remember(self, interaction_id: str, index: int) -> None:
+        with self._routes_lock:
+            self._routes[interaction_id] = index
+            self._routes.move_to_end(interaction_id)
+            while len(self._routes) > _ROUTE_CACHE_SIZE:
+                self._routes.popitem(last=False)
+
+    def _shard_of_interaction(self, interaction_id: str) -> PetStore | None:
+        with self._routes_lock:
+            index = self._routes.get(interaction_id)
+        if index is not None:
+            return self.shards[index]
+        for store in self.shards:
+            if store.get_interaction_pet(interaction_id) is not None:
+                return store
+        return None
+
+    def get_interaction_pet(self, interaction_id: str) -> str | None:
+        store = self._shard_of_interaction(interaction_id)
+        return store.get_interaction_pet(interaction_id) if store else None
+
+    def apply_feedback(
+        self, interaction_id: str, action: str, rationale: str | None = None
+    ) -> dict[str, Any]:
+        # Unknown interactions fall back to the "default" pet, as in PetStore.
+        store = self._shard_of_interaction(interaction_id) or self.shard("default")
+        return store.apply_feedback(interaction_id, action, rationale)
+
+    def interaction_pets(self, interaction_ids: list[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        for pets in self.map_shards(lambda s: s.interaction_pets(interaction_ids)):
+            found.update(pets)
+        return found
+
+    def apply_feedback_batch(
+        self, items: list[tuple[str, str, str | None]]
+    ) -> dict[str, Any]:
+        """``PetStore.apply_feedback_batch`` per shard, shards in parallel."""
+        pets = self.interaction_pets([item[0] for item in items])
+        by_shard: dict[int, list[int]] = {}
+        for index, item in enumerate(items):
+            # Unknown interactions go to the "default" pet, as in apply_feedback.
+            shard = shard_for(pets.get(item[0], "default"), len(self.shards))
+            by_shard.setdefault(shard, []).append(index)
+
+        def apply(shard: int) -> dict[str, Any]:
+            batch = [items[i] for i in by_shard[shard]]
+            return self.shards[shard].apply_feedback_batch(batch)
+
+        results: list[dict[str, Any]] = [{} for _ in items]
+        summary: dict[str, dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(by_shard))) as pool:
+            for shard, out in zip(by_shard, pool.map(apply, by_shard), strict=True):
+                for index, result in zip(by_shard[shard], out["results"], strict=True):
+                    results[index] = result
+                summary.update(out["pets"])
+        return {"results": results, "pets": summary}
+
+    # Per-pet operations
+
+    def log_interaction(
+        self,
+        pet_id: str,
+        question: str,
+        evidence: list[dict[str, Any]],
+        answer: dict[str, Any],
+    ) -> str:
+        index = shard_for(pet_id, len(self.shards))
+        interaction_id = self.shards[index].log_interaction(
+            pet_id, question, evidence, answer
+        )
+        self._remember(interaction_id, index)
+        return interaction_id
+
+    def log_batch(
+        self,
+        pet_id: str,
+        entries: list[tuple[str, str, list[dict[str, Any]], dict[str, Any]]],
+    ) -> None:
+        index = shard_for(pet_id, len(self.shards))
+        self.shards[index].log_batch(pet_id, entries)
+        for entry in entries:
+            self._remember(entry[0], index)
+
+    def get_pet(self, pet_id: str) -> dict[str, Any]:
+        return self.shard(pet_id).get_pet(pet_id)
+
+    def update_stats(self, pet_id: str, action: str) -> dict[str, int]:
+        return self.shard(pet_id).update_stats(pet_id, action)
+
+    def maybe_evolve(self, pet_id: str) -> str | None:
+        return self.shard(pet_id).maybe_evolve(pet_id)
+
+    def page_interactions(
+        self, pet_id: str, limit: int = 50, **kwargs: Any
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        return self.shard(pet_id).page_interactions(pet_id, limit=limit, **kwargs)
+
+    def list_interactions(self, pet_id: str, limit: int = 10) -> list[dict[str, Any]]:
+        return self.shard(pet_id).list_interactions(pet_id, limit=limit)
+
+    def add_overlay_edges(
+        self, pet_id: str, edges: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        return self.shard(pet_id).add_overlay_edges(pet_id, edges)
+
+    def get_overlay_graph(self, pet_id: str, limit: int = 50) -> dict[str, Any]:
+        return self.shard(pet_id).get_overlay_graph(pet_id, limit=limit)
+
+    def iter_export(self, pet_id: str, **kwargs: Any) -> Iterator[dict[str, Any]]:
+        return self.shard(pet_id).iter_export(pet_id, **kwargs)
+
+    def export_pet(self, pet_id: str, **kwargs: Any) -> list[dict[str, Any]]:
+        return self.shard(pet_id).export_pet(pet_id, **kwargs)
+
+
+def open_pet_store() -> PetStore | ShardedPetStore:
+    """The configured store: plain ``PetStore`` unless PET_STORE_SHARDS > 1."""
+    if settings.pet_store_shards > 1:
+        return ShardedPetStore()
+    return PetStore()
+
+
+# Copy order matters: links need their interactions, evidence is selected
+# through the links already copied into the target.
+_RESHARD_SQL = (
+    "INSERT OR IGNORE INTO t.compression_dicts SELECT * FROM main.compression_dicts",
+    "INSERT OR REPLACE INTO t.pet_state SELECT * FROM main.pet_state WHERE shard_of(pet_id) = ?",
+    "INSERT OR IGNORE INTO t.interactions SELECT * FROM main.interactions WHERE shard_of(pet_id) = ?",
+    "INSERT OR IGNORE INTO t.overlay_edges SELECT * FROM main.overlay_edges WHERE shard_of(pet_id) = ?",
+    "INSERT OR REPLACE INTO t.overlay_rollups SELECT * FROM main.overlay_rollups WHERE shard_of(pet_id) = ?",
+    "INSERT OR IGNORE INTO t.interaction_evidence SELECT l.* FROM main.interaction_evidence l "
+    "JOIN main.interactions i ON i.id = l.interaction_id WHERE shard_of(i.pet_id) = ?",
+    "INSERT OR IGNORE INTO t.evidence SELECT * FROM main.evidence "
+    "WHERE hash IN (SELECT evidence_hash FROM t.interaction_evidence)",
+)
+
+
+def reshard(sources: list[str], targets: list[str]) -> None:
+    """Copy every row from ``sources`` into ``targets`` by ``shard_for``.
+
+    Sources are migrated to the current schema first and are left in place;
+    targets must be new paths. Rows are copied as stored, so compressed
+    values and evidence hashes carry over unchanged.
+    """
+    overlap = set(map(os.path.abspath, sources)) & set(map(os.path.abspath, targets))
+    if overlap:
+        raise ValueError(f"targets overlap sources: {sorted(overlap)}")
+    for path in sources + targets:
+        # Opening a PetStore creates/migrates the schema, so columns line up.
+        store = PetStore(path, write_behind=False)
+        store.close()
+
+    n = len(targets)
+    for source in sources:
+        conn = sqlite3.connect(source)
+        try:
+            conn.create_function(
+                "shard_of", 1, lambda pet_id: shard_for(pet_id, n), deterministic=True
+            )
+            for index, target in enumerate(targets):
+                conn.execute("ATTACH DATABASE ? AS t", (target,))
+                try:
+                    with conn:
+                        for sql in _RESHARD_SQL:
+                            conn.execute(sql, (index,) if "?" in sql else ())
+                finally:
+                    conn.execute("DETACH DATABASE t")
+        finally:
+            conn.close()
@@ -0,0 +1,143 @@
+"""Parallel, non-blocking startup of the heavy app components.
+
+Loading the GGUF models, opening Kuzu and the pet store used to happen at
+import time, one after the other, so nothing (not even /health) answered
+until all of it was done. ``Startup`` runs the loaders concurrently in
+worker threads from the lifespan, then the optional warm-up steps, while
+the server already accepts connections. ``StartupGate`` answers 503 for
+everything except health, readiness and docs routes until it has finished.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Collection
+from typing import Any
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger("finagotchi.startup")
+
+
+class Startup:
+    """Runs ``loaders`` in parallel, then ``warmups`` in parallel.
+
+    A failed loader fails startup; a failed warm-up is only logged, since
+    the component works without it. ``state`` goes ``idle`` -> ``loading``
+    -> ``warming`` -> ``ready`` (or ``failed``). An app whose lifespan never
+    ran (components injected directly, as in tests) stays ``idle`` and is not
+    gated.
+    """
+
+    def __init__(
+        self,
+        loaders: dict[str, Callable[[], object]],
+        warmups: dict[str, Callable[[], object]] | None = None,
+    ) -> None:
+        self.loaders = loaders
+        self.warmups = warmups or {}
+        self.state = "idle"
+        self._started: float | None = None
+        self._elapsed_ms: float | None = None
+        self._steps: dict[str, dict[str, Any]] = {}
+        self._finished = asyncio.Event()
+
+    @property
+    def blocking(self) -> bool:
+        return self.state in ("loading", "warming", "failed")
+
+    def loaded(self, name: str) -> bool:
+        return self._steps.get(name, {}).get("ok") is True
+
+    async def wait(self) -> None:
+        """Return once startup has finished, successfully or not."""
+        await self._finished.wait()
+
+    async def _step(self, name: str, fn: Callable[[], object], soft: bool) -> bool:
+        step: dict[str, Any] = {"ok": None, "ms": None, "error": None}
+        self._steps[name] = step
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(fn)
+            step["ok"] = True
+        except Exception as exc:
+            step["ok"] = False
+            step["error"] = f"{type(exc).__name__}: {exc}"
+            if soft:
+                logger.warning("startup step %s failed: %s", name, step["error"])
+            else:
+                logger.exception("startup step %s failed", name)
+        step["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return step["ok"]
+
+    async def _run_all(
+        self, steps: dict[str, Callable[[], object]], soft: bool = False
+    ) -> bool:
+        results = await asyncio.gather(
+            *(self._step(name, fn, soft) for name, fn in steps.items())
+        )
+        return all(results)
+
+    async def run(self) -> None:
+        self._started = time.perf_counter()
+        try:
+            self.state = "loading"
+            if not await self._run_all(self.loaders):
+                self.state = "failed"
+                return
+            if self.warmups:
+                self.state = "warming"
+                await self._run_all(
+                    {f"warmup:{n}": f for n, f in self.warmups.items()}, soft=True
+                )
+            self.state = "ready"
+        finally:
+            self._elapsed_ms = round((time.perf_counter() - self._started) * 1000, 1)
+            self._finished.set()
+            logger.info("startup %s in %sms", self.state, self._elapsed_ms)
+
+    def status(self) -> dict[str, Any]:
+        elapsed = self._elapsed_ms
+        if elapsed is None and self._started is not None:
+            elapsed = round((time.perf_counter() - self._started) * 1000, 1)
+        return {
+            "state": self.state,
+            "elapsed_ms": elapsed,
+            "steps": {name: dict(step) for name, step in self._steps.items()},
+        }
+
+
+class StartupGate:
+    """503 + Retry-After for routes outside ``open_paths`` while starting up."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        startup: Startup,
+        open_paths: Collection[str],
+        retry_after_s: int = 5,
+    ) -> None:
+        self.app = app
+        self.startup = startup
+        self.open_paths = open_paths
+        self.retry_after_s = retry_after_s
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.startup.blocking
+            or scope.get("path", "") in self.open_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+        state = self.startup.state
+        detail = "startup failed, see /ready" if state == "failed" else "starting up"
+        response = JSONResponse(
+            {"detail": detail, "startup": state},
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after_s)},
+        )
+        await response(scope, receive, send)
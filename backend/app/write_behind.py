@@ -0,0 +1,126 @@
+"""Write-behind queue that group-commits rows from a single writer thread."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger("finagotchi.write_behind")
+
+# (kind, row) — one row per op; ``apply_batch`` decides how each kind is written.
+Op = tuple[str, tuple[Any, ...]]
+
+
+class WriteBehindQueue:
+    """Bounded queue drained by one thread that applies rows in batches.
+
+    ``apply_batch`` receives up to ``max_batch`` ops and should write them in
+    a single transaction. A row waits at most ``max_delay_ms`` for its batch to
+    fill, which bounds how much un-committed data a crash can lose. ``submit``
+    blocks when the queue is full, pushing back on producers.
+    """
+
+    def __init__(
+        self,
+        apply_batch: Callable[[list[Op]], None],
+        max_queue: int = 10000,
+        max_batch: int = 500,
+        max_delay_ms: int = 50,
+    ) -> None:
+        self._apply_batch = apply_batch
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: queue.Queue[Op | None] = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._last_batch_size = 0
+        self._max_batch_size = 0
+        self._errors = 0
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="pet-store-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, op: Op) -> None:
+        if self._closed:
+            raise RuntimeError("write-behind queue is closed")
+        self._queue.put(op)
+
+    def flush(self) -> None:
+        """Block until every op submitted so far is committed."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush outstanding rows and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "batches": self._batches,
+                "rows": self._rows,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size": self._max_batch_size,
+                "avg_batch_size": self._rows / self._batches if self._batches else 0.0,
+                "errors": self._errors,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    op = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(op)
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _commit(self, batch: list[Op]) -> None:
+        errors = 0
+        try:
+            self._apply_batch(batch)
+        except Exception:
+            logger.exception("Batch of %d rows failed; retrying row by row", len(batch))
+            for op in batch:
+                try:
+                    self._apply_batch([op])
+                except Exception:
+                    errors += 1
+                    logger.exception("Dropping row that failed to write: %s", op[0])
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch) - errors
+            self._last_batch_size = len(batch)
+            self._max_batch_size = max(self._max_batch_size, len(batch))
+            self._errors += errors
@@ -0,0 +1,177 @@
+"""Benchmark /qa response building + serialization for large graphs.
+
+"before" is the model path: GraphNode/GraphEdge built with validation for the
+neighborhood and overlay, a QAResponse model, then FastAPI's response_model
+handling (dump, re-validate, serialize) and JSONResponse. "after" is the dict
+path the API now uses: _normalize_graph dicts, merge_bundles, and one
+fast_json.dumps. Reports mean time and peak traced allocation (tracemalloc)
+per response.
+
+  BENCH_NODES=5000 BENCH_EDGES=10000 BENCH_RUNS=5 python -m backend.scripts.bench_serialization
+"""
+
+import asyncio
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from backend.app.fast_json import dumps
+from backend.app.graph_delta import merge_bundles
+from backend.app.main import _normalize_graph
+from backend.app.schemas import (
+    AnswerJSON,
+    EvidenceItem,
+    GraphBundle,
+    GraphEdge,
+    GraphNode,
+    QAResponse,
+)
+
+NODES = int(os.environ.get("BENCH_NODES", "5000"))
+EDGES = int(os.environ.get("BENCH_EDGES", "10000"))
+RUNS = int(os.environ.get("BENCH_RUNS", "5"))
+
+
+def make_graph(nodes: int, edges: int, group: str) -> dict:
+    return {
+        "nodes": [
+            {
+                "id": f"{group}:{i}",
+                "label": f"{group} {i}",
+                "group": group,
+                "meta": {"total": i * 1.5, "currency": "USD"},
+            }
+            for i in range(nodes)
+        ],
+        "edges": [
+            {
+                "id": f"{group}:e{i}",
+                "source": f"{group}:{i % nodes}",
+                "target": f"{group}:{(i * 7 + 1) % nodes}",
+                "label": "BILLED_BY",
+                "weight": 1,
+            }
+            for i in range(edges)
+        ],
+    }
+
+
+NEIGHBORHOOD = make_graph(NODES, EDGES, "vendor")
+OVERLAY = make_graph(NODES // 50 or 1, EDGES // 50 or 1, "overlay")
+ANSWER = AnswerJSON(
+    decision="flag",
+    confidence=0.7,
+    rationale="Amount exceeds average.",
+    evidence_ids=[],
+)
+EVIDENCE: list[dict[str, Any]] = [
+    {"id": f"qdrant:c:{i}", "text": "x" * 400, "meta": {}} for i in range(8)
+]
+FIELD = create_model_field(name="Response", type_=QAResponse, mode="serialization")
+
+
+def model_bundle(bundle: dict) -> GraphBundle:
+    """The pre-change _normalize_graph."""
+    return GraphBundle(
+        nodes=[
+            GraphNode(
+                id=n.get("id"),
+                label=n.get("label"),
+                type=n.get("type") or n.get("group"),
+                group=n.get("group"),
+                meta=n.get("meta", {}),
+                properties=n.get("properties") or n.get("meta", {}),
+            )
+            for n in bundle.get("nodes", [])
+        ],
+        edges=[
+            GraphEdge(
+                id=e.get("id"),
+                source=e.get("source"),
+                target=e.get("target"),
+                label=e.get("label"),
+                weight=e.get("weight"),
+                meta=e.get("meta", {}),
+                isOverlay=e.get("isOverlay"),
+            )
+            for e in bundle.get("edges", [])
+        ],
+    )
+
+
+def before() -> bytes:
+    neighborhood = model_bundle(NEIGHBORHOOD)
+    overlay = model_bundle(OVERLAY)
+    nodes: dict[str, GraphNode] = {}
+    edges: dict[str | None, GraphEdge] = {}
+    for bundle in (neighborhood, overlay):
+        for n in bundle.nodes:
+            nodes.setdefault(n.id, n)
+        for e in bundle.edges:
+            edges.setdefault(e.id, e)
+    combined = GraphBundle(nodes=list(nodes.values()), edges=list(edges.values()))
+    resp = QAResponse(
+        answer_json=ANSWER,
+        evidence_bundle=[
+            EvidenceItem(id=e["id"], text=e["text"], meta=e["meta"]) for e in EVIDENCE
+        ],
+        neighborhood_graph=neighborhood,
+        overlay_graph=overlay,
+        graph_combined=combined,
+        pet_stats={"risk": 50},
+        interaction_id="i",
+    )
+    content = asyncio.run(serialize_response(field=FIELD, response_content=resp))
+    return bytes(JSONResponse(content).body)
+
+
+def after() -> bytes:
+    neighborhood = _normalize_graph(NEIGHBORHOOD)
+    overlay = _normalize_graph(OVERLAY)
+    combined = merge_bundles(neighborhood, overlay)
+    return dumps(
+        {
+            "answer_json": ANSWER.model_dump(),
+            "evidence_bundle": EVIDENCE,
+            "neighborhood_graph": neighborhood,
+            "overlay_graph": overlay,
+            "graph_combined": combined,
+            "graph_version": None,
+            "graph_delta": None,
+            "pet_stats": {"risk": 50},
+            "interaction_id": "i",
+        }
+    )
+
+
+def measure(name: str, fn: Callable[[], bytes]) -> None:
+    body = fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    elapsed = (time.perf_counter() - start) / RUNS
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<7} {elapsed * 1000:8.1f} ms/response  "
+        f"peak={peak / 1e6:7.1f} MB  body={len(body) / 1e6:5.2f} MB"
+    )
+
+
+def main() -> None:
+    print(f"nodes={NODES} edges={EDGES} runs={RUNS}")
+    measure("before", before)
+    measure("after", after)
+
+
+if __name__ == "__main__":
+    main()
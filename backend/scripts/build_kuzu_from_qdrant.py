@@ -1,5 +1,33 @@
+"""Build the Kuzu graph from Qdrant, or incrementally sync it.
+
+Full rebuild (default):
+
+    python backend/scripts/build_kuzu_from_qdrant.py
+
+Incremental sync (only upserts new/changed points and removes deleted ones):
+
+    SYNC_MODE=incremental python backend/scripts/build_kuzu_from_qdrant.py
+
+Both modes checkpoint the scroll position and per-point content hashes to
+``KUZU_SYNC_STATE`` (default ``<KUZU_OUT_DIR>.sync.json``). An interrupted run
+is resumed by re-running in incremental mode.
+
+Each collection is split into BATCH-sized pages by an id-only pre-scan. Pages
+are scrolled by ``SCROLL_WORKERS`` threads, hashed and parsed by a pool of
+``PARSE_WORKERS`` processes, and applied by a single Kuzu writer.
+"""
+
 import ast
+import hashlib
+import json
+import math
 import os
+import queue
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
 from typing import Any
 
 import kuzu
@@ -22,57 +50,47 @@ CHUNK_COLLECTION = os.environ.get("CHUNK_COLLECTION", "DocumentChunk_text")
 OUTPUT_DIR = os.environ.get("KUZU_OUT_DIR", "data/kuzu")
 MAX_POINTS = int(os.environ.get("MAX_POINTS", "100000"))
 BATCH = int(os.environ.get("BATCH", "1000"))
-
-client = (
-    QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    if QDRANT_API_KEY
-    else QdrantClient(url=QDRANT_URL)
+SYNC_MODE = os.environ.get("SYNC_MODE", "full").strip().lower()
+STATE_PATH = os.environ.get("KUZU_SYNC_STATE") or (
+    OUTPUT_DIR.rstrip("/\\") + ".sync.json"
 )
+CHECKPOINT_EVERY = int(os.environ.get("CHECKPOINT_EVERY", "10"))
+# Parallelism: threads scrolling Qdrant pages, processes parsing them (0 = inline
+# thread), and the depth of the bounded hand-off queues feeding the Kuzu writer.
+SCROLL_WORKERS = int(os.environ.get("SCROLL_WORKERS", "4"))
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+QUEUE_DEPTH = int(os.environ.get("QUEUE_DEPTH", "8"))
+# Invoices due before this date (YYYY-MM-DD) count as overdue in the stats tables.
+STATS_AS_OF = os.environ.get("STATS_AS_OF") or date.today().isoformat()
 
-if os.path.exists(OUTPUT_DIR):
-    print(f"Kuzu output dir exists: {OUTPUT_DIR}")
-else:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-lock_path = os.path.join(OUTPUT_DIR, ".lock")
-if os.path.exists(lock_path):
-    raise SystemExit(
-        f"Kuzu lock exists at {lock_path}. Stop any running process using this DB and delete the lock file."
-    )
+STATE_VERSION = 3
 
-print("Building Kuzu DB at:", OUTPUT_DIR)
-
-conn = kuzu.Connection(kuzu.Database(OUTPUT_DIR))
-
-# Nodes
-conn.execute(
-    "CREATE NODE TABLE IF NOT EXISTS Entity(entity_id STRING, name STRING, type STRING, PRIMARY KEY(entity_id))"
-)
-conn.execute(
-    "CREATE NODE TABLE IF NOT EXISTS Chunk(chunk_id STRING, text STRING, PRIMARY KEY(chunk_id))"
-)
-conn.execute(
-    "CREATE NODE TABLE IF NOT EXISTS Vendor(vendor_id STRING, name STRING, PRIMARY KEY(vendor_id))"
-)
-conn.execute(
-    "CREATE NODE TABLE IF NOT EXISTS Invoice(invoice_id STRING, vendor_id STRING, total DOUBLE, date STRING, due_date STRING, PRIMARY KEY(invoice_id))"
-)
-conn.execute(
-    "CREATE NODE TABLE IF NOT EXISTS SKU(sku STRING, product STRING, PRIMARY KEY(sku))"
-)
-
-# Relationships
-conn.execute(
-    "CREATE REL TABLE IF NOT EXISTS Mentions(FROM Chunk TO Entity, rel STRING)"
-)
-conn.execute(
-    "CREATE REL TABLE IF NOT EXISTS Issued(FROM Vendor TO Invoice, rel STRING)"
-)
-conn.execute("CREATE REL TABLE IF NOT EXISTS Contains(FROM Invoice TO SKU, rel STRING)")
-conn.execute("CREATE REL TABLE IF NOT EXISTS Supplies(FROM Vendor TO SKU, rel STRING)")
+SCHEMA = [
+    # Nodes
+    "CREATE NODE TABLE IF NOT EXISTS Entity(entity_id STRING, name STRING, type STRING, PRIMARY KEY(entity_id))",
+    "CREATE NODE TABLE IF NOT EXISTS Chunk(chunk_id STRING, text STRING, PRIMARY KEY(chunk_id))",
+    "CREATE NODE TABLE IF NOT EXISTS Vendor(vendor_id STRING, name STRING, PRIMARY KEY(vendor_id))",
+    "CREATE NODE TABLE IF NOT EXISTS Invoice(invoice_id STRING, vendor_id STRING, total DOUBLE, date STRING, due_date STRING, PRIMARY KEY(invoice_id))",
+    "CREATE NODE TABLE IF NOT EXISTS SKU(sku STRING, product STRING, PRIMARY KEY(sku))",
+    # Materialized aggregates, rebuilt at the end of every run
+    "CREATE NODE TABLE IF NOT EXISTS VendorStats(vendor_id STRING, invoice_count INT64, total_sum DOUBLE, total_mean DOUBLE, total_std DOUBLE, total_p50 DOUBLE, total_p90 DOUBLE, total_p99 DOUBLE, total_max DOUBLE, last_invoice_date STRING, overdue_count INT64, as_of STRING, PRIMARY KEY(vendor_id))",
+    "CREATE NODE TABLE IF NOT EXISTS SKUStats(sku STRING, invoice_count INT64, vendor_count INT64, total_mean DOUBLE, total_std DOUBLE, total_p50 DOUBLE, total_p90 DOUBLE, last_invoice_date STRING, overdue_count INT64, as_of STRING, PRIMARY KEY(sku))",
+    # Relationships
+    "CREATE REL TABLE IF NOT EXISTS Mentions(FROM Chunk TO Entity, rel STRING)",
+    "CREATE REL TABLE IF NOT EXISTS Issued(FROM Vendor TO Invoice, rel STRING)",
+    "CREATE REL TABLE IF NOT EXISTS Contains(FROM Invoice TO SKU, rel STRING)",
+    "CREATE REL TABLE IF NOT EXISTS Supplies(FROM Vendor TO SKU, rel STRING)",
+]
 
-entity_ids = set()
-entity_name_to_id = {}
+# Key kind -> Cypher used to remove a derived node/edge once no chunk owns it.
+_DELETE_KEY = {
+    "Vendor": "MATCH (v:Vendor {vendor_id: $a}) DETACH DELETE v",
+    "Invoice": "MATCH (i:Invoice {invoice_id: $a}) DETACH DELETE i",
+    "SKU": "MATCH (s:SKU {sku: $a}) DETACH DELETE s",
+    "Issued": "MATCH (v:Vendor {vendor_id: $a})-[r:Issued]->(i:Invoice {invoice_id: $b}) DELETE r",
+    "Contains": "MATCH (i:Invoice {invoice_id: $a})-[r:Contains]->(s:SKU {sku: $b}) DELETE r",
+    "Supplies": "MATCH (v:Vendor {vendor_id: $a})-[r:Supplies]->(s:SKU {sku: $b}) DELETE r",
+}
 
 
 def _extract_name(payload: dict[str, Any]) -> str | None:
@@ -89,177 +107,734 @@ def _extract_type(payload: dict[str, Any]) -> str | None:
     return None
 
 
-print("Loading entities...")
-next_offset = None
-count = 0
-while True:
-    points, next_offset = client.scroll(
-        collection_name=ENTITY_COLLECTION,
-        offset=next_offset,
-        limit=BATCH,
-        with_payload=True,
-        with_vectors=False,
-    )
-    for p in points:
-        eid = str(p.id)
-        payload = p.payload or {}
-        name = _extract_name(payload) or eid
-        etype = _extract_type(payload) or ""
-        if eid not in entity_ids:
-            conn.execute(
-                "MERGE (e:Entity {entity_id: $id}) SET e.name = $name, e.type = $type",
-                {"id": eid, "name": name, "type": etype},
-            )
-            entity_ids.add(eid)
-            entity_name_to_id[name] = eid
-    count += len(points)
-    if next_offset is None or count >= MAX_POINTS:
-        break
-
-print(f"Loaded {len(entity_ids)} entities")
-
-print("Loading chunks + edges...")
-next_offset = None
-count = 0
-while True:
-    points, next_offset = client.scroll(
-        collection_name=CHUNK_COLLECTION,
-        offset=next_offset,
-        limit=BATCH,
-        with_payload=True,
-        with_vectors=False,
-    )
-    for p in points:
-        cid = str(p.id)
-        payload = p.payload or {}
-        text = None
-        for key in ("text", "content", "chunk", "body"):
-            if key in payload and isinstance(payload[key], str):
-                text = payload[key]
-                break
-        if text is None:
-            text = ""
-        conn.execute(
-            "MERGE (c:Chunk {chunk_id: $id}) SET c.text = $text",
-            {"id": cid, "text": text[:2000]},
-        )
+def _payload_hash(payload: dict[str, Any]) -> str:
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
 
-        # Parse structured chunk text
-        parsed = None
-        if isinstance(text, str) and text.startswith("{") and text.endswith("}"):
+
+def parse_chunk(cid: str, payload: dict[str, Any]) -> dict[str, Any]:
+    """Extract the rows a chunk contributes to the graph. Pure; no DB access."""
+    text = None
+    for key in ("text", "content", "chunk", "body"):
+        if key in payload and isinstance(payload[key], str):
+            text = payload[key]
+            break
+    if text is None:
+        text = ""
+
+    row: dict[str, Any] = {
+        "chunk_id": cid,
+        "text": text[:2000],
+        "vendor_id": None,
+        "invoice": None,
+        "skus": [],
+        "entities": [],
+    }
+
+    # Parse structured chunk text
+    parsed = None
+    if text.startswith("{") and text.endswith("}"):
+        try:
+            parsed = ast.literal_eval(text)
+        except Exception:
+            parsed = None
+
+    if isinstance(parsed, dict):
+        vendor_id = parsed.get("vendor_id")
+        invoice_id = parsed.get("invoice_number") or parsed.get("transaction_id")
+        total = parsed.get("total")
+        date = parsed.get("date")
+        due = parsed.get("due_date")
+
+        if vendor_id is not None:
+            row["vendor_id"] = str(vendor_id)
+        if invoice_id is not None:
+            row["invoice"] = {
+                "id": str(invoice_id),
+                "vendor": str(vendor_id) if vendor_id is not None else "",
+                "total": float(total) if isinstance(total, (int, float)) else 0.0,
+                "date": str(date) if date is not None else "",
+                "due": str(due) if due is not None else "",
+            }
+
+        items = parsed.get("items")
+        if isinstance(items, str):
             try:
-                parsed = ast.literal_eval(text)
+                items = ast.literal_eval(items)
             except Exception:
-                parsed = None
+                items = None
+        if isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                sku = item.get("sku")
+                product = item.get("product")
+                if sku:
+                    row["skus"].append(
+                        {"sku": str(sku), "product": str(product) if product else ""}
+                    )
 
-        # Create vendor/invoice/sku nodes + edges
-        if isinstance(parsed, dict):
-            vendor_id = parsed.get("vendor_id")
-            invoice_id = parsed.get("invoice_number") or parsed.get("transaction_id")
-            total = parsed.get("total")
-            date = parsed.get("date")
-            due = parsed.get("due_date")
+    # Entity relationships if present in payload
+    entities: list[Any] = []
+    if isinstance(payload.get("entities"), list):
+        entities = list(payload.get("entities") or [])
+    elif isinstance(payload.get("entity_ids"), list):
+        entities = list(payload.get("entity_ids") or [])
+    elif isinstance(payload.get("entity_names"), list):
+        entities = list(payload.get("entity_names") or [])
 
-            if vendor_id is not None:
-                conn.execute(
-                    "MERGE (v:Vendor {vendor_id: $id}) SET v.name = $name",
-                    {"id": str(vendor_id), "name": f"Vendor {vendor_id}"},
-                )
+    for ent in entities:
+        if isinstance(ent, dict):
+            ent_id = str(ent.get("id") or "")
+            ent_name = ent.get("name") if isinstance(ent.get("name"), str) else None
+        else:
+            ent_id = str(ent) if ent is not None else ""
+            ent_name = str(ent) if ent is not None else None
+        row["entities"].append([ent_id, ent_name])
 
-            if invoice_id is not None:
-                conn.execute(
-                    "MERGE (i:Invoice {invoice_id: $id}) SET i.vendor_id = $vendor, i.total = $total, i.date = $date, i.due_date = $due",
-                    {
-                        "id": str(invoice_id),
-                        "vendor": str(vendor_id) if vendor_id is not None else "",
-                        "total": float(total)
-                        if isinstance(total, (int, float))
-                        else 0.0,
-                        "date": str(date) if date is not None else "",
-                        "due": str(due) if due is not None else "",
-                    },
-                )
-                if vendor_id is not None:
-                    conn.execute(
-                        "MATCH (v:Vendor {vendor_id: $vid}), (i:Invoice {invoice_id: $iid}) MERGE (v)-[:Issued {rel: $rel}]->(i)",
-                        {
-                            "vid": str(vendor_id),
-                            "iid": str(invoice_id),
-                            "rel": "ISSUED",
-                        },
-                    )
+    return row
+
+
+def _owned_keys(record: dict[str, Any]) -> set[tuple[str, ...]]:
+    """Vendor/Invoice/SKU nodes and edges a chunk record contributes."""
+    keys: set[tuple[str, ...]] = set()
+    vid = record.get("vendor")
+    iid = record.get("invoice")
+    if vid:
+        keys.add(("Vendor", vid))
+    if iid:
+        keys.add(("Invoice", iid))
+        if vid:
+            keys.add(("Issued", vid, iid))
+    for sku in record.get("skus", []):
+        keys.add(("SKU", sku))
+        if iid:
+            keys.add(("Contains", iid, sku))
+        if vid:
+            keys.add(("Supplies", vid, sku))
+    return keys
+
+
+def _ref_keys(refs: list[list[Any]]) -> set[str]:
+    """Reverse-index keys for a chunk's raw ``[entity_id, entity_name]`` refs."""
+    keys = set()
+    for ent_id, ent_name in refs:
+        if ent_id:
+            keys.add(f"id:{ent_id}")
+        if ent_name:
+            keys.add(f"name:{ent_name}")
+    return keys
+
+
+def _db_in_use(lock_path: str) -> bool:
+    """Kuzu leaves `.lock` on disk after closing; only a held lock means in use."""
+    if not os.path.exists(lock_path):
+        return False
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - non-POSIX
+        return True
+    with open(lock_path, "a") as fh:
+        try:
+            fcntl.lockf(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.lockf(fh, fcntl.LOCK_UN)
+    return False
+
+
+def _empty_state() -> dict[str, Any]:
+    return {
+        "version": STATE_VERSION,
+        "entities": {},
+        "chunks": {},
+        # Unchanged chunks whose Mentions need re-resolving after entity changes.
+        "relink": [],
+        "run": None,
+    }
 
-            items = parsed.get("items")
-            if isinstance(items, str):
-                try:
-                    items = ast.literal_eval(items)
-                except Exception:
-                    items = None
-
-            if isinstance(items, list):
-                for item in items:
-                    if not isinstance(item, dict):
-                        continue
-                    sku = item.get("sku")
-                    product = item.get("product")
-                    if sku:
-                        conn.execute(
-                            "MERGE (s:SKU {sku: $sku}) SET s.product = $product",
-                            {
-                                "sku": str(sku),
-                                "product": str(product) if product else "",
-                            },
-                        )
-                        if invoice_id is not None:
-                            conn.execute(
-                                "MATCH (i:Invoice {invoice_id: $iid}), (s:SKU {sku: $sku}) MERGE (i)-[:Contains {rel: $rel}]->(s)",
-                                {
-                                    "iid": str(invoice_id),
-                                    "sku": str(sku),
-                                    "rel": "CONTAINS",
-                                },
-                            )
-                        if vendor_id is not None:
-                            conn.execute(
-                                "MATCH (v:Vendor {vendor_id: $vid}), (s:SKU {sku: $sku}) MERGE (v)-[:Supplies {rel: $rel}]->(s)",
-                                {
-                                    "vid": str(vendor_id),
-                                    "sku": str(sku),
-                                    "rel": "SUPPLIES",
-                                },
-                            )
-
-        # Entity relationships if present in payload
-        entities: list[Any] = []
-        if isinstance(payload.get("entities"), list):
-            entities = list(payload.get("entities") or [])
-        elif isinstance(payload.get("entity_ids"), list):
-            entities = list(payload.get("entity_ids") or [])
-        elif isinstance(payload.get("entity_names"), list):
-            entities = list(payload.get("entity_names") or [])
-
-        for ent in entities:
-            if isinstance(ent, dict):
-                ent_id = str(ent.get("id") or "")
-                ent_name = ent.get("name") if isinstance(ent.get("name"), str) else None
-            else:
-                ent_id = str(ent) if ent is not None else ""
-                ent_name = str(ent) if ent is not None else None
 
+def load_state(path: str) -> dict[str, Any]:
+    if not os.path.exists(path):
+        return _empty_state()
+    with open(path) as fh:
+        state = json.load(fh)
+    if state.get("version") != STATE_VERSION:
+        print(f"Ignoring sync state with unknown version at {path}")
+        return _empty_state()
+    return state
+
+
+def save_state(path: str, state: dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh)
+    os.replace(tmp, path)
+
+
+class GraphSync:
+    """Applies Qdrant points to Kuzu, tracking hashes so re-runs only touch diffs."""
+
+    def __init__(
+        self, conn: kuzu.Connection, state: dict[str, Any], state_path: str
+    ) -> None:
+        self.conn = conn
+        self.state = state
+        self.state_path = state_path
+        self.refs: Counter[tuple[str, ...]] = Counter()
+        for record in state["chunks"].values():
+            self.refs.update(_owned_keys(record))
+        self.entity_name_to_id = {
+            rec["name"]: eid for eid, rec in state["entities"].items()
+        }
+        # Entity id/name key -> chunks referencing it, to find the unchanged
+        # chunks an entity upsert or delete affects.
+        self.ref_index: dict[str, set[str]] = {}
+        for cid, record in state["chunks"].items():
+            self._index_refs(cid, record["refs"])
+        self.relink: set[str] = set(state["relink"])
+        self.written = 0
+        self.deleted = 0
+
+    # -- writes -----------------------------------------------------------
+
+    def upsert_entity(self, eid: str, row: dict[str, Any], digest: str) -> None:
+        name = row["name"]
+        etype = row["type"]
+        self.conn.execute(
+            "MERGE (e:Entity {entity_id: $id}) SET e.name = $name, e.type = $type",
+            {"id": eid, "name": name, "type": etype},
+        )
+        old = self.state["entities"].get(eid)
+        if old and self.entity_name_to_id.get(old["name"]) == eid:
+            del self.entity_name_to_id[old["name"]]
+        self.state["entities"][eid] = {"hash": digest, "name": name}
+        self.entity_name_to_id[name] = eid
+        if old is None or old["name"] != name:
+            self._mark_relink({f"id:{eid}", f"name:{name}"})
+            if old is not None:
+                self._mark_relink({f"name:{old['name']}"})
+        self.written += 1
+
+    def delete_entity(self, eid: str) -> None:
+        self.conn.execute(
+            "MATCH (e:Entity {entity_id: $id}) DETACH DELETE e", {"id": eid}
+        )
+        old = self.state["entities"].pop(eid, None)
+        if old and self.entity_name_to_id.get(old["name"]) == eid:
+            del self.entity_name_to_id[old["name"]]
+        self._mark_relink({f"id:{eid}"} | ({f"name:{old['name']}"} if old else set()))
+        self.deleted += 1
+
+    def _index_refs(self, cid: str, refs: list[list[Any]]) -> None:
+        for key in _ref_keys(refs):
+            self.ref_index.setdefault(key, set()).add(cid)
+
+    def _unindex_refs(self, cid: str, refs: list[list[Any]]) -> None:
+        for key in _ref_keys(refs):
+            chunks = self.ref_index.get(key)
+            if chunks is not None:
+                chunks.discard(cid)
+                if not chunks:
+                    del self.ref_index[key]
+
+    def _mark_relink(self, keys: set[str]) -> None:
+        for key in keys:
+            self.relink.update(self.ref_index.get(key, ()))
+
+    def _link_mentions(self, cid: str, refs: list[list[Any]]) -> list[str]:
+        """Resolve refs against the current entities and MERGE the edges."""
+        mentions = []
+        for ent_id, ent_name in refs:
             target_id = None
-            if ent_id and ent_id in entity_ids:
+            if ent_id and ent_id in self.state["entities"]:
                 target_id = ent_id
-            elif ent_name and ent_name in entity_name_to_id:
-                target_id = entity_name_to_id[ent_name]
-
+            elif ent_name and ent_name in self.entity_name_to_id:
+                target_id = self.entity_name_to_id[ent_name]
             if target_id:
-                conn.execute(
+                self.conn.execute(
                     "MATCH (c:Chunk {chunk_id: $cid}), (e:Entity {entity_id: $eid}) MERGE (c)-[:Mentions {rel: $rel}]->(e)",
                     {"cid": cid, "eid": target_id, "rel": "MENTIONS"},
                 )
+                mentions.append(target_id)
+        return mentions
+
+    def _unlink_mentions(self, cid: str) -> None:
+        self.conn.execute(
+            "MATCH (c:Chunk {chunk_id: $cid})-[r:Mentions]->(:Entity) DELETE r",
+            {"cid": cid},
+        )
+
+    def upsert_chunk(self, row: dict[str, Any], digest: str) -> None:
+        cid = row["chunk_id"]
+        old = self.state["chunks"].get(cid)
+        if old is not None:
+            self._unlink_mentions(cid)
+            self._unindex_refs(cid, old["refs"])
+        self.conn.execute(
+            "MERGE (c:Chunk {chunk_id: $id}) SET c.text = $text",
+            {"id": cid, "text": row["text"]},
+        )
+
+        vendor_id = row["vendor_id"]
+        invoice = row["invoice"]
+        invoice_id = invoice["id"] if invoice else None
+        if vendor_id is not None:
+            self.conn.execute(
+                "MERGE (v:Vendor {vendor_id: $id}) SET v.name = $name",
+                {"id": vendor_id, "name": f"Vendor {vendor_id}"},
+            )
+        if invoice is not None:
+            self.conn.execute(
+                "MERGE (i:Invoice {invoice_id: $id}) SET i.vendor_id = $vendor, i.total = $total, i.date = $date, i.due_date = $due",
+                invoice,
+            )
+            if vendor_id is not None:
+                self.conn.execute(
+                    "MATCH (v:Vendor {vendor_id: $vid}), (i:Invoice {invoice_id: $iid}) MERGE (v)-[:Issued {rel: $rel}]->(i)",
+                    {"vid": vendor_id, "iid": invoice_id, "rel": "ISSUED"},
+                )
+        for item in row["skus"]:
+            self.conn.execute(
+                "MERGE (s:SKU {sku: $sku}) SET s.product = $product",
+                item,
+            )
+            if invoice_id is not None:
+                self.conn.execute(
+                    "MATCH (i:Invoice {invoice_id: $iid}), (s:SKU {sku: $sku}) MERGE (i)-[:Contains {rel: $rel}]->(s)",
+                    {"iid": invoice_id, "sku": item["sku"], "rel": "CONTAINS"},
+                )
+            if vendor_id is not None:
+                self.conn.execute(
+                    "MATCH (v:Vendor {vendor_id: $vid}), (s:SKU {sku: $sku}) MERGE (v)-[:Supplies {rel: $rel}]->(s)",
+                    {"vid": vendor_id, "sku": item["sku"], "rel": "SUPPLIES"},
+                )
+
+        refs = row["entities"]
+        record = {
+            "hash": digest,
+            "vendor": vendor_id,
+            "invoice": invoice_id,
+            "skus": [item["sku"] for item in row["skus"]],
+            "refs": refs,
+            "mentions": self._link_mentions(cid, refs),
+        }
+        self.state["chunks"][cid] = record
+        self._index_refs(cid, refs)
+        # Resolved against the current entities just now.
+        self.relink.discard(cid)
+        self._release(_owned_keys(old) if old else set(), _owned_keys(record))
+        self.written += 1
+
+    def delete_chunk(self, cid: str) -> None:
+        self.conn.execute(
+            "MATCH (c:Chunk {chunk_id: $id}) DETACH DELETE c", {"id": cid}
+        )
+        old = self.state["chunks"].pop(cid, None)
+        if old:
+            self._release(_owned_keys(old), set())
+            self._unindex_refs(cid, old["refs"])
+        self.relink.discard(cid)
+        self.deleted += 1
+
+    def relink_mentions(self) -> int:
+        """Re-resolve Mentions of unchanged chunks whose entities changed.
+
+        Chunks resolve their entity refs when they are upserted, so without
+        this an entity added, renamed or re-created in a later sync would
+        never be linked from chunks that did not change themselves.
+        """
+        relinked = 0
+        self.conn.execute("BEGIN TRANSACTION")
+        for cid in sorted(self.relink):
+            record = self.state["chunks"].get(cid)
+            if record is None:
+                continue
+            self._unlink_mentions(cid)
+            mentions = self._link_mentions(cid, record["refs"])
+            if mentions != record["mentions"]:
+                record["mentions"] = mentions
+                relinked += 1
+        self.conn.execute("COMMIT")
+        self.relink.clear()
+        self.checkpoint()
+        return relinked
+
+    def _release(
+        self, old_keys: set[tuple[str, ...]], new_keys: set[tuple[str, ...]]
+    ) -> None:
+        """Move refcounts from old to new keys; drop anything no chunk owns."""
+        self.refs.update(new_keys)
+        self.refs.subtract(old_keys)
+        orphaned = [k for k in old_keys - new_keys if self.refs[k] <= 0]
+        # Edges (3-tuples) before nodes (2-tuples).
+        for key in sorted(orphaned, key=len, reverse=True):
+            del self.refs[key]
+            params = {"a": key[1]}
+            if len(key) > 2:
+                params["b"] = key[2]
+            self.conn.execute(_DELETE_KEY[key[0]], params)
+
+    # -- passes -----------------------------------------------------------
+
+    def checkpoint(self) -> None:
+        self.state["relink"] = sorted(self.relink)
+        save_state(self.state_path, self.state)
+
+    def run_pass(self, client: QdrantClient, collection: str, kind: str) -> None:
+        run = self.state["run"]
+        if collection in run["done"]:
+            print(f"{collection}: already synced in this run, skipping")
+            return
+
+        progress = run["progress"].get(collection)
+        if progress is None:
+            pages, complete = plan_pages(client, collection)
+            progress = {"pages": pages, "complete": complete, "done": [], "seen": []}
+            run["progress"][collection] = progress
+            self.checkpoint()
+        elif progress["done"]:
+            print(
+                f"{collection}: resuming after {len(progress['done'])}"
+                f"/{len(progress['pages'])} pages"
+            )
+
+        known = self.state["entities"] if kind == "entity" else self.state["chunks"]
+        pages = progress["pages"]
+        seen = set(progress["seen"])
+        done = set(progress["done"])
+        todo = [idx for idx in range(len(pages)) if idx not in done]
+        pipeline = _pipeline(client, collection, kind, pages, todo, known)
+        for applied, (idx, ids, changes) in enumerate(pipeline, start=1):
+            self.conn.execute("BEGIN TRANSACTION")
+            for pid, digest, row in changes:
+                if kind == "entity":
+                    self.upsert_entity(pid, row, digest)
+                else:
+                    self.upsert_chunk(row, digest)
+            self.conn.execute("COMMIT")
+
+            seen.update(ids)
+            done.add(idx)
+            if applied % CHECKPOINT_EVERY == 0:
+                progress["seen"] = sorted(seen)
+                progress["done"] = sorted(done)
+                self.checkpoint()
+
+        if progress["complete"]:
+            missing = [pid for pid in known if pid not in seen]
+            removed = _confirm_deleted(client, collection, missing)
+            self.conn.execute("BEGIN TRANSACTION")
+            for pid in removed:
+                if kind == "entity":
+                    self.delete_entity(pid)
+                else:
+                    self.delete_chunk(pid)
+            self.conn.execute("COMMIT")
+        else:
+            print(f"{collection}: stopped at MAX_POINTS, skipping delete detection")
+
+        run["done"].append(collection)
+        run["progress"].pop(collection, None)
+        self.checkpoint()
+        print(f"{collection}: {len(seen)} points scanned in {len(pages)} pages")
+
+
+def plan_pages(client: QdrantClient, collection: str) -> tuple[list[Any], bool]:
+    """Id-only pre-scan returning the start offset of every BATCH-sized page.
+
+    The flag is False when MAX_POINTS cut the scan short.
+    """
+    offsets: list[Any] = [None]
+    next_offset = None
+    count = 0
+    while True:
+        points, next_offset = client.scroll(
+            collection_name=collection,
+            offset=next_offset,
+            limit=BATCH,
+            with_payload=False,
+            with_vectors=False,
+        )
+        count += len(points)
+        if next_offset is None or count >= MAX_POINTS:
+            break
+        offsets.append(next_offset)
+    return offsets, next_offset is None
+
+
+def prepare_page(
+    kind: str, points: list[tuple[str, dict[str, Any]]], known: dict[str, str]
+) -> list[tuple[str, str, dict[str, Any]]]:
+    """Hash and parse one page in a worker process, dropping unchanged points."""
+    changes = []
+    for pid, payload in points:
+        digest = _payload_hash(payload)
+        if known.get(pid) == digest:
+            continue
+        if kind == "entity":
+            row = {
+                "name": _extract_name(payload) or pid,
+                "type": _extract_type(payload) or "",
+            }
+        else:
+            row = parse_chunk(pid, payload)
+        changes.append((pid, digest, row))
+    return changes
+
+
+def _confirm_deleted(
+    client: QdrantClient, collection: str, missing: list[str]
+) -> list[str]:
+    """Pages are planned up front, so double-check unseen ids before deleting."""
+    still_there: set[str] = set()
+    for start in range(0, len(missing), BATCH):
+        records = client.retrieve(
+            collection_name=collection,
+            ids=missing[start : start + BATCH],
+            with_payload=False,
+            with_vectors=False,
+        )
+        still_there.update(str(r.id) for r in records)
+    return [pid for pid in missing if pid not in still_there]
+
+
+_DONE = object()
+
+
+def _pipeline(
+    client: QdrantClient,
+    collection: str,
+    kind: str,
+    pages: list[Any],
+    todo: list[int],
+    known: dict[str, dict[str, Any]],
+) -> Iterator[tuple[int, list[str], list[tuple[str, str, dict[str, Any]]]]]:
+    """Scroll pages on threads, parse them in a process pool, yield to one writer.
+
+    Both hand-offs go through bounded queues so a slow writer applies
+    back-pressure instead of buffering the whole collection in memory.
+    """
+    work: queue.Queue[int] = queue.Queue()
+    for idx in todo:
+        work.put(idx)
+    fetched: queue.Queue[Any] = queue.Queue(maxsize=QUEUE_DEPTH)
+    parsed: queue.Queue[Any] = queue.Queue(maxsize=QUEUE_DEPTH)
+    n_scrollers = max(1, min(SCROLL_WORKERS, len(todo)))
+
+    def scroll_worker() -> None:
+        while True:
+            try:
+                idx = work.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                points, _ = client.scroll(
+                    collection_name=collection,
+                    offset=pages[idx],
+                    limit=BATCH,
+                    with_payload=True,
+                    with_vectors=False,
+                )
+            except Exception as exc:
+                fetched.put(exc)
+                break
+            fetched.put((idx, [(str(p.id), p.payload or {}) for p in points]))
+        fetched.put(_DONE)
+
+    def dispatcher(pool: Executor) -> None:
+        finished = 0
+        while finished < n_scrollers:
+            item = fetched.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            if isinstance(item, Exception):
+                parsed.put(item)
+                continue
+            idx, points = item
+            ids = [pid for pid, _ in points]
+            hashes = {pid: known[pid]["hash"] for pid in ids if pid in known}
+            parsed.put((idx, ids, pool.submit(prepare_page, kind, points, hashes)))
+        parsed.put(_DONE)
+
+    pool: Executor = (
+        ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        if PARSE_WORKERS > 0
+        else ThreadPoolExecutor(max_workers=1)
+    )
+    threads = [
+        threading.Thread(target=scroll_worker, daemon=True) for _ in range(n_scrollers)
+    ]
+    threads.append(threading.Thread(target=dispatcher, args=(pool,), daemon=True))
+    try:
+        for t in threads:
+            t.start()
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            idx, ids, future = item
+            yield idx, ids, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    pos = (len(values) - 1) * q
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _summarize(totals: list[float]) -> dict[str, float]:
+    values = sorted(totals)
+    n = len(values)
+    mean = sum(values) / n if n else 0.0
+    var = sum((v - mean) ** 2 for v in values) / (n - 1) if n > 1 else 0.0
+    return {
+        "total_sum": sum(values),
+        "total_mean": mean,
+        "total_std": math.sqrt(var),
+        "total_p50": _percentile(values, 0.5),
+        "total_p90": _percentile(values, 0.9),
+        "total_p99": _percentile(values, 0.99),
+        "total_max": values[-1] if values else 0.0,
+    }
+
+
+def _is_overdue(due: str | None, as_of: str) -> bool:
+    # Dates are stored as strings; compare the ISO date prefix only.
+    if not due or len(due) < 10:
+        return False
+    return due[:10] < as_of
+
+
+def materialize_stats(conn: kuzu.Connection, as_of: str) -> tuple[int, int]:
+    """Rebuild the VendorStats/SKUStats side tables from Invoice rows.
+
+    A full recompute is a handful of scans, cheap next to the point writes,
+    and keeps overdue counts current as ``as_of`` moves forward.
+    """
+    vendors: dict[str, dict[str, Any]] = {}
+    res: Any = conn.execute(
+        "MATCH (v:Vendor)-[:Issued]->(i:Invoice) RETURN v.vendor_id, i.total, i.date, i.due_date"
+    )
+    while res.has_next():
+        vid, total, inv_date, due = res.get_next()
+        agg = vendors.setdefault(vid, {"totals": [], "last": "", "overdue": 0})
+        agg["totals"].append(float(total or 0.0))
+        agg["last"] = max(agg["last"], inv_date or "")
+        agg["overdue"] += _is_overdue(due, as_of)
+
+    skus: dict[str, dict[str, Any]] = {}
+    res = conn.execute(
+        "MATCH (i:Invoice)-[:Contains]->(s:SKU) RETURN s.sku, i.total, i.date, i.due_date, i.vendor_id"
+    )
+    while res.has_next():
+        sku, total, inv_date, due, vid = res.get_next()
+        agg = skus.setdefault(
+            sku, {"totals": [], "last": "", "overdue": 0, "vendors": set()}
+        )
+        agg["totals"].append(float(total or 0.0))
+        agg["last"] = max(agg["last"], inv_date or "")
+        agg["overdue"] += _is_overdue(due, as_of)
+        if vid:
+            agg["vendors"].add(vid)
+
+    conn.execute("BEGIN TRANSACTION")
+    conn.execute("MATCH (s:VendorStats) DELETE s")
+    conn.execute("MATCH (s:SKUStats) DELETE s")
+    for vid, agg in vendors.items():
+        summary = _summarize(agg["totals"])
+        conn.execute(
+            "CREATE (:VendorStats {vendor_id: $id, invoice_count: $count, total_sum: $total_sum, total_mean: $total_mean, total_std: $total_std, total_p50: $total_p50, total_p90: $total_p90, total_p99: $total_p99, total_max: $total_max, last_invoice_date: $last, overdue_count: $overdue, as_of: $as_of})",
+            {
+                "id": vid,
+                "count": len(agg["totals"]),
+                "last": agg["last"],
+                "overdue": agg["overdue"],
+                "as_of": as_of,
+                **summary,
+            },
+        )
+    for sku, agg in skus.items():
+        summary = _summarize(agg["totals"])
+        conn.execute(
+            "CREATE (:SKUStats {sku: $id, invoice_count: $count, vendor_count: $vendors, total_mean: $total_mean, total_std: $total_std, total_p50: $total_p50, total_p90: $total_p90, last_invoice_date: $last, overdue_count: $overdue, as_of: $as_of})",
+            {
+                "id": sku,
+                "count": len(agg["totals"]),
+                "vendors": len(agg["vendors"]),
+                "total_mean": summary["total_mean"],
+                "total_std": summary["total_std"],
+                "total_p50": summary["total_p50"],
+                "total_p90": summary["total_p90"],
+                "last": agg["last"],
+                "overdue": agg["overdue"],
+                "as_of": as_of,
+            },
+        )
+    conn.execute("COMMIT")
+    return len(vendors), len(skus)
+
+
+def main() -> None:
+    if SYNC_MODE not in {"full", "incremental"}:
+        raise SystemExit(f"SYNC_MODE must be 'full' or 'incremental', got {SYNC_MODE}")
+
+    client = (
+        QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+        if QDRANT_API_KEY
+        else QdrantClient(url=QDRANT_URL)
+    )
+
+    if os.path.exists(OUTPUT_DIR):
+        print(f"Kuzu output dir exists: {OUTPUT_DIR}")
+    else:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    lock_path = os.path.join(OUTPUT_DIR, ".lock")
+    if _db_in_use(lock_path):
+        raise SystemExit(
+            f"Kuzu DB at {OUTPUT_DIR} is locked by another process. Stop any running process using this DB."
+        )
+
+    state = load_state(STATE_PATH) if SYNC_MODE == "incremental" else _empty_state()
+    if state["run"] is None:
+        state["run"] = {"mode": SYNC_MODE, "done": [], "progress": {}}
+    elif SYNC_MODE == "incremental":
+        print(f"Resuming interrupted {state['run']['mode']} run")
+
+    print(f"Syncing Kuzu DB at {OUTPUT_DIR} ({SYNC_MODE})")
+
+    conn = kuzu.Connection(kuzu.Database(OUTPUT_DIR))
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+
+    sync = GraphSync(conn, state, STATE_PATH)
+    print("Loading entities...")
+    sync.run_pass(client, ENTITY_COLLECTION, "entity")
+    print(f"Tracking {len(state['entities'])} entities")
+
+    print("Loading chunks + edges...")
+    sync.run_pass(client, CHUNK_COLLECTION, "chunk")
+    relinked = sync.relink_mentions()
+    print(f"Re-linked mentions of {relinked} unchanged chunks")
+
+    print("Materializing vendor/SKU stats...")
+    n_vendors, n_skus = materialize_stats(conn, STATS_AS_OF)
+    print(f"Stats for {n_vendors} vendors and {n_skus} SKUs (as of {STATS_AS_OF})")
+
+    state["run"] = None
+    sync.checkpoint()
+    print(f"Done. {sync.written} upserted, {sync.deleted} removed.")
 
-    count += len(points)
-    if next_offset is None or count >= MAX_POINTS:
-        break
 
-print("Done.")
+if __name__ == "__main__":
+    main()
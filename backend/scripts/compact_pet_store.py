@@ -0,0 +1,38 @@
+"""Run pet store retention to completion (no time budget).
+
+Uses the RETENTION_* settings. The API does the same work in small steps in
+the background; this is for catching up after enabling a policy, or for
+switching an existing file to incremental vacuum (ENABLE_INCREMENTAL_VACUUM=1,
+one full VACUUM; stop the API first).
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+from backend.app.pet_store import RetentionPolicy
+from backend.app.sharded_pet_store import open_pet_store
+
+load_dotenv(".env")
+load_dotenv("backend/.env")
+
+
+def main() -> None:
+    policy = RetentionPolicy.from_settings()
+    store = open_pet_store()
+    try:
+        convert = os.environ.get("ENABLE_INCREMENTAL_VACUUM") == "1"
+        if convert and store.enable_incremental_vacuum():
+            print("Converted to auto_vacuum=INCREMENTAL")
+        if not policy.enabled():
+            print(
+                "No retention limits set (RETENTION_MAX_AGE_DAYS / _INTERACTIONS / _OVERLAY_EDGES)"
+            )
+        print(store.compact(policy))
+        print(store.table_counts())
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
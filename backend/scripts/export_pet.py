@@ -3,20 +3,30 @@ import os
 
 from dotenv import load_dotenv
 
-from backend.app.pet_store import PetStore
+from backend.app.sharded_pet_store import open_pet_store
 
 load_dotenv(".env")
 load_dotenv("backend/.env")
 
 pet_id = os.environ.get("PET_ID", "default")
 out_path = os.environ.get("EXPORT_PATH", "data/exports/pet_export.jsonl")
+# Resume from the ``cursor`` of the last row of a previous export.
+since = os.environ.get("EXPORT_SINCE") or None
+limit = int(os.environ["EXPORT_LIMIT"]) if os.environ.get("EXPORT_LIMIT") else None
+overlay = os.environ.get("EXPORT_OVERLAY", "window")
 
-store = PetStore()
-exports = store.export_pet(pet_id)
+store = open_pet_store()
 
 os.makedirs(os.path.dirname(out_path), exist_ok=True)
-with open(out_path, "w") as f:
-    for row in exports:
+count = 0
+last_cursor = None
+# Append when resuming so earlier rows are kept.
+with open(out_path, "a" if since else "w") as f:
+    for row in store.iter_export(pet_id, since=since, limit=limit, overlay=overlay):
         f.write(json.dumps(row) + "\n")
+        count += 1
+        last_cursor = row.get("cursor", last_cursor)
 
-print(f"Wrote {len(exports)} rows to {out_path}")
+print(f"Wrote {count} rows to {out_path}")
+if last_cursor:
+    print(f"Resume with EXPORT_SINCE={last_cursor}")
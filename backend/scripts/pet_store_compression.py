@@ -0,0 +1,92 @@
+"""Benchmark, train and roll out zstd compression for the pet store.
+
+COMPRESS_MODE:
+  bench      (default) report size ratio and encode/decode time per value for
+             plain zstd and zstd with a dictionary trained on a sample; the
+             DB is not modified.
+  train      train a dictionary from stored rows and save it in the DB.
+  recompress rewrite rows with the current setting (PET_STORE_COMPRESSION);
+             with compression off this decompresses everything back to text.
+"""
+
+import os
+import time
+
+from dotenv import load_dotenv
+
+from backend.app.json_codec import JsonCodec, train_dictionary
+from backend.app.pet_store import PetStore
+from backend.app.sharded_pet_store import ShardedPetStore, open_pet_store
+
+load_dotenv(".env")
+load_dotenv("backend/.env")
+
+MODE = os.environ.get("COMPRESS_MODE", "bench")
+SAMPLES = int(os.environ.get("COMPRESS_SAMPLES", "2000"))
+DICT_SIZE = int(os.environ.get("ZSTD_DICT_SIZE", "32768"))
+LEVEL = int(os.environ.get("PET_STORE_ZSTD_LEVEL", "3"))
+
+
+def measure(name: str, codec: JsonCodec, values: list[str]) -> None:
+    start = time.perf_counter()
+    encoded = [codec.encode(v) for v in values]
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for e in encoded:
+        codec.decode(e)
+    decode_s = time.perf_counter() - start
+
+    raw = sum(len(v.encode("utf-8")) for v in values)
+    stored = sum(
+        len(e) if isinstance(e, bytes) else len(e.encode("utf-8")) for e in encoded
+    )
+    n = len(values)
+    print(
+        f"{name:<12} ratio={raw / max(stored, 1):5.2f}x  "
+        f"bytes={raw}->{stored}  "
+        f"encode={encode_s / n * 1e6:7.1f}us  decode={decode_s / n * 1e6:7.1f}us"
+    )
+
+
+def bench(store: PetStore | ShardedPetStore) -> None:
+    values = store.sample_json(SAMPLES)
+    if not values:
+        raise SystemExit("no rows to sample")
+    # Train on half, measure on the other half so the ratio is not flattered.
+    train, test = values[::2], values[1::2] or values
+    dict_id, raw = train_dictionary(train, DICT_SIZE)
+    print(f"{len(values)} values sampled, dictionary {len(raw)} bytes")
+    measure("none", JsonCodec(enabled=False), test)
+    measure("zstd", JsonCodec(enabled=True, level=LEVEL), test)
+    measure(
+        "zstd+dict",
+        JsonCodec(
+            enabled=True,
+            level=LEVEL,
+            dictionaries={dict_id: raw},
+            active_dict_id=dict_id,
+        ),
+        test,
+    )
+
+
+def main() -> None:
+    store = open_pet_store()
+    try:
+        if MODE == "bench":
+            bench(store)
+        elif MODE == "train":
+            dict_id = store.train_compression(SAMPLES, DICT_SIZE)
+            print(
+                f"Stored dictionary {dict_id}; set PET_STORE_COMPRESSION=zstd to use it"
+            )
+        elif MODE == "recompress":
+            print(f"Rewrote {store.recompress()} rows")
+        else:
+            raise SystemExit(f"unknown COMPRESS_MODE: {MODE}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
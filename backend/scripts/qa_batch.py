@@ -0,0 +1,73 @@
+"""Run a bulk audit through POST /qa/batch and save the JSONL results.
+
+QA_BATCH_INPUT is a text file with one question per line, or JSONL with
+``{"question", "context", "evidence_ids"}`` objects. Questions are sent in
+chunks of QA_BATCH_CHUNK; result lines are appended to QA_BATCH_OUTPUT as
+they stream back, with ``index`` rewritten to the line number in the input.
+
+  API_URL=http://localhost:8000 QA_BATCH_INPUT=questions.txt python -m backend.scripts.qa_batch
+"""
+
+import json
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+load_dotenv("backend/.env")
+
+API_URL = os.environ.get("API_URL", "http://localhost:8000").rstrip("/")
+INPUT = os.environ.get("QA_BATCH_INPUT", "data/qa_batch/questions.txt")
+OUTPUT = os.environ.get("QA_BATCH_OUTPUT", "data/exports/qa_batch.jsonl")
+PET_ID = os.environ.get("PET_ID", "default")
+CHUNK = int(os.environ.get("QA_BATCH_CHUNK", "500"))
+CONCURRENCY = (
+    int(os.environ["QA_BATCH_CONCURRENCY"])
+    if os.environ.get("QA_BATCH_CONCURRENCY")
+    else None
+)
+
+
+def read_items(path: str) -> list[dict]:
+    items = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            items.append(
+                json.loads(line) if line.startswith("{") else {"question": line}
+            )
+    return items
+
+
+def main() -> None:
+    items = read_items(INPUT)
+    os.makedirs(os.path.dirname(OUTPUT) or ".", exist_ok=True)
+    answered = failed = 0
+    with open(OUTPUT, "w") as out, httpx.Client(timeout=None) as client:
+        for start in range(0, len(items), CHUNK):
+            body = {
+                "pet_id": PET_ID,
+                "items": items[start : start + CHUNK],
+                "concurrency": CONCURRENCY,
+            }
+            with client.stream("POST", f"{API_URL}/qa/batch", json=body) as resp:
+                resp.raise_for_status()
+                for raw in resp.iter_lines():
+                    if not raw:
+                        continue
+                    row = json.loads(raw)
+                    if row.get("done"):
+                        answered += row["answered"]
+                        failed += row["failed"]
+                        continue
+                    row["index"] += start
+                    out.write(json.dumps(row) + "\n")
+                    out.flush()
+    print(f"Answered {answered}, failed {failed} of {len(items)}; wrote {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Copy the pet store into a different number of shards.
+
+Reads SQLITE_PATH split FROM_SHARDS ways (1 = the plain file) and writes
+TO_SHARDS new files next to it. Sources are not modified. Stop the API (or
+let it drain) first, then set PET_STORE_SHARDS=TO_SHARDS and restart.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+from backend.app.sharded_pet_store import ShardedPetStore, reshard, shard_paths
+
+load_dotenv(".env")
+load_dotenv("backend/.env")
+
+
+def main() -> None:
+    base = os.environ.get("SQLITE_PATH", os.path.abspath("./backend/pet_state.db"))
+    from_shards = int(os.environ.get("FROM_SHARDS", "1"))
+    to_shards = int(os.environ.get("TO_SHARDS", "0"))
+    if to_shards < 1 or to_shards == from_shards:
+        raise SystemExit("set TO_SHARDS to a shard count different from FROM_SHARDS")
+
+    sources = shard_paths(base, from_shards)
+    targets = shard_paths(base, to_shards)
+    missing = [p for p in sources if not os.path.exists(p)]
+    existing = [p for p in targets if os.path.exists(p)]
+    if missing:
+        raise SystemExit(f"missing source files: {missing}")
+    if existing:
+        raise SystemExit(f"target files already exist: {existing}")
+
+    reshard(sources, targets)
+
+    before = ShardedPetStore(base, from_shards, write_behind=False)
+    after = ShardedPetStore(base, to_shards, write_behind=False)
+    try:
+        print("before:", before.table_counts())
+        print("after: ", after.table_counts())
+    finally:
+        before.close()
+        after.close()
+    for path in targets:
+        print("wrote", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    Rejected,
+    parse_routes,
+)
+
+ROUTES = parse_routes("/qa=interactive:0,/dilemma/next=background:0")
+
+
+def test_interactive_preempts_background_in_full_queue():
+    async def scenario():
+        gate = AdmissionController(
+            ROUTES, max_in_flight=1, max_queue=1, queue_timeout_s=5
+        )
+        assert await gate.acquire("/qa") == 0.0
+        background = asyncio.create_task(gate.acquire("/dilemma/next"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(gate.acquire("/qa"))
+        await asyncio.sleep(0)
+
+        # The queue held one background waiter; the interactive request bumped it.
+        try:
+            await background
+            raise AssertionError("background waiter should be rejected")
+        except Rejected as exc:
+            assert exc.reason == "preempted" and exc.retry_after >= 1
+
+        gate.release("/qa", 0.01)
+        assert await interactive >= 0
+        stats = gate.stats()
+        assert stats["in_flight"] == 1
+        assert stats["lanes"]["interactive"]["admitted_after_wait"] == 1
+        assert stats["lanes"]["background"]["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_middleware_returns_429_with_retry_after():
+    app = FastAPI()
+    gate = AdmissionController(ROUTES, max_in_flight=0, max_queue=0, queue_timeout_s=5)
+    app.add_middleware(AdmissionMiddleware, controller=gate)
+
+    @app.get("/qa")
+    def qa():
+        return {"ok": True}
+
+    @app.get("/pet")
+    def pet():
+        return {"ok": True}
+
+    client = TestClient(app)
+    resp = client.get("/qa")
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert client.get("/pet").status_code == 200
+
+
+def test_per_call_slots_let_interactive_in_between_batch_items():
+    async def scenario():
+        gate = AdmissionController(
+            parse_routes("/qa=interactive:0,/qa/batch=batch:0"),
+            max_in_flight=1,
+            max_queue=4,
+            queue_timeout_s=5,
+        )
+        loop = asyncio.get_running_loop()
+        order: list[str] = []
+        holding, done = threading.Event(), threading.Event()
+
+        def batch_item(name: str, hold: bool = False) -> None:
+            with gate.slot("/qa/batch", loop):
+                order.append(name)
+                if hold:
+                    holding.set()
+                    done.wait()
+
+        first = loop.run_in_executor(None, batch_item, "batch-1", True)
+        await asyncio.to_thread(holding.wait)
+        second = loop.run_in_executor(None, batch_item, "batch-2")
+        while gate.stats()["queued"] < 1:
+            await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(gate.acquire("/qa"))
+        while gate.stats()["queued"] < 2:
+            await asyncio.sleep(0.01)
+
+        # The queued /qa goes ahead of the batch's next item.
+        done.set()
+        await interactive
+        order.append("qa")
+        gate.release("/qa", 0.01)
+        await first
+        await second
+        assert order == ["batch-1", "qa", "batch-2"]
+        assert gate.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
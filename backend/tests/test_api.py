@@ -1,14 +1,30 @@
 from __future__ import annotations
 
+import json
+import time
+from dataclasses import replace
+
 from fastapi.testclient import TestClient
 
 import backend.app.main as main
+from backend.app.answer_cache import AnswerCache
 
 
 class DummyLLM:
+    temperature = 0.2
+
     def embed(self, text: str):
         return [0.1, 0.2, 0.3]
 
+    def embed_many(self, texts):
+        return [self.embed(t) for t in texts]
+
+    def probe_chat(self):
+        pass
+
+    def probe_embed(self):
+        pass
+
     def chat(self, messages):
         return "OK"
 
@@ -34,8 +50,29 @@ class DummyKuzu:
             "edges": [],
         }
 
+    def vendor_stats(self, vendor_id):
+        if vendor_id != "1":
+            return None
+        return {
+            "vendor_id": "1",
+            "invoice_count": 4,
+            "total_sum": 40.0,
+            "total_mean": 10.0,
+            "total_std": 0.0,
+            "total_p50": 10.0,
+            "total_p90": 10.0,
+            "total_p99": 10.0,
+            "total_max": 10.0,
+            "last_invoice_date": "2024-05-01",
+            "overdue_count": 1,
+            "as_of": "2024-06-01",
+        }
+
 
 class DummyPetStore:
+    def __init__(self):
+        self.batches = []
+
     def get_pet(self, pet_id):
         return {
             "stats": {
@@ -50,6 +87,9 @@ class DummyPetStore:
     def log_interaction(self, pet_id, question, evidence, answer):
         return "test-interaction"
 
+    def log_batch(self, pet_id, entries):
+        self.batches.append((pet_id, entries))
+
     def add_overlay_edges(self, pet_id, edges):
         return []
 
@@ -67,12 +107,48 @@ class DummyPetStore:
     def maybe_evolve(self, pet_id):
         return None
 
+    def apply_feedback(self, interaction_id, action, rationale=None):
+        return {
+            "pet_id": "default",
+            "stats": self.update_stats("default", action),
+            "path": "Baby",
+            "new_path": None,
+            "overlay_edges": [],
+        }
+
     def get_interaction_pet(self, interaction_id):
         return "default"
 
+    def apply_feedback_batch(self, items):
+        results, risk = [], 50
+        for interaction_id, _action, _rationale in items:
+            risk += 2
+            stats = {**self.update_stats("default", "flag"), "risk": risk}
+            results.append(
+                {
+                    "interaction_id": interaction_id,
+                    "pet_id": "default",
+                    "stats": stats,
+                    "overlay_edges": [],
+                }
+            )
+        summary = {
+            "stats": results[-1]["stats"],
+            "path": "Baby",
+            "new_path": None,
+            "applied": len(items),
+        }
+        return {"results": results, "pets": {"default": summary}}
+
     def list_interactions(self, pet_id, limit=10):
         return []
 
+    def page_interactions(self, pet_id, limit=50, cursor=None, **filters):
+        if cursor == "bad":
+            raise ValueError("invalid cursor")
+        item = {"id": "i1", "question": "q", "decision": "flag", "timestamp": 1.0}
+        return [item], None if cursor else "next"
+
 
 client = TestClient(main.app)
 
@@ -85,6 +161,7 @@ def setup_module(module):
 
     # Patch retrieval helpers
     main.search = lambda client, vector: []
+    main.search_batch = lambda client, vectors: [[] for _ in vectors]
     main.to_evidence = lambda points: [
         {
             "id": "qdrant:DocumentChunk_text:1",
@@ -109,6 +186,27 @@ def test_health():
     assert data["status"] == "ok"
 
 
+def test_health_models_served_from_cache():
+    main.model_prober.probe_once()
+    data = client.get("/health/models").json()
+    assert data["chat"] is True and data["embed"] is True
+    assert data["models"]["chat"]["error"] is None
+    assert data["models"]["embed"]["latency_ms"] >= 0
+
+
+def test_health_models_on_demand(monkeypatch):
+    # MODEL_PROBE_INTERVAL_S=0: probed per call, and a slow later check must
+    # not make the earlier results stale.
+    monkeypatch.setattr(
+        main, "settings", replace(main.settings, model_probe_interval_s=0)
+    )
+    monkeypatch.setattr(main.model_prober, "stale_after_s", float("inf"))
+    monkeypatch.setattr(main.llm, "probe_embed", lambda: time.sleep(0.2))
+    data = client.get("/health/models").json()
+    assert data["chat"] is True and data["embed"] is True
+    assert data["models"]["chat"]["stale"] is False
+
+
 def test_qa():
     resp = client.post("/qa", json={"question": "Test?", "pet_id": "default"})
     assert resp.status_code == 200
@@ -119,6 +217,149 @@ def test_qa():
     assert "graph_combined" in data
 
 
+def test_qa_server_timing_and_metrics():
+    resp = client.post("/qa", json={"question": "Timed?", "pet_id": "default"})
+    assert resp.status_code == 200
+    timing = resp.headers["Server-Timing"]
+    for name in ("qdrant", "kuzu", "sqlite", "total"):
+        assert f"{name};dur=" in timing
+
+    text = client.get("/metrics").text
+    assert 'finagotchi_stage_seconds_bucket{endpoint="/qa",stage="sqlite"' in text
+    assert 'finagotchi_request_seconds_count{endpoint="/qa",status="200"}' in text
+
+
+def test_qa_profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        main,
+        "profiler",
+        main.RequestProfiler("secret", str(tmp_path), min_interval_s=60),
+    )
+    body = {"question": "Profile me?", "pet_id": "default"}
+    resp = client.post("/qa", json=body, headers={"X-Profile-Token": "wrong"})
+    assert resp.status_code == 403
+
+    resp = client.post("/qa", json=body, headers={"X-Profile-Token": "secret"})
+    assert resp.status_code == 200
+    profile_id = resp.headers["X-Profile-Id"]
+    resp = client.post("/qa?profile_token=secret", json=body)
+    assert resp.headers["X-Profile-Id"] == "rate-limited"
+    assert "X-Profile-Id" not in client.post("/qa", json=body).headers
+
+    url = f"/debug/profiles/{profile_id}"
+    assert client.get(url).status_code == 404
+    alloc = client.get(
+        url, params={"kind": "alloc"}, headers={"X-Profile-Token": "secret"}
+    ).json()
+    assert alloc["peak_bytes"] > 0
+    speedscope = client.get(url, params={"profile_token": "secret"}).json()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+
+
+def test_qa_graph_delta():
+    first = client.post("/qa", json={"question": "Test?"}).json()
+    version = first["graph_version"]
+    assert first["graph_combined"]["version"] == version
+
+    resp = client.post(
+        "/qa",
+        json={"question": "Test?", "graph_since": version, "include_combined": False},
+    )
+    data = resp.json()
+    assert data["graph_combined"] is None
+    assert data["graph_delta"]["base_version"] == version
+    assert data["graph_delta"]["nodes"] == []
+    assert data["graph_delta"]["removed_node_ids"] == []
+
+
+def test_qa_answer_cache(tmp_path, monkeypatch):
+    cache = AnswerCache(str(tmp_path / "answers.db"), similarity=0.9)
+    monkeypatch.setattr(main, "answer_cache", cache)
+
+    def ask(question):
+        return client.post("/qa", json={"question": question}).json()["cache_hit"]
+
+    assert ask("Is vendor 1 risky?") is None
+    assert ask("is  vendor 1 RISKY?") == "exact"
+    # DummyLLM embeds every text to the same vector.
+    assert ask("Should vendor 1 worry us?") == "semantic"
+    assert cache.stats() == {
+        "entries": 1,
+        "hits": {"exact": 1, "semantic": 1},
+        "misses": 1,
+    }
+    cache.close()
+
+    reopened = AnswerCache(str(tmp_path / "answers.db"))
+    monkeypatch.setattr(main, "answer_cache", reopened)
+    assert ask("Is vendor 1 risky?") == "exact"
+    assert ask("Something else entirely?") == "semantic"
+    reopened.close()
+
+
+def test_qa_batch_streams_lines_and_logs_once():
+    items = [{"question": f"Is vendor 1 risky? ({i})"} for i in range(5)]
+    resp = client.post(
+        "/qa/batch",
+        json={"pet_id": "p1", "items": items, "concurrency": 2, "include_graphs": True},
+    )
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    *results, done = lines
+    assert done == {"done": True, "answered": 5, "failed": 0}
+    assert sorted(r["index"] for r in results) == list(range(5))
+    assert all(r["neighborhood_graph"]["nodes"] for r in results)
+
+    pet_id, entries = main.pet_store.batches[-1]
+    assert pet_id == "p1"
+    assert {e[0] for e in entries} == {r["interaction_id"] for r in results}
+
+
+def test_qa_batch_admits_each_item_in_batch_lane():
+    before = main.admission.stats()["lanes"]["batch"]["admitted"]
+    items = [{"question": f"Is vendor 1 risky? ({i})"} for i in range(3)]
+    resp = client.post("/qa/batch", json={"items": items})
+    assert resp.status_code == 200
+    stats = main.admission.stats()
+    assert stats["lanes"]["batch"]["admitted"] == before + 3
+    assert stats["routes"]["/qa/batch"]["in_flight"] == 0
+
+
+def test_qa_batch_concurrency_is_capped(monkeypatch):
+    workers = []
+
+    class Pool(main.ThreadPoolExecutor):
+        def __init__(self, max_workers):
+            workers.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(main, "ThreadPoolExecutor", Pool)
+    resp = client.post(
+        "/qa/batch",
+        json={"items": [{"question": "Is vendor 1 risky?"}], "concurrency": 10_000},
+    )
+    assert resp.status_code == 200
+    assert workers == [main.settings.qa_batch_concurrency]
+
+
+def test_export_pet_returns_everything_unless_limited(monkeypatch):
+    rows = [{"cursor": f"c{i}"} for i in range(3)]
+    calls = []
+
+    def export_pet(pet_id, since=None, limit=None, overlay="window"):
+        calls.append(limit)
+        return rows[:limit]
+
+    monkeypatch.setattr(main.pet_store, "export_pet", export_pet, raising=False)
+    data = client.get("/export/pet").json()
+    assert calls == [None]
+    assert len(data["rows"]) == 3 and data["next_cursor"] is None
+
+    data = client.get("/export/pet", params={"limit": 2}).json()
+    assert calls[-1] == 2
+    assert data["next_cursor"] == "c1"
+
+
 def test_feedback():
     resp = client.post(
         "/feedback",
@@ -130,6 +371,33 @@ def test_feedback():
     assert "updated_pet_stats" in data
 
 
+def test_feedback_batch():
+    resp = client.post(
+        "/feedback/batch",
+        json={"items": [{"interaction_id": "i1", "action": "flag"}] * 3},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [r["pet_stats"]["risk"] for r in data["results"]] == [52, 54, 56]
+    assert data["pets"]["default"]["applied"] == 3
+    assert data["applied"] == 3
+    assert data["items_per_s"] > 0
+
+
+def test_vendor_stats():
+    resp = client.get("/graph/vendor/1/stats")
+    assert resp.status_code == 200
+    assert resp.json()["invoice_count"] == 4
+    assert client.get("/graph/vendor/404/stats").status_code == 404
+
+
+def test_pet_interactions_page():
+    resp = client.get("/pet/interactions", params={"limit": 1})
+    assert resp.status_code == 200
+    assert resp.json()["next_cursor"] == "next"
+    assert client.get("/pet/interactions", params={"cursor": "bad"}).status_code == 400
+
+
 def test_graph_sample():
     resp = client.get("/graph/sample")
     assert resp.status_code == 200
@@ -0,0 +1,62 @@
+import kuzu
+
+from backend.scripts.build_kuzu_from_qdrant import (
+    SCHEMA,
+    GraphSync,
+    _empty_state,
+    parse_chunk,
+)
+
+CHUNKS = {
+    "c1": {"text": "by name", "entities": [{"name": "Acme"}]},
+    "c2": {"text": "by id", "entities": [{"id": "e2", "name": "Beta"}]},
+    "c3": {"text": "both", "entities": [{"id": "e1", "name": "Acme"}, "Beta"]},
+}
+
+
+def _open(tmp_path, name):
+    conn = kuzu.Connection(kuzu.Database(str(tmp_path / name)))
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    return GraphSync(conn, _empty_state(), str(tmp_path / f"{name}.json"))
+
+
+def _upsert_chunks(sync):
+    for cid, payload in CHUNKS.items():
+        sync.upsert_chunk(parse_chunk(cid, payload), f"h-{cid}")
+
+
+def _mentions(sync):
+    res = sync.conn.execute(
+        "MATCH (c:Chunk)-[:Mentions]->(e:Entity) RETURN c.chunk_id, e.entity_id"
+    )
+    rows = set()
+    while res.has_next():
+        rows.add(tuple(res.get_next()))
+    return rows
+
+
+def test_incremental_entity_changes_match_full_rebuild(tmp_path):
+    sync = _open(tmp_path, "sync")
+    sync.upsert_entity("e1", {"name": "Acme", "type": ""}, "h1")
+    _upsert_chunks(sync)
+    assert _mentions(sync) == {("c1", "e1"), ("c3", "e1")}
+
+    # Later syncs: e2 appears, e1 is deleted and then re-created. No chunk
+    # changes, so only the relink pass can fix their edges.
+    sync.upsert_entity("e2", {"name": "Beta", "type": ""}, "h2")
+    sync.delete_entity("e1")
+    assert sync.relink_mentions() == 3
+    sync.upsert_entity("e1", {"name": "Acme", "type": ""}, "h1")
+    sync.relink_mentions()
+
+    full = _open(tmp_path, "full")
+    full.upsert_entity("e1", {"name": "Acme", "type": ""}, "h1")
+    full.upsert_entity("e2", {"name": "Beta", "type": ""}, "h2")
+    _upsert_chunks(full)
+
+    expected = {("c1", "e1"), ("c2", "e2"), ("c3", "e1"), ("c3", "e2")}
+    assert _mentions(full) == expected
+    assert _mentions(sync) == expected
+    assert sync.state["chunks"]["c3"]["mentions"] == ["e1", "e2"]
+    assert sync.state["relink"] == []
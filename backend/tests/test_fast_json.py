@@ -0,0 +1,38 @@
+import pytest
+from fastapi.responses import JSONResponse
+
+from backend.app import fast_json
+from backend.app.fast_json import FastJSONResponse
+
+BUNDLE = {
+    "nodes": [
+        {
+            "id": "vendor:7",
+            "label": "Société Générale – café ☕",
+            "group": "vendor",
+            "properties": {"total": 1234.5, "ratio": 1 / 3, "score": 1.0},
+        },
+        {"id": "invoice:INV-1", "label": "INV-1 | $10.0", "meta": {}},
+    ],
+    "edges": [
+        {
+            "id": "vendor:7->invoice:INV-1",
+            "source": "vendor:7",
+            "target": "invoice:INV-1",
+            "label": "ISSUED",
+            "weight": 0.1,
+            "isOverlay": None,
+        }
+    ],
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_json_matches_json_response(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson not installed")
+    resp = FastJSONResponse(BUNDLE)
+    assert resp.body == JSONResponse(BUNDLE).body
+    assert resp.media_type == "application/json"
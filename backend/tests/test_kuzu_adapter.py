@@ -0,0 +1,65 @@
+from backend.app.kuzu_adapter import KuzuAdapter
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def has_next(self):
+        return bool(self.rows)
+
+    def get_next(self):
+        return self.rows.pop(0)
+
+
+class _Conn:
+    """Returns canned rows per query kind, with duplicates like real joins."""
+
+    def execute(self, query, params=None):
+        if "(v:Vendor {vendor_id: $vid})" in query:
+            row = ("INV-1", 10.0, "2024-05-01", "2024-06-01", "SKU-1", "Widget")
+            return _Result(
+                [row, row, ("INV-1", 10.0, "2024-05-01", "2024-06-01", "SKU-2", None)]
+            )
+        if "(i:Invoice {invoice_id: $iid})" in query:
+            # Same invoice reached from the invoice anchor; no vendor on one row.
+            return _Result(
+                [
+                    ("7", 10.0, "2024-05-01", "2024-06-01", "SKU-1", "Widget"),
+                    (None, 10.0, "2024-05-01", "2024-06-01", None, None),
+                ]
+            )
+        return _Result([])
+
+
+def _adapter():
+    adapter = KuzuAdapter.__new__(KuzuAdapter)
+    adapter._enabled = True
+    adapter._conn = _Conn()
+    return adapter
+
+
+def test_neighborhood_dedups_and_projects_rows():
+    graph = _adapter().neighborhood(
+        {"vendor_id": {"7"}, "transaction_id": {"INV-1"}, "chunk_id": {"c1"}}
+    )
+    nodes = {n["id"]: n for n in graph["nodes"]}
+    assert sorted(nodes) == ["invoice:INV-1", "sku:SKU-1", "sku:SKU-2", "vendor:7"]
+    assert len(graph["nodes"]) == len(nodes)
+
+    edges = sorted((e["source"], e["target"], e["label"]) for e in graph["edges"])
+    assert edges == [
+        ("invoice:INV-1", "sku:SKU-1", "CONTAINS"),
+        ("invoice:INV-1", "sku:SKU-2", "CONTAINS"),
+        ("vendor:7", "invoice:INV-1", "ISSUED"),
+    ]
+    assert all(e["id"] == f"{e['source']}->{e['target']}" for e in graph["edges"])
+
+    invoice = nodes["invoice:INV-1"]
+    assert invoice["group"] == "transaction" and invoice["type"] == "transaction"
+    assert invoice["label"] == "INV-1 | $10.0"
+    assert invoice["properties"]["due_date"] == "2024-06-01"
+    assert nodes["sku:SKU-2"]["properties"]["product"] == ""
+    assert nodes["vendor:7"]["meta"] == {"vendor_id": "7"}
+    # Vendor/invoice anchors matched, so the chunk fallback is skipped.
+    assert "chunk:c1" not in nodes
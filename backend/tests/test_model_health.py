@@ -0,0 +1,25 @@
+import time
+
+from backend.app.model_health import ModelProber
+
+
+def test_prober_reports_errors_and_staleness():
+    def down():
+        raise ConnectionError("refused")
+
+    prober = ModelProber({"chat": lambda: None, "embed": down}, stale_after_s=60)
+    status = prober.status()
+    assert status["chat"] is False
+    assert status["models"]["chat"]["error"] == "not probed yet"
+
+    status = prober.probe_once()
+    assert status["chat"] is True
+    assert status["embed"] is False
+    assert status["models"]["embed"]["error"] == "ConnectionError: refused"
+    assert status["models"]["embed"]["last_ok_at"] is None
+
+    prober.stale_after_s = 0
+    time.sleep(0.2)
+    status = prober.status()
+    assert status["chat"] is False
+    assert status["models"]["chat"]["stale"] is True
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import gzip
+import json
+import sqlite3
+import threading
+from dataclasses import replace
+
+import pytest
+
+from backend.app import pet_store
+from backend.app.pet_store import DEFAULT_STATS, MIGRATIONS, PetStore, RetentionPolicy
+from backend.app.sharded_pet_store import (
+    ShardedPetStore,
+    reshard,
+    shard_for,
+    shard_paths,
+)
+
+
+@pytest.fixture()
+def store(tmp_path):
+    s = PetStore(str(tmp_path / "pet_state.db"))
+    yield s
+    s.close()
+
+
+def test_connection_is_reused_per_thread_and_uses_wal(store):
+    conn = store._connect()
+    assert store._connect() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other: list[object] = []
+    t = threading.Thread(target=lambda: other.append(store._connect()))
+    t.start()
+    t.join()
+    assert other[0] is not conn
+
+
+def test_interaction_roundtrip(store):
+    assert store.get_pet("p1")["stats"] == DEFAULT_STATS
+    iid = store.log_interaction("p1", "q?", [], {"decision": "flag"})
+    assert store.get_interaction_pet(iid) == "p1"
+    assert store.list_interactions("p1")[0]["decision"] == "flag"
+
+
+def test_pet_state_cache_is_bounded_lru(store, monkeypatch):
+    monkeypatch.setattr(
+        pet_store, "settings", replace(pet_store.settings, pet_state_cache_size=2)
+    )
+    for pet_id in ("p1", "p2", "p3"):
+        store.get_pet(pet_id)
+    assert list(store._pet_cache) == ["p2", "p3"]
+    store.get_pet("p2")
+    store.get_pet("p4")
+    assert list(store._pet_cache) == ["p2", "p4"]
+
+
+def test_log_batch_writes_interactions_and_overlay(store):
+    edge = {"src": "vendor:1", "rel": "FLAGGED", "dst": "invoice:1"}
+    store.log_batch(
+        "p1",
+        [
+            ("a", "q1?", [], {"decision": "flag", "overlay_edges": [edge]}),
+            ("b", "q2?", [], {"decision": "approve"}),
+        ],
+    )
+    assert store.get_interaction_pet("b") == "p1"
+    assert [i["decision"] for i in store.list_interactions("p1")] == ["approve", "flag"]
+    assert store.get_overlay_graph("p1")["edges"][0]["label"] == "FLAGGED"
+
+
+def test_migrates_legacy_db_in_place(tmp_path):
+    path = tmp_path / "legacy.db"
+    legacy = sqlite3.connect(path)
+    legacy.execute(
+        "CREATE TABLE interactions (id TEXT PRIMARY KEY, pet_id TEXT NOT NULL, "
+        "question TEXT NOT NULL, evidence_json TEXT NOT NULL, "
+        "answer_json TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    legacy.execute(
+        "INSERT INTO interactions VALUES ('i1', 'p1', 'q', '[{\"id\": \"c1\"}]', '{}', 1.0)"
+    )
+    legacy.commit()
+    legacy.close()
+
+    store = PetStore(str(path))
+    try:
+        assert store.schema_version() == len(MIGRATIONS)
+        plan = (
+            store._connect()
+            .execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM interactions "
+                "WHERE pet_id = ? ORDER BY created_at DESC",
+                ("p1",),
+            )
+            .fetchall()
+        )
+        assert "idx_interactions_pet_created" in str(plan)
+        assert store.get_interaction_pet("i1") == "p1"
+        assert store.export_pet("p1")[0]["evidence"] == [{"id": "c1"}]
+        assert (
+            store._connect()
+            .execute("SELECT evidence_json FROM interactions")
+            .fetchone()[0]
+            == ""
+        )
+    finally:
+        store.close()
+    # Re-opening is a no-op.
+    assert PetStore(str(path)).schema_version() == len(MIGRATIONS)
+
+
+def test_write_behind_reads_see_pending_rows(tmp_path):
+    store = PetStore(str(tmp_path / "wb.db"), write_behind=True)
+    try:
+        iid = store.log_interaction("p1", "q?", [], {"decision": "approve"})
+        store.add_overlay_edges("p1", [{"src": "a", "rel": "R", "dst": "b"}])
+        # Visible before or after the writer commits.
+        assert store.get_interaction_pet(iid) == "p1"
+        assert store.list_interactions("p1")[0]["id"] == iid
+        assert store.get_overlay_graph("p1")["edges"][0]["label"] == "R"
+
+        store.flush()
+        stats = store.write_stats()
+        assert stats["rows"] == 2
+        assert stats["queue_depth"] == 0
+    finally:
+        store.close()
+    reopened = PetStore(str(tmp_path / "wb.db"))
+    assert reopened.get_interaction_pet(iid) == "p1"
+
+
+def test_apply_feedback_is_atomic_under_concurrency(store):
+    iid = store.log_interaction("p1", "q?", [], {"decision": "flag"})
+    threads = [
+        threading.Thread(target=store.apply_feedback, args=(iid, "flag", "note"))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # No lost updates: each flag adds risk +2, compliance +1.
+    expected = {**DEFAULT_STATS, "risk": 66, "compliance": 58}
+    assert store.get_pet("p1")["stats"] == expected
+    fresh = PetStore(store.db_path)
+    assert fresh.get_pet("p1")["stats"] == expected
+    assert len(fresh.get_overlay_graph("p1")["edges"]) == 8
+    fresh.close()
+
+
+def test_apply_feedback_batch_groups_by_pet(store):
+    a = store.log_interaction("p1", "q?", [], {"decision": "flag"})
+    b = store.log_interaction("p2", "q?", [], {"decision": "flag"})
+    out = store.apply_feedback_batch(
+        [
+            (a, "flag", "n1"),
+            (b, "approve", None),
+            (a, "flag", None),
+            ("nope", "flag", None),
+        ]
+    )
+
+    assert [r["pet_id"] for r in out["results"]] == ["p1", "p2", "p1", "default"]
+    assert out["results"][0]["stats"]["risk"] == 52
+    assert out["results"][2]["stats"]["risk"] == 54
+    assert out["pets"]["p1"]["applied"] == 2
+    assert store.get_pet("p1")["stats"] == {
+        **DEFAULT_STATS,
+        "risk": 54,
+        "compliance": 52,
+    }
+    assert len(store.get_overlay_graph("p1")["edges"]) == 1
+    assert store.get_overlay_graph("p2")["edges"] == []
+
+
+def test_export_streams_edges_per_window_and_resumes(store, monkeypatch):
+    monkeypatch.setattr(pet_store, "EXPORT_PAGE_SIZE", 2)
+    for i in range(5):
+        store.log_interaction("p1", f"q{i}", [], {"decision": "flag"})
+        store.add_overlay_edges("p1", [{"src": f"q{i}", "rel": "FLAGGED", "dst": "v"}])
+
+    rows = list(store.iter_export("p1"))
+    assert [r["question"] for r in rows] == [f"q{i}" for i in range(5)]
+    assert [[e["src"] for e in r["overlay_edges"]] for r in rows] == [
+        [f"q{i}"] for i in range(5)
+    ]
+
+    head = store.export_pet("p1", limit=2)
+    tail = store.export_pet("p1", since=head[-1]["cursor"])
+    assert head + tail == rows
+
+    once = store.export_pet("p1", overlay="once")
+    assert [r["kind"] for r in once] == ["overlay_edge"] * 5 + ["interaction"] * 5
+    assert "overlay_edges" not in once[-1]
+
+    # Cursors use the same opaque encoding as page_interactions.
+    assert pet_store.decode_page_cursor(rows[0]["cursor"]) == (
+        rows[0]["timestamp"],
+        rows[0]["id"],
+    )
+    assert store.export_pet("p1", since=rows[2]["timestamp"]) == rows[2:]
+    with pytest.raises(ValueError):
+        store.iter_export("p1", since="not a cursor")
+
+
+def test_once_export_pages_without_duplicates(store, monkeypatch):
+    monkeypatch.setattr(pet_store, "EXPORT_PAGE_SIZE", 2)
+    for i in range(3):
+        store.log_interaction("p1", f"q{i}", [], {"decision": "flag"})
+        store.add_overlay_edges("p1", [{"src": f"q{i}", "rel": "FLAGGED", "dst": "v"}])
+    full = store.export_pet("p1", overlay="once")
+
+    pages, since = [], None
+    while True:
+        page = store.export_pet("p1", since=since, limit=2, overlay="once")
+        assert len(page) <= 2
+        pages.extend(page)
+        if len(page) < 2:
+            break
+        since = page[-1]["cursor"]
+    assert pages == full
+    assert len({r["id"] for r in pages}) == 6
+
+
+def test_evidence_is_stored_once_and_rehydrated(store):
+    chunk = {"id": "c1", "text": "Invoice 7", "payload": {"amount": 10}}
+    other = {"id": "c2", "text": "Invoice 8"}
+    store.log_interaction("p1", "q0", [chunk, other], {})
+    store.log_interaction("p1", "q1", [dict(reversed(chunk.items()))], {})
+
+    conn = store._connect()
+    assert conn.execute("SELECT COUNT(*) FROM evidence").fetchone()[0] == 2
+    assert [r["evidence"] for r in store.export_pet("p1", overlay="none")] == [
+        [chunk, other],
+        [chunk],
+    ]
+
+
+def test_zstd_compression_reads_mixed_rows(tmp_path):
+    pytest.importorskip("zstandard")
+    path = str(tmp_path / "z.db")
+    plain = PetStore(path)
+    answer = {"decision": "flag", "rationale": "Amount exceeds vendor average. " * 4}
+    for i in range(40):
+        plain.log_interaction(
+            "p1", f"q{i}", [{"id": f"c{i}", "text": "x" * 80}], answer
+        )
+    plain.close()
+
+    store = PetStore(path, compression="zstd")
+    try:
+        store.train_compression(dict_size=4096)
+        store.log_interaction("p1", "new", [], answer)
+        conn = store._connect()
+        kinds = {
+            r[0] for r in conn.execute("SELECT typeof(answer_json) FROM interactions")
+        }
+        assert kinds == {"text", "blob"}
+        assert store.list_interactions("p1", limit=50)[0]["decision"] == "flag"
+
+        assert store.recompress() > 0
+        assert (
+            conn.execute(
+                "SELECT COUNT(*) FROM interactions WHERE typeof(answer_json) = 'text'"
+            ).fetchone()[0]
+            == 0
+        )
+        rows = store.export_pet("p1", overlay="none")
+        assert rows[0]["rationale"] == answer["rationale"]
+        assert rows[0]["evidence"] == [{"id": "c0", "text": "x" * 80}]
+    finally:
+        store.close()
+
+
+def test_page_interactions_walks_history_with_filters(store):
+    ids = [
+        store.log_interaction(
+            "p1", f"q{i}", [], {"decision": "flag" if i % 2 else "approve"}
+        )
+        for i in range(7)
+    ]
+    seen, cursor = [], None
+    while True:
+        items, cursor = store.page_interactions("p1", limit=3, cursor=cursor)
+        seen += [item["id"] for item in items]
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+
+    flags, _ = store.page_interactions("p1", decision="flag", order="asc")
+    assert [item["id"] for item in flags] == ids[1::2]
+
+    with pytest.raises(ValueError):
+        store.page_interactions("p1", cursor="not-a-cursor")
+
+
+def test_sharded_store_routes_by_pet_and_reshards(tmp_path):
+    base = str(tmp_path / "pets.db")
+    single = PetStore(base)
+    ids = {
+        pet: single.log_interaction(pet, "q", [{"id": pet}], {"decision": "flag"})
+        for pet in ("a", "b", "c", "d")
+    }
+    for _ in range(3):
+        single.add_overlay_edges("a", [{"src": "q", "rel": "FLAGGED", "dst": "v"}])
+    single.compact(
+        RetentionPolicy(max_overlay_edges=1), archive_dir=str(tmp_path / "archive")
+    )
+    single.close()
+
+    reshard(shard_paths(base, 1), shard_paths(base, 3))
+    sharded = ShardedPetStore(base, shards=3)
+    try:
+        assert sharded.table_counts()["interactions"] == 4
+        for pet, iid in ids.items():
+            store = sharded.shard(pet)
+            assert store.db_path == shard_paths(base, 3)[shard_for(pet, 3)]
+            assert store.get_interaction_pet(iid) == pet
+            assert store.export_pet(pet)[0]["evidence"] == [{"id": pet}]
+        # Rolled-up overlay weight moves with the pet.
+        (edge,) = sharded.get_overlay_graph("a")["edges"]
+        assert edge["weight"] == 3.0
+        assert sharded.apply_feedback(ids["b"], "flag")["pet_id"] == "b"
+        # Compression samples come from every shard.
+        bodies = [json.loads(v) for v in sharded.sample_json(10)]
+        assert {"a", "b", "c", "d"} <= {b.get("id") for b in bodies}
+    finally:
+        sharded.close()
+
+
+def test_compact_archives_rolls_up_and_vacuums(store, tmp_path):
+    for i in range(5):
+        store.log_interaction("p1", f"q{i}", [{"id": f"c{i}", "text": "x" * 2000}], {})
+        store.add_overlay_edges("p1", [{"src": "q", "rel": "FLAGGED", "dst": "v"}])
+    assert store._connect().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    policy = RetentionPolicy(max_interactions=2, max_overlay_edges=1)
+    result = store.compact(policy, archive_dir=str(tmp_path / "archive"))
+    assert result["archived"] == 3 and result["rolled_up"] == 4 and result["done"]
+
+    assert [r["question"] for r in store.export_pet("p1", overlay="none")] == [
+        "q3",
+        "q4",
+    ]
+    assert store.table_counts()["evidence"] == 2
+    (archive,) = (tmp_path / "archive" / "p1").iterdir()
+    with gzip.open(archive, "rt") as f:
+        assert [json.loads(line)["question"] for line in f] == ["q0", "q1", "q2"]
+
+    (edge,) = store.get_overlay_graph("p1")["edges"]
+    assert edge["weight"] == 5.0 and edge["meta"]["rolled_up"] == 4
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from backend.app.metrics import StageTimer, current_timer, stage
+from backend.app.profiling import RequestProfiler
+
+
+def _busy(until: float) -> None:
+    while time.perf_counter() < until:
+        sum(range(1000))
+
+
+def test_profile_samples_registered_thread_and_rate_limits(tmp_path):
+    profiler = RequestProfiler(
+        "secret", str(tmp_path), interval_s=0.001, min_interval_s=60, keep=1
+    )
+    assert profiler.authorized("secret")
+    assert not profiler.authorized("wrong")
+    assert not profiler.authorized(None)
+
+    threads: set[int] = set()
+    session = profiler.begin(lambda: list(threads))
+    assert session is not None
+    # Running or too recent: later requests go unprofiled.
+    assert profiler.begin(list) is None
+
+    worker = threading.Thread(
+        target=lambda: (
+            threads.add(threading.get_ident()),
+            _busy(time.perf_counter() + 0.1),
+        )
+    )
+    worker.start()
+    worker.join()
+    profile_id = session.finish("GET /test")
+    assert profiler.begin(list) is None
+
+    profile = profiler.path(profile_id, "speedscope").read_text()
+    assert '"type": "sampled"' in profile
+    assert "_busy" in profile
+    assert profiler.path(profile_id, "alloc") is not None
+    assert profiler.path("../../etc/passwd", "alloc") is None
+
+    profiler.min_interval_s = 0
+    second = profiler.begin(list).finish("GET /test")
+    # keep=1 prunes the older profile.
+    assert profiler.path(profile_id, "speedscope") is None
+    assert profiler.path(second, "alloc") is not None
+
+
+def test_stage_threads_are_active_only_inside_stages():
+    timer = StageTimer()
+    token = current_timer.set(timer)
+    try:
+        me = threading.get_ident()
+        with stage("outer"):
+            with stage("inner"):
+                assert timer.active_threads() == [me]
+            assert timer.active_threads() == [me]
+        # The worker may now serve another request; it is no longer sampled.
+        assert timer.active_threads() == []
+    finally:
+        current_timer.reset(token)
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from backend.app.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights: SingleFlight[int] = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work() -> int:
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+
+    def run() -> None:
+        results.append(flights.do("k", work))
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=run) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flights.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [(42, False), (42, True), (42, True), (42, True)]
+    assert flights.stats() == {"executions": 1, "coalesced": 3, "in_flight": 0}
+
+    # Nothing is cached once the call has finished.
+    assert flights.do("k", lambda: 7) == (7, False)
+
+
+def test_followers_receive_leader_error():
+    flights: SingleFlight[int] = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail() -> int:
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def run() -> None:
+        try:
+            flights.do("k", fail)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    threads = [threading.Thread(target=run)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=run))
+    threads[1].start()
+    while flights.coalesced < 1:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert errors == ["boom", "boom"]
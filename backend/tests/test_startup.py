@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.startup import Startup, StartupGate
+
+
+def test_loaders_run_in_parallel_and_warmup_failures_are_soft():
+    def slow():
+        time.sleep(0.2)
+
+    def broken_warmup():
+        raise RuntimeError("no graph")
+
+    async def scenario():
+        startup = Startup(
+            {"a": slow, "b": slow, "c": slow}, warmups={"graph": broken_warmup}
+        )
+        assert not startup.blocking
+        start = time.perf_counter()
+        await startup.run()
+        assert time.perf_counter() - start < 0.5
+        await startup.wait()
+        status = startup.status()
+        assert status["state"] == "ready" and not startup.blocking
+        assert startup.loaded("a")
+        assert status["steps"]["warmup:graph"]["error"] == "RuntimeError: no graph"
+
+        def broken():
+            raise OSError("model missing")
+
+        failed = Startup({"llm": broken, "db": lambda: None})
+        await failed.run()
+        assert failed.state == "failed" and failed.blocking
+        assert failed.loaded("db") and not failed.loaded("llm")
+
+    asyncio.run(scenario())
+
+
+def test_gate_serves_open_paths_while_loading():
+    app = FastAPI()
+    startup = Startup({"slow": lambda: None})
+    app.add_middleware(StartupGate, startup=startup, open_paths={"/health"})
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/qa")
+    def qa():
+        return {"ok": True}
+
+    client = TestClient(app)
+    startup.state = "loading"
+    assert client.get("/health").status_code == 200
+    resp = client.get("/qa")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "5"
+    startup.state = "ready"
+    assert client.get("/qa").status_code == 200